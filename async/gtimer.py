@@ -4,6 +4,8 @@
 
 """Timer implemented by twisted."""
 
+import math
+
 from twisted.internet import reactor
 from twisted.internet.defer import Deferred, timeout, inlineCallbacks
 
@@ -11,6 +13,138 @@ import logging
 logger = logging.getLogger('timer')
 
 
+class WheelTimer(object):
+    """TimingWheel.call_later 的返回值，接口与 reactor.callLater 返回的 DelayedCall 相同。"""
+    __slots__ = ('wheel', 'deadline', 'func', 'args', 'kwargs', 'cancelled', 'called')
+
+    def __init__(self, wheel, deadline, func, args, kwargs):
+        self.wheel = wheel
+        self.deadline = deadline
+
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+        self.cancelled = False
+        self.called = False
+
+    def active(self):
+        return not (self.cancelled or self.called)
+
+    def cancel(self):
+        if not self.active():
+            return
+
+        self.cancelled = True
+        self.wheel._remove(self)
+
+
+class TimingWheel(object):
+    """哈希时间轮：用于大量、通常会被取消的超时定时器（比如 RPC 请求超时）。
+
+    插入和取消都是 O(1)，整个时间轮只使用一个 reactor 定时器驱动（没有定时器时停止）。
+    超时精度为一个 tick，定时器最多会晚一个 tick 触发。
+    """
+    _default = None
+
+    def __init__(self, tick=0.1, slots=512, clock=None):
+        assert tick > 0 and slots > 0
+
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.clock = clock or reactor
+
+        # 最后处理过的 tick（绝对值：clock.seconds() / tick）
+        self._current_tick = self._now_tick()
+        self._count = 0
+        self._delayed_call = None
+
+    @classmethod
+    def default(cls):
+        """进程内共享的时间轮"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __len__(self):
+        return self._count
+
+    def call_later(self, seconds, func, *args, **kwargs):
+        if not self._count:
+            # 时间轮空闲期间没有推进 tick
+            self._current_tick = self._now_tick()
+
+        deadline = int(math.ceil((self.clock.seconds() + seconds) / self.tick))
+        deadline = max(deadline, self._current_tick + 1)
+
+        timer = WheelTimer(self, deadline, func, args, kwargs)
+        self.slots[deadline % len(self.slots)].add(timer)
+        self._count += 1
+
+        if not self._delayed_call:
+            self._schedule()
+
+        return timer
+
+    def _remove(self, timer):
+        slot = self.slots[timer.deadline % len(self.slots)]
+        if timer in slot:
+            # 已到期、等待回调的定时器不在 slot 中
+            slot.remove(timer)
+            self._count -= 1
+
+    def _now_tick(self):
+        return int(self.clock.seconds() / self.tick)
+
+    def _schedule(self):
+        self._delayed_call = self.clock.callLater(self.tick, self._on_tick)
+
+    def _on_tick(self):
+        self._delayed_call = None
+
+        now_tick = self._now_tick()
+        # reactor 繁忙时可能错过多个 tick，逐个补上（最多转一圈）
+        first_tick = max(self._current_tick + 1, now_tick - len(self.slots) + 1)
+
+        expired = []
+        for tick in range(first_tick, now_tick + 1):
+            slot = self.slots[tick % len(self.slots)]
+            for timer in [timer for timer in slot if timer.deadline <= now_tick]:
+                slot.remove(timer)
+                expired.append(timer)
+
+        self._current_tick = now_tick
+        self._count -= len(expired)
+
+        for timer in expired:
+            if timer.cancelled:
+                continue
+
+            timer.called = True
+            try:
+                timer.func(*timer.args, **timer.kwargs)
+            except Exception:
+                logger.exception('timing wheel callback failed: %s', timer.func)
+
+        if self._count and not self._delayed_call:
+            self._schedule()
+
+
+def enable_wheel_timeout(d, seconds, wheel=None):
+    """与 enable_timeout 相同：seconds 秒后 deferred 仍未完成时触发 TimeoutError，但使用时间轮计时。"""
+    if wheel is None:
+        wheel = TimingWheel.default()
+
+    timer = wheel.call_later(seconds, timeout, d)
+
+    def _cancel_timer(result):
+        timer.cancel()
+        return result
+
+    d.addBoth(_cancel_timer)
+    return d
+
+
 class AsyncTimer(object):
     @staticmethod
     def start(seconds):
@@ -19,10 +153,16 @@ class AsyncTimer(object):
         return d
 
     @staticmethod
-    def wait(seconds):
-        """ wait until interrupted by callback or timeout that will raise a CancelledError """
+    def wait(seconds, wheel=None):
+        """ wait until interrupted by callback or timeout that will raise a CancelledError
+
+        wheel: 可选的 TimingWheel，大量并发等待时使用时间轮代替 reactor.callLater
+        """
         d = Deferred()
-        _delayed_call = reactor.callLater(seconds, timeout, d)
+        if wheel is not None:
+            _delayed_call = wheel.call_later(seconds, timeout, d)
+        else:
+            _delayed_call = reactor.callLater(seconds, timeout, d)
         d._slim_delayed_call = _delayed_call
 
         def _on_finished(result):
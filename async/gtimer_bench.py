@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""超时定时器性能对比：reactor.callLater vs TimingWheel
+
+模拟 RPC 请求超时：创建 100k 个 30 秒的定时器，然后全部取消（请求正常返回）。
+
+Run: python gtimer_bench.py
+"""
+
+import time
+
+from twisted.internet import reactor
+
+from gcommon.async.gtimer import TimingWheel
+
+
+COUNT = 100000
+TIMEOUT = 30
+
+
+def _noop():
+    pass
+
+
+def bench_call_later():
+    started = time.time()
+    calls = [reactor.callLater(TIMEOUT, _noop) for _ in xrange(COUNT)]
+    scheduled = time.time()
+
+    for call in calls:
+        call.cancel()
+
+    # reactor 在下一次循环时才从堆中清理被取消的定时器
+    reactor.runUntilCurrent()
+    finished = time.time()
+
+    return scheduled - started, finished - scheduled
+
+
+def bench_timing_wheel():
+    wheel = TimingWheel()
+
+    started = time.time()
+    timers = [wheel.call_later(TIMEOUT, _noop) for _ in xrange(COUNT)]
+    scheduled = time.time()
+
+    for timer in timers:
+        timer.cancel()
+
+    reactor.runUntilCurrent()
+    finished = time.time()
+
+    return scheduled - started, finished - scheduled
+
+
+def main():
+    for name, bench in (('callLater', bench_call_later), ('TimingWheel', bench_timing_wheel)):
+        schedule_time, cancel_time = bench()
+        print('%-12s %d timers: schedule %6.1f ms, cancel %6.1f ms' % (
+            name, COUNT, schedule_time * 1000, cancel_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
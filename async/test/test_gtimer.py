@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from twisted.internet.defer import Deferred, TimeoutError
+from twisted.internet.task import Clock
+
+from gcommon.async.gtimer import TimingWheel, AsyncTimer, enable_wheel_timeout
+
+
+def test_timer_fired():
+    clock = Clock()
+    wheel = TimingWheel(tick=0.1, slots=8, clock=clock)
+
+    fired = []
+    wheel.call_later(0.25, fired.append, 'a')
+    wheel.call_later(2.0, fired.append, 'b')
+    assert len(wheel) == 2
+
+    clock.advance(0.2)
+    assert fired == []
+
+    clock.advance(0.1)
+    assert fired == ['a']
+
+    # 超过一圈的定时器
+    for _ in range(20):
+        clock.advance(0.1)
+    assert fired == ['a', 'b']
+    assert len(wheel) == 0
+    assert not clock.getDelayedCalls()
+
+
+def test_timer_cancelled():
+    clock = Clock()
+    wheel = TimingWheel(tick=0.1, slots=8, clock=clock)
+
+    fired = []
+    timer = wheel.call_later(0.3, fired.append, 'a')
+    assert timer.active()
+
+    timer.cancel()
+    assert not timer.active()
+    assert len(wheel) == 0
+
+    clock.advance(1)
+    assert fired == []
+
+
+def test_wheel_timeout():
+    clock = Clock()
+    wheel = TimingWheel(tick=0.1, clock=clock)
+
+    d = enable_wheel_timeout(Deferred(), 1, wheel)
+    errors = []
+    d.addErrback(lambda f: errors.append(f.check(TimeoutError)))
+
+    clock.advance(1.1)
+    assert errors == [TimeoutError]
+
+    d = enable_wheel_timeout(Deferred(), 1, wheel)
+    d.callback('ok')
+    assert len(wheel) == 0
+
+
+def test_async_timer_wait():
+    clock = Clock()
+    wheel = TimingWheel(tick=0.1, clock=clock)
+
+    d = AsyncTimer.wait(5, wheel)
+    assert len(wheel) == 1
+
+    d.callback('done')
+    assert len(wheel) == 0
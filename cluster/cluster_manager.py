@@ -4,8 +4,8 @@
 
 """应用服务器集群"""
 
-import hash_ring
 import logging
+from gcommon.cluster.consistent_hash import IncrementalHashRing
 from gcommon.cluster.twisted_kazoo import twisted_callback
 
 logger = logging.getLogger('server')
@@ -26,6 +26,9 @@ class NodeManager(object):
     """应用服务器集群节点管理"""
     _managers = {}
 
+    # key -> 服务器节点 的查找缓存大小
+    LOOKUP_CACHE_SIZE = 10000
+
     @staticmethod
     def add_node_manager(service_name):
         manager = NodeManager(service_name)
@@ -45,7 +48,7 @@ class NodeManager(object):
         self.SERVICE_NAME = service_name
 
         self.server_nodes = set()
-        self.server_ring = hash_ring.HashRing(self.server_nodes)
+        self.server_ring = IncrementalHashRing(cache_size=self.LOOKUP_CACHE_SIZE)
 
         self.watched = False
 
@@ -63,22 +66,19 @@ class NodeManager(object):
             logger.critical('All service nodes DOWN - %s', self.SERVICE_NAME)
 
         self.server_nodes = set(nodes)
-        self.server_ring = hash_ring.HashRing(self.server_nodes)
+        self.server_ring.set_nodes(self.server_nodes)
 
     def add_server_nodes(self, **nodes):
         """增加一个或者多个节点"""
         self.server_nodes.update(set(nodes))
-        self.server_ring = hash_ring.HashRing(self.server_nodes)
+        self.server_ring.add_nodes(nodes)
 
     def del_server_nodes(self, **nodes):
         """删除一个或者多个节点"""
-        self.server_nodes -= nodes
-        self.server_ring = hash_ring.HashRing(self.server_nodes)
+        self.server_nodes -= set(nodes)
+        self.server_ring.remove_nodes(nodes)
 
     def get_server(self, key):
         """获取给定 Key 所对应的服务器节点"""
-        if not isinstance(key, str):
-            key = str(key)
-
         return self.server_ring.get_node(key)
 
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""可增量更新的一致性哈希环。
+
+虚拟节点的位置与 hash_ring.HashRing（所有节点权重相同时）完全一致：
+每个节点 40 组 md5，每组 3 个虚拟节点。因此同一组节点计算出的归属与 hash_ring 相同，
+但节点变化时只需要增加 / 删除变化节点的虚拟节点，而不必重建整个哈希环。
+
+可选的 LRU 缓存保存 key -> node 的查找结果。节点变化后，只有归属发生变化的 key
+（即落在变化弧段上的 key）才会从缓存中删除。
+"""
+
+import hashlib
+import struct
+from bisect import bisect, insort
+from collections import OrderedDict
+
+
+# 与 hash_ring.HashRing 相同
+VIRTUAL_NODE_GROUPS = 40
+VIRTUAL_NODES_IN_GROUP = 3
+
+_ring_value = struct.Struct('<I')
+
+
+def hash_value(string_key):
+    """key 在哈希环上的位置（与 hash_ring.HashRing.gen_key 相同）"""
+    return _ring_value.unpack_from(hashlib.md5(string_key).digest())[0]
+
+
+def virtual_node_values(node):
+    values = []
+    for j in xrange(VIRTUAL_NODE_GROUPS):
+        digest = hashlib.md5('%s-%s' % (node, j)).digest()
+        for i in xrange(VIRTUAL_NODES_IN_GROUP):
+            values.append(_ring_value.unpack_from(digest, i * 4)[0])
+
+    return values
+
+
+class IncrementalHashRing(object):
+    def __init__(self, nodes=None, cache_size=0):
+        self.nodes = set()
+
+        # 哈希环上的位置 -> 节点
+        self.ring = {}
+        self._sorted_keys = []
+
+        # key -> (hash value, node)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+        if nodes:
+            self.add_nodes(nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def set_nodes(self, nodes):
+        """更新为新的节点集合，只处理发生变化的节点"""
+        nodes = set(nodes)
+        self.remove_nodes(self.nodes - nodes)
+        self.add_nodes(nodes - self.nodes)
+
+    def add_nodes(self, nodes):
+        nodes = set(nodes) - self.nodes
+        if not nodes:
+            return
+
+        for node in nodes:
+            for value in virtual_node_values(node):
+                if value in self.ring:
+                    # md5 冲突：保留先加入的节点
+                    continue
+
+                self.ring[value] = node
+                insort(self._sorted_keys, value)
+
+        self.nodes.update(nodes)
+        self._invalidate_cache()
+
+    def remove_nodes(self, nodes):
+        nodes = set(nodes) & self.nodes
+        if not nodes:
+            return
+
+        removed = set()
+        for node in nodes:
+            for value in virtual_node_values(node):
+                if self.ring.get(value) == node:
+                    del self.ring[value]
+                    removed.add(value)
+
+        if len(removed) * 8 > len(self._sorted_keys):
+            self._sorted_keys = [value for value in self._sorted_keys if value not in removed]
+        else:
+            for value in removed:
+                del self._sorted_keys[bisect(self._sorted_keys, value) - 1]
+
+        self.nodes -= nodes
+        self._invalidate_cache()
+
+    def get_node(self, key):
+        """获取 key 所对应的节点。key 不是字符串时使用 str(key)."""
+        if self.cache_size:
+            cached = self._cache.pop(key, None)
+            if cached:
+                self._cache[key] = cached
+                return cached[1]
+
+        if not self._sorted_keys:
+            return None
+
+        value = hash_value(key if isinstance(key, str) else str(key))
+        node = self.get_node_by_value(value)
+
+        if self.cache_size:
+            self._cache[key] = (value, node)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return node
+
+    def get_node_by_value(self, value):
+        """根据 hash_value 的结果查找节点（同一个 key 在多个哈希环上查找时只需计算一次哈希）"""
+        if not self._sorted_keys:
+            return None
+
+        pos = bisect(self._sorted_keys, value)
+        if pos == len(self._sorted_keys):
+            pos = 0
+
+        return self.ring[self._sorted_keys[pos]]
+
+    def _invalidate_cache(self):
+        """删除归属发生变化的缓存项"""
+        if not self._cache:
+            return
+
+        if not self._sorted_keys:
+            self._cache.clear()
+            return
+
+        moved = [key for key, (value, node) in self._cache.iteritems()
+                 if self.get_node_by_value(value) != node]
+
+        for key in moved:
+            del self._cache[key]
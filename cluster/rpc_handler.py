@@ -3,15 +3,19 @@
 # created: 2015-05-21
 
 import logging
+import random
 import time
 import traceback
 
 from copy import deepcopy
 from twisted.internet.defer import inlineCallbacks, returnValue, maybeDeferred, TimeoutError
 from gcommon.app.slim_error_define import SlimErrorCodes
+from gcommon.logger.glogger import access_fields
+from gcommon.logger.log_util import LazyArg
 
 from gcommon.rpc import RpcServerSuspended, RpcClientBadRouting
 from gcommon.utils import tm
+from gcommon.utils.gcounter import RequestMetrics
 from gcommon.utils.monitor import monitor
 from gcommon.utils import security
 
@@ -19,6 +23,17 @@ from slimproto.error_define.ttypes import slim_errors
 from slimproto.base.ttypes import InvalidOperation
 
 
+# 按照 RPC 方法统计处理时间、正在处理的请求数和错误数
+rpc_metrics = RequestMetrics('rpc', labels=('method',))
+
+
+def _scrubbed_args(rpc_args):
+    return security.erase_security_info_in_rpcargs(deepcopy(rpc_args))
+
+
+def _scrubbed_result(result):
+    return security.erase_security_info_in_rpc_result(deepcopy(result))
+
 class RpcServiceHandler(object):
     Routing_Key_Manager = None
 
@@ -30,6 +45,14 @@ class RpcServiceHandler(object):
 
         self.logger = logging.getLogger('rpc')
 
+        # 记录处理时间的请求比例（0 - 1），没有配置时为 1。只对当前 handler 有效，不修改共用的 rpc_metrics
+        sample_rate = app_server.cfg.get_float('metrics.rpc_sample_rate', 1.0)
+        self.metrics_sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+        # 成功的请求写入 access log 的比例（0 - 1），没有配置时为 1，0 时只写入失败的请求。失败的请求总是写入
+        sample_rate = app_server.cfg.get_float('rpc.access_log_sample_rate', 1.0)
+        self.access_log_sample_rate = min(max(sample_rate, 0.0), 1.0)
+
     def server_failover_enabled(self):
         return self.server.is_failover_enabled()
 
@@ -78,7 +101,8 @@ class RpcServiceHandler(object):
 
     @inlineCallbacks
     def call_with_access_log(self, func, *rpc_args):
-        self.logger.debug('%s - %s - start', func.__name__, security.erase_security_info_in_rpcargs(deepcopy(rpc_args)))
+        # 日志参数在日志被输出时才复制并清除敏感信息
+        self.logger.debug('%s - %s - start', func.__name__, LazyArg(_scrubbed_args, rpc_args))
 
         when_started = time.time()
 
@@ -91,19 +115,32 @@ class RpcServiceHandler(object):
             except Exception, e:
                 self.logger.error('%s - error - exception: %s, stack: \n%s', func.__name__,
                                   f.getErrorMessage(), ''.join(traceback.format_tb(f.getTracebackObject())))
+                latency = tm.past_millisecond(when_started)
                 self.logger.access('%s - %s - error - %sms - %s', func.__name__,
-                                   security.erase_security_info_in_rpc_result(rpc_args),
-                                   tm.past_millisecond(when_started), e)
+                                   LazyArg(_scrubbed_args, rpc_args),
+                                   latency, e,
+                                   extra=access_fields('rpc', func.__name__, 'error', latency))
                 raise self._to_thrift_exception(e)
 
+        token = rpc_metrics.start(func.__name__)
+
+        def __finish(result, error):
+            rpc_metrics.finish(token, error, self.metrics_sample_rate)
+            return result
+
         d = maybeDeferred(func, *rpc_args)
+        d.addCallbacks(__finish, __finish, callbackArgs=(False,), errbackArgs=(True,))
         d.addErrback(__error_handler)
 
         result = yield d
-        self.logger.access('%s - %s - ok - %sms - %s', func.__name__,
-                           security.erase_security_info_in_rpcargs(rpc_args),
-                           tm.past_millisecond(when_started),
-                           security.erase_security_info_in_rpc_result(deepcopy(result)))
+
+        if self.access_log_sample_rate >= 1 or random.random() < self.access_log_sample_rate:
+            latency = tm.past_millisecond(when_started)
+            self.logger.access('%s - %s - ok - %sms - %s', func.__name__,
+                               LazyArg(_scrubbed_args, rpc_args),
+                               latency,
+                               LazyArg(_scrubbed_result, result),
+                               extra=access_fields('rpc', func.__name__, 'ok', latency))
 
         returnValue(result)
 
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import hash_ring
+
+from gcommon.cluster.consistent_hash import IncrementalHashRing
+
+
+NODES = ['server-%02d' % i for i in range(10)]
+KEYS = [str(i) for i in range(2000)]
+
+
+def _assert_same_as_hash_ring(ring, nodes):
+    expected = hash_ring.HashRing(nodes)
+    for key in KEYS:
+        assert ring.get_node(key) == expected.get_node(key)
+
+
+def test_same_as_hash_ring():
+    ring = IncrementalHashRing(NODES)
+    _assert_same_as_hash_ring(ring, NODES)
+
+
+def test_incremental_update():
+    ring = IncrementalHashRing(NODES[:5], cache_size=500)
+    _assert_same_as_hash_ring(ring, NODES[:5])
+
+    ring.add_nodes(NODES[5:])
+    _assert_same_as_hash_ring(ring, NODES)
+
+    ring.remove_nodes(NODES[:3])
+    _assert_same_as_hash_ring(ring, NODES[3:])
+
+    ring.set_nodes(NODES[1:4])
+    _assert_same_as_hash_ring(ring, NODES[1:4])
+
+    ring.set_nodes([])
+    assert ring.get_node('1') is None
+
+
+def test_cache_invalidation():
+    ring = IncrementalHashRing(NODES[:5], cache_size=len(KEYS))
+    before = dict((key, ring.get_node(key)) for key in KEYS)
+    assert len(ring._cache) == len(KEYS)
+
+    ring.add_nodes(['server-new'])
+
+    # 只有移动到新节点上的 key 被删除
+    moved = set(key for key in KEYS if key not in ring._cache)
+    assert moved
+    for key in KEYS:
+        if key in moved:
+            assert ring.get_node(key) == 'server-new'
+        else:
+            assert ring.get_node(key) == before[key]
+
+
+def test_non_string_key():
+    ring = IncrementalHashRing(NODES, cache_size=10)
+    assert ring.get_node(12345) == hash_ring.HashRing(NODES).get_node('12345')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import hash_ring
+import pytest
+
+from twisted.internet import reactor
+
+from gcommon.cluster import zkhashlock
+from gcommon.cluster.consistent_hash import IncrementalHashRing
+from gcommon.cluster.zkhashlock import HashLock
+
+
+NODE_COUNT = 20
+KEYS = [str(i) for i in range(2000)]
+
+
+class _Observer(object):
+    def yield_resources(self):
+        pass
+
+    def update_lock(self, node, new_lock):
+        pass
+
+
+def _seq(i):
+    return '%010d' % i
+
+
+def _lock_names(confirmed, unconfirmed):
+    """node00 ... 的锁节点名称：confirmed 个节点已经发现了我（node20），之后的 unconfirmed 个节点还没有"""
+    names = []
+    for i in range(confirmed + unconfirmed):
+        lock_seq = _seq(NODE_COUNT) if i < confirmed else _seq(NODE_COUNT - 1)
+        names.append('node%02d-%s-%s' % (i, _seq(i), lock_seq))
+    return names
+
+
+@pytest.fixture
+def created_rings(monkeypatch):
+    """update_zk_nodes 在当前线程中执行，记录创建的哈希环"""
+    monkeypatch.setattr(reactor, 'callFromThread', lambda func, *args, **kwargs: func(*args, **kwargs))
+
+    created = []
+
+    class CountingRing(IncrementalHashRing):
+        def __init__(self, nodes=None, cache_size=0):
+            nodes = list(nodes or [])
+            created.append(frozenset(nodes))
+            IncrementalHashRing.__init__(self, nodes, cache_size)
+
+    monkeypatch.setattr(zkhashlock, 'IncrementalHashRing', CountingRing)
+    return created
+
+
+def _hash_lock(unconfirmed=3):
+    lock = HashLock(_Observer(), 'node%02d' % NODE_COUNT, _seq(NODE_COUNT))
+    lock.update_zk_nodes(_lock_names(NODE_COUNT - unconfirmed, unconfirmed), locked=True)
+    return lock
+
+
+def _uncached_is_my_resource(lock):
+    """不使用 HashLock 中缓存的哈希环，按照节点重新创建（hash_ring）"""
+    my_node = lock.my_node
+    previous_rings = [(node.service_uid, hash_ring.HashRing(lock._get_node_uids_by_lock_seq(node.lock_seq)))
+                      for node in lock._lock_nodes.values() if not node.has_found(my_node)]
+    ring = hash_ring.HashRing([node.service_uid for node in lock._lock_nodes.values()])
+
+    def __is_mine(key):
+        for service_uid, previous_ring in previous_rings:
+            if previous_ring.get_node(key) == service_uid:
+                return False
+
+        return ring.get_node(key) == my_node.service_uid
+
+    return __is_mine
+
+
+def test_rings_rebuilt_once_per_membership_change(created_rings):
+    lock = _hash_lock()
+
+    # 所有节点一个环，三个还没有发现我的节点共用一个环
+    assert created_rings[1:] == [frozenset('node%02d' % i for i in range(NODE_COUNT + 1)),
+                                 frozenset('node%02d' % i for i in range(NODE_COUNT))]
+
+    count = len(created_rings)
+    for key in KEYS:
+        lock.is_my_resource(key)
+    lock.partition_resources(KEYS)
+    assert len(created_rings) == count
+
+    # 节点没有变化，或者只是锁的序号变化：使用之前的环
+    lock.update_zk_nodes(_lock_names(NODE_COUNT - 3, 3), locked=True)
+    lock.update_zk_nodes(_lock_names(NODE_COUNT - 2, 2), locked=True)
+    assert len(created_rings) == count
+
+    # 新节点加入：只创建一个新的环
+    lock.update_zk_nodes(_lock_names(NODE_COUNT - 2, 2) + ['node21-%s-%s' % (_seq(21), _seq(21))], locked=True)
+    assert len(created_rings) == count + 1
+    assert created_rings[-1] == frozenset('node%02d' % i for i in range(NODE_COUNT + 2))
+
+
+@pytest.mark.parametrize('unconfirmed', [0, 3])
+def test_same_result_as_uncached_rings(created_rings, unconfirmed):
+    lock = _hash_lock(unconfirmed)
+
+    is_mine = _uncached_is_my_resource(lock)
+    for key in KEYS:
+        assert lock.is_my_resource(key) == is_mine(key), key
+
+
+@pytest.mark.parametrize('unconfirmed', [0, 3])
+def test_partition_resources(created_rings, unconfirmed):
+    lock = _hash_lock(unconfirmed)
+
+    mine, others = lock.partition_resources(KEYS)
+    assert sorted(mine + others) == sorted(KEYS)
+    assert not set(mine) & set(others)
+    assert mine and others
+
+    assert mine == [key for key in KEYS if lock.is_my_resource(key)]
+    assert others == [key for key in KEYS if not lock.is_my_resource(key)]
@@ -15,7 +15,7 @@ import logging
 from functools import partial
 
 import rbtree
-import hash_ring
+from gcommon.cluster.consistent_hash import IncrementalHashRing, hash_value
 from gcommon.cluster.twisted_kazoo import twisted_callback
 
 
@@ -25,7 +25,7 @@ logger = logging.getLogger('hashlock')
 class HashLockObserver(object):
     def yield_resources(self, hash_lock):
         """需要出让部分资源"""
-        obsoleted_keys = filter(lambda key: not hash_lock.is_my_resource(key), self._iter_resources())
+        _, obsoleted_keys = hash_lock.partition_resources(self._iter_resources())
         map(self._drop_resource, obsoleted_keys)
         # print 'drop: ', obsoleted_keys, len(obsoleted_keys)
 
@@ -156,6 +156,15 @@ class HashLock(object):
         # 系统中至少有自己存在
         self._lock_nodes[uid] = self._my_node
 
+        # 哈希环只在节点变化时重建：frozenset(uids) -> IncrementalHashRing
+        self._rings = {}
+        self._my_ring = None
+        self._all_agreed = True
+        # 还没有发现我的节点：[(service_uid, ring)]
+        self._previous_rings = []
+
+        self._rebuild_rings()
+
     @property
     def my_node(self):
         return self._my_node
@@ -175,6 +184,7 @@ class HashLock(object):
 
         map(self._on_node_updated, zk_nodes)
         map(self._on_node_deleted, deleted_nodes)
+        self._rebuild_rings()
 
         self._yield_resources(zk_nodes)
         self._observer.yield_resources()
@@ -249,12 +259,57 @@ class HashLock(object):
         self._observer.update_lock(self._my_node, latest_node.service_seq)
 
     def is_my_resource(self, key):
-        if not self._is_all_agreed():
-            if self._will_take_by_previous_nodes(key):
+        value = hash_value(key)
+
+        if not self._all_agreed:
+            if self._will_take_by_previous_nodes(value):
                 # 被前面的节点拿走了
                 return False
 
-        return self._will_take_by_me(key)
+        return self._my_ring.get_node_by_value(value) == self._my_node.service_uid
+
+    def partition_resources(self, keys):
+        """将资源分为两组：(属于我的资源, 不属于我的资源)"""
+        mine, others = [], []
+
+        my_uid = self._my_node.service_uid
+        my_ring = self._my_ring
+        check_previous = not self._all_agreed
+
+        for key in keys:
+            value = hash_value(key)
+
+            if check_previous and self._will_take_by_previous_nodes(value):
+                others.append(key)
+            elif my_ring.get_node_by_value(value) == my_uid:
+                mine.append(key)
+            else:
+                others.append(key)
+
+        return mine, others
+
+    def _rebuild_rings(self):
+        """节点（或节点的锁）变化后重新计算哈希环，相同的节点集合共用一个哈希环"""
+        rings = {}
+
+        def _get_ring(uids):
+            uids = frozenset(uids)
+            if uids not in rings:
+                ring = self._rings.get(uids)
+                rings[uids] = ring if ring is not None else IncrementalHashRing(uids)
+            return rings[uids]
+
+        self._my_ring = _get_ring(node.service_uid for node in self._lock_nodes.values())
+        self._all_agreed = bool(self._is_all_agreed())
+
+        self._previous_rings = []
+        if not self._all_agreed:
+            for node in self._lock_nodes.values():
+                if not node.has_found(self._my_node):
+                    uids = self._get_node_uids_by_lock_seq(node.lock_seq)
+                    self._previous_rings.append((node.service_uid, _get_ring(uids)))
+
+        self._rings = rings
 
     def _is_all_agreed(self):
         """判断我前面的所有节点是否已经看到我"""
@@ -265,20 +320,12 @@ class HashLock(object):
             if not node.has_found(self._my_node):
                 return False
 
-    def _will_take_by_me(self, key):
-        uids = [node.service_uid for node in self._lock_nodes.values()]
-        ring = hash_ring.HashRing(uids)
-        return ring.get_node(key) == self._my_node.service_uid
-
-    def _will_take_by_previous_nodes(self, key):
+    def _will_take_by_previous_nodes(self, value):
         """我前面的部分节点还没有发现我"""
-        for node in self._lock_nodes.values():
-            if not node.has_found(self._my_node):
-                # 检查之前的节点是否要拿走该对象
-                uids = self._get_node_uids_by_lock_seq(node.lock_seq)
-                ring = hash_ring.HashRing(uids)
-                if ring.get_node(key) == node.service_uid:
-                    return True
+        for service_uid, ring in self._previous_rings:
+            # 检查之前的节点是否要拿走该对象
+            if ring.get_node_by_value(value) == service_uid:
+                return True
 
         return False
 
@@ -362,6 +409,9 @@ class SlimHashLock(object):
     def is_my_resource(self, key):
         return self._cluster.is_my_resource(key)
 
+    def partition_resources(self, keys):
+        return self._cluster.partition_resources(keys)
+
     def yield_resources(self):
         self._observer.yield_resources(self)
 
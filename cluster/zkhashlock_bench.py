@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""HashLock 资源划分性能对比：每个 key 重建哈希环 vs 缓存的哈希环
+
+20 个节点，100k 个资源；其中部分节点还没有发现当前节点（需要检查之前节点的哈希环）。
+
+Run: python zkhashlock_bench.py
+"""
+
+import time
+
+import hash_ring
+
+from gcommon.cluster.zkhashlock import HashLock, HashLockNode
+
+
+NODE_COUNT = 20
+KEY_COUNT = 100000
+UNCONFIRMED_NODES = 3
+
+
+class _Observer(object):
+    def yield_resources(self):
+        pass
+
+    def update_lock(self, node, new_lock):
+        pass
+
+
+def build_hash_lock():
+    my_seq = '%010d' % NODE_COUNT
+    lock = HashLock(_Observer(), 'server-%02d' % NODE_COUNT, my_seq)
+
+    # 最后几个节点的锁序号比我小：还没有发现我
+    nodes = []
+    for i in range(NODE_COUNT):
+        seq = '%010d' % i
+        lock_seq = seq if i < NODE_COUNT - UNCONFIRMED_NODES else '%010d' % (NODE_COUNT - 1)
+        nodes.append(HashLockNode('server-%02d' % i, seq, lock_seq, active=True))
+
+    # update_zk_nodes 需要在 reactor 线程中执行，这里直接调用其中的步骤
+    map(lock._on_node_updated, nodes)
+    lock._rebuild_rings()
+
+    return lock
+
+
+def is_my_resource_rebuilding(lock, key):
+    """旧版实现：每次调用都重新创建哈希环"""
+    my_node = lock.my_node
+
+    if not lock._is_all_agreed():
+        for node in lock._lock_nodes.values():
+            if not node.has_found(my_node):
+                ring = hash_ring.HashRing(lock._get_node_uids_by_lock_seq(node.lock_seq))
+                if ring.get_node(key) == node.service_uid:
+                    return False
+
+    ring = hash_ring.HashRing([node.service_uid for node in lock._lock_nodes.values()])
+    return ring.get_node(key) == my_node.service_uid
+
+
+def main():
+    lock = build_hash_lock()
+    keys = [str(i) for i in xrange(KEY_COUNT)]
+
+    # 旧实现太慢，只测一部分再按比例换算
+    sample = keys[:KEY_COUNT / 100]
+    started = time.time()
+    old_mine = [key for key in sample if is_my_resource_rebuilding(lock, key)]
+    old_time = (time.time() - started) * 100
+
+    started = time.time()
+    cached_mine = [key for key in keys if lock.is_my_resource(key)]
+    cached_time = time.time() - started
+
+    started = time.time()
+    mine, _ = lock.partition_resources(keys)
+    partition_time = time.time() - started
+
+    assert mine == cached_mine
+    assert old_mine == [key for key in sample if lock.is_my_resource(key)]
+
+    print('%d keys, %d nodes:' % (KEY_COUNT, NODE_COUNT + 1))
+    print('  rebuild rings per key  %8.1f ms (estimated)' % (old_time * 1000))
+    print('  cached is_my_resource  %8.1f ms' % (cached_time * 1000))
+    print('  partition_resources    %8.1f ms' % (partition_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
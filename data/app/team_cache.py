@@ -4,14 +4,42 @@
 
 from gcommon.utils.jsonobj import JsonObject
 from gcommon.data.cache.keyvalue import KeyValue
+from gcommon.data.cache.localcache import LocalCache
+from gcommon.data.cache.msgsub import ChannelSubscriber
 from gcommon.data.cache.set import Set
+from gcommon.data.cache.txcache import SyncCalls, DeferredCalls, AsyncKeyValue, AsyncSet
 
 
 class Dict(dict):
     pass
 
 
-class TeamCache(object):
+class TeamCacheInvalidator(ChannelSubscriber):
+    """接收资料变更通知，删除进程内缓存的资料。消息内容为空格分隔的 key 列表。"""
+    def __init__(self, local_caches):
+        ChannelSubscriber.__init__(self)
+        self._local_caches = local_caches
+
+    def on_sub_notification(self, channel_id, message):
+        keys = message.split()
+        for local_cache in self._local_caches:
+            local_cache.remove(*keys)
+
+    def on_sub_registered(self, channel_id):
+        # 重新订阅之前可能错过了部分通知
+        self._clear()
+        ChannelSubscriber.on_sub_registered(self, channel_id)
+
+    def on_sub_disconnected(self):
+        # 保持订阅状态，连接恢复后由 SlimSubscriberManager 重新订阅
+        self._clear()
+
+    def _clear(self):
+        for local_cache in self._local_caches:
+            local_cache.clear()
+
+
+class TeamCache(SyncCalls):
     """
     1. team members
     2. team profile
@@ -31,16 +59,55 @@ class TeamCache(object):
     _cache_prefix.team_members = 'team.m'
     _cache_prefix.group_members = 'group.m'
 
+    # 资料变更时发布通知的频道
+    INVALIDATION_CHANNEL = 'team.cache.invalidate'
+
+    # 进程内缓存（L1），为 None 时不使用
+    _local_team_profiles = None
+    _local_user_profiles = None
+    _local_group_profiles = None
+
+    _publish_invalidation = False
+    _invalidator = None
+
+    # 缓存对象的类型（AsyncTeamCache 使用异步版本）
+    _KeyValue = KeyValue
+    _Set = Set
+
     @classmethod
-    def init_cache(cls, conn_team, conn_pub=None):
-        cls._team_profile_cache = KeyValue(conn_team, cls._team_profile_encoder, cls._decoder)
-        cls._user_profile_cache = KeyValue(conn_team, cls._user_profile_encoder, cls._decoder)
-        cls._group_profile_cache = KeyValue(conn_team, cls._group_profile_encoder, cls._decoder)
-        cls._team_group_cache = Set(conn_team, decoder=cls._set_decoder)
-        cls._team_member_cache = Set(conn_team, decoder=cls._set_decoder)
-        cls._group_member_cache = Set(conn_team, decoder=cls._set_decoder)
+    def init_cache(cls, conn_team, conn_pub=None, local_cache_size=0, local_cache_ttl=60,
+                   publish_invalidation=False):
+        """
+        :param local_cache_size: 大于 0 时在进程内缓存团队、用户和群组资料
+        :param local_cache_ttl: 进程内缓存的过期时间（秒）
+        :param publish_invalidation: 修改资料时发布变更通知（使用了进程内缓存时总是发布）。
+                                     其它进程使用进程内缓存时，修改资料的进程需要打开这个选项。
+        """
+        cls._team_profile_cache = cls._KeyValue(conn_team, cls._team_profile_encoder, cls._decoder)
+        cls._user_profile_cache = cls._KeyValue(conn_team, cls._user_profile_encoder, cls._decoder)
+        cls._group_profile_cache = cls._KeyValue(conn_team, cls._group_profile_encoder, cls._decoder)
+        cls._team_group_cache = cls._Set(conn_team, decoder=cls._set_decoder)
+        cls._team_member_cache = cls._Set(conn_team, decoder=cls._set_decoder)
+        cls._group_member_cache = cls._Set(conn_team, decoder=cls._set_decoder)
         cls._conn_pub = conn_pub
 
+        if local_cache_size:
+            cls._local_team_profiles = LocalCache('team_cache.team_profile', local_cache_size, local_cache_ttl)
+            cls._local_user_profiles = LocalCache('team_cache.user_profile', local_cache_size, local_cache_ttl)
+            cls._local_group_profiles = LocalCache('team_cache.group_profile', local_cache_size, local_cache_ttl)
+
+        cls._publish_invalidation = bool(conn_pub) and (publish_invalidation or bool(local_cache_size))
+
+    @classmethod
+    def subscribe_invalidation(cls):
+        """订阅资料变更通知。需要在 gcommon.data.cache.init_subscriber 之后调用。"""
+        local_caches = [cache for cache in (cls._local_team_profiles, cls._local_user_profiles,
+                                            cls._local_group_profiles) if cache is not None]
+        assert local_caches, 'local cache is not enabled'
+
+        cls._invalidator = TeamCacheInvalidator(local_caches)
+        return cls._invalidator.subscribe(cls.INVALIDATION_CHANNEL)
+
     def __init__(self, team_id):
         self._team_id = team_id
 
@@ -69,19 +136,62 @@ class TeamCache(object):
     def _get_key_name(self, prefix, obj_id):
         return '%s.%s' % (prefix, obj_id)
 
+    def _get_profiles(self, cache, local_cache, keys):
+        """先从进程内缓存中查找，未命中的资料再从 redis 中读取"""
+        if not keys:
+            return self._result([])
+
+        if local_cache is None:
+            return cache.mget(keys)
+
+        profiles, missing = local_cache.get_many(keys)
+        if not missing:
+            return self._result(profiles)
+
+        # 读取期间资料被修改（本进程或者其它进程的变更通知）时，不把旧资料写入进程内缓存
+        version = local_cache.version()
+
+        def _on_loaded(loaded_profiles):
+            local_cache.set_many(missing, loaded_profiles, version)
+
+            loaded = dict(zip(missing, loaded_profiles))
+            return [profile if profile is not None else loaded[key] for key, profile in zip(keys, profiles)]
+
+        return self._then(cache.mget(missing), _on_loaded)
+
+    def _invalidate_local_cache(self, local_cache, *keys):
+        """资料已修改：删除本进程缓存的资料，并通知其它进程。返回 publish 的结果"""
+        if local_cache is not None:
+            local_cache.remove(*keys)
+
+        if self._publish_invalidation and keys:
+            return self._conn_pub.publish(self.INVALIDATION_CHANNEL, ' '.join(keys))
+
+        return self._result(None)
+
     def get_team_profile(self, team_id):
         cache_name = self._get_key_name(self._cache_prefix.team_profile, team_id)
-        return self._team_profile_cache.get(cache_name)
+        if self._local_team_profiles is None:
+            return self._team_profile_cache.get(cache_name)
+
+        profile = self._local_team_profiles.get(cache_name)
+        if profile is not None:
+            return self._result(profile)
+
+        version = self._local_team_profiles.version()
+
+        def _on_loaded(loaded_profile):
+            self._local_team_profiles.set(cache_name, loaded_profile, version)
+            return loaded_profile
+
+        return self._then(self._team_profile_cache.get(cache_name), _on_loaded)
 
     def get_user_profiles(self, *args):
         cache_names = []
         for id in args:
             cache_names.append(self._get_key_name(self._cache_prefix.user_profile, id))
 
-        if cache_names:
-            return self._user_profile_cache.mget(cache_names)
-        else:
-            return []
+        return self._get_profiles(self._user_profile_cache, self._local_user_profiles, cache_names)
 
     def get_group_profiles(self, *group_ids):
         # get profiles of those group_ids
@@ -90,14 +200,12 @@ class TeamCache(object):
             key = self._get_key_name(self._cache_prefix.group_profile, group_id)
             keys.append(key)
 
-        if keys:
-            return self._group_profile_cache.mget(keys)
-        else:
-            return []
+        return self._get_profiles(self._group_profile_cache, self._local_group_profiles, keys)
 
     def set_team_profile(self, team):
         key = self._get_key_name(self._cache_prefix.team_profile, team.team_id)
-        self._team_profile_cache.set(key, team)
+        return self._then(self._team_profile_cache.set(key, team),
+                          lambda _: self._invalidate_local_cache(self._local_team_profiles, key))
 
     def set_group_profiles(self, *groups):
         assert groups
@@ -106,9 +214,11 @@ class TeamCache(object):
             key = self._get_key_name(self._cache_prefix.group_profile, group.group_id)
             keys.append(key)
 
-        profile_mapping = self._group_profile_cache.mset(keys, groups)
+        def _on_saved(profile_mapping):
+            return self._then(self._invalidate_local_cache(self._local_group_profiles, *keys),
+                              lambda _: profile_mapping)
 
-        return profile_mapping
+        return self._then(self._group_profile_cache.mset(keys, groups), _on_saved)
 
     def set_user_profiles(self, *users):
         assert users
@@ -117,7 +227,8 @@ class TeamCache(object):
             key = self._get_key_name(self._cache_prefix.user_profile, user.user_id)
             keys.append(key)
 
-        self._user_profile_cache.mset(keys, users)
+        return self._then(self._user_profile_cache.mset(keys, users),
+                          lambda _: self._invalidate_local_cache(self._local_user_profiles, *keys))
 
     def get_team_public_groups(self):
         key = self._get_key_name(self._cache_prefix.team_public_groups, self._team_id)
@@ -137,12 +248,15 @@ class TeamCache(object):
 
     def is_visible_group(self, user_id, group_id):
         key = self._get_key_name(self._cache_prefix.user_groups, user_id)
-        visible = self._team_group_cache.ismember(key, group_id)
-        if not visible:
-            key = self._get_key_name(self._cache_prefix.team_public_groups, self._team_id)
-            visible = self._team_group_cache.ismember(key, group_id)
 
-        return visible
+        def _check_public_groups(visible):
+            if visible:
+                return visible
+
+            public_key = self._get_key_name(self._cache_prefix.team_public_groups, self._team_id)
+            return self._team_group_cache.ismember(public_key, group_id)
+
+        return self._then(self._team_group_cache.ismember(key, group_id), _check_public_groups)
 
     def is_user_group(self, user_id, group_id):
         key = self._get_key_name(self._cache_prefix.user_groups, user_id)
@@ -154,11 +268,11 @@ class TeamCache(object):
 
     def set_user_groups(self, user_id, *groups):
         key = self._get_key_name(self._cache_prefix.user_groups, user_id)
-        self._team_group_cache.add(key, *groups)
+        return self._team_group_cache.add(key, *groups)
 
     def remove_user_groups(self, user_id, *groups):
         key = self._get_key_name(self._cache_prefix.user_groups, user_id)
-        self._team_group_cache.remove(key, *groups)
+        return self._team_group_cache.remove(key, *groups)
 
     def is_team_member(self, user_id):
         key = self._get_key_name(self._cache_prefix.team_members, self._team_id)
@@ -181,18 +295,18 @@ class TeamCache(object):
 
     def set_team_members(self, *members):
         key = self._get_key_name(self._cache_prefix.team_members, self._team_id)
-        self._team_member_cache.add(key, *members)
+        return self._team_member_cache.add(key, *members)
 
     def set_group_members(self, group_id, *members):
         key = self._get_key_name(self._cache_prefix.group_members, group_id)
-        self._group_member_cache.add(key, *members)
+        return self._group_member_cache.add(key, *members)
 
     def remove_group_members(self, group_id, *members):
         key = self._get_key_name(self._cache_prefix.group_members, group_id)
-        self._group_member_cache.remove(key, *members)
+        return self._group_member_cache.remove(key, *members)
 
     def publish_unread_status(self, sub_id, status):
-        self._conn_pub.publish(sub_id, status)
+        return self._conn_pub.publish(sub_id, status)
 
     def get_user_push_token(self, user_id):
         # TODO:
@@ -206,38 +320,56 @@ class TeamCache(object):
 
     def empty_team_members(self):
         key = self._get_key_name(self._cache_prefix.team_members, self._team_id)
-        self._team_member_cache.remove_keys(key)
+        return self._team_member_cache.remove_keys(key)
 
     def empty_team_member_profiles(self, *user_ids):
         assert user_ids
         keys = map(self.key_id_map(self._cache_prefix.user_profile), user_ids)
 
-        self._user_profile_cache.remove_keys(*keys)
+        return self._then(self._user_profile_cache.remove_keys(*keys),
+                          lambda _: self._invalidate_local_cache(self._local_user_profiles, *keys))
 
     def empty_team_groups(self):
-        # remove group profiles
-        group_ids = self.get_team_public_groups()
-        group_ids += self.get_team_private_groups()
-        keys = map(self.key_id_map(self._cache_prefix.group_profile), group_ids)
+        def _remove_groups(group_ids):
+            # remove group profiles
+            keys = map(self.key_id_map(self._cache_prefix.group_profile), group_ids)
+
+            # redis 中的资料删除之后再通知，否则其它进程可能重新读到旧资料
+            def _on_profiles_removed(_):
+                return self._invalidate_local_cache(self._local_group_profiles, *keys)
 
-        self._group_profile_cache.remove_keys(*keys)
+            # remove team groups
+            def _remove_team_groups(_):
+                key_pub = self._get_key_name(self._cache_prefix.team_public_groups, self._team_id)
+                key_pri = self._get_key_name(self._cache_prefix.team_private_groups, self._team_id)
+                return self._team_group_cache.remove_keys(key_pub, key_pri)
 
-        # remove team groups
-        key_pub = self._get_key_name(self._cache_prefix.team_public_groups, self._team_id)
-        key_pri = self._get_key_name(self._cache_prefix.team_private_groups, self._team_id)
-        self._team_group_cache.remove_keys(key_pub, key_pri)
+            result = self._then(self._group_profile_cache.remove_keys(*keys), _on_profiles_removed)
+            return self._then(result, _remove_team_groups)
+
+        def _load_private_groups(public_group_ids):
+            return self._then(self.get_team_private_groups(),
+                              lambda private_group_ids: _remove_groups(public_group_ids + private_group_ids))
+
+        return self._then(self.get_team_public_groups(), _load_private_groups)
 
     def empty_group_members(self, group_ids):
         assert group_ids
         keys = map(self.key_id_map(self._cache_prefix.group_members), group_ids)
 
-        self._group_member_cache.remove_keys(*keys)
+        return self._group_member_cache.remove_keys(*keys)
 
     def empty_user_groups(self, user_ids):
         assert user_ids
         keys = map(self.key_id_map(self._cache_prefix.user_groups), user_ids)
 
-        self._team_group_cache.remove_keys(*keys)
+        return self._team_group_cache.remove_keys(*keys)
+
+
+class AsyncTeamCache(DeferredCalls, TeamCache):
+    """TeamCache 的异步版本：conn_team / conn_pub 为 TxRedisPool，所有方法返回 Deferred."""
+    _KeyValue = AsyncKeyValue
+    _Set = AsyncSet
 
 
 if __name__ == '__main__':
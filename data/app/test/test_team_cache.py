@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.data.app.team_cache import AsyncTeamCache, TeamCacheInvalidator
+from gcommon.data.cache.test.test_txcache import FakeRedisClient, ResponseError, create_pool, result_of
+from gcommon.utils.jsonobj import JsonObject
+
+
+def _init_cache(data):
+    client = FakeRedisClient(data)
+    pool = create_pool(clients=[client])
+    AsyncTeamCache.init_cache(pool, conn_pub=pool, local_cache_size=10)
+    return client
+
+
+def test_profiles_through_local_cache():
+    client = _init_cache({'user.p.1': '{"user_id": 1}'})
+    cache = AsyncTeamCache(1)
+
+    assert result_of(cache.get_user_profiles(1, 2)) == [{'user_id': 1}, None]
+    sent = len(client.sent)
+    assert result_of(cache.get_user_profiles(1)) == [{'user_id': 1}]
+    assert len(client.sent) == sent
+
+    user = JsonObject()
+    user.user_id = 1
+    user.name = 'guli'
+    result_of(cache.set_user_profiles(user))
+    assert client.published == [(AsyncTeamCache.INVALIDATION_CHANNEL, 'user.p.1')]
+    assert result_of(cache.get_user_profiles(1)) == [{'user_id': 1, 'name': 'guli'}]
+
+
+def test_invalidated_while_loading():
+    client = _init_cache({'team.p.1': '{"name": "old"}', 'user.p.1': '{"name": "old"}'})
+    cache = AsyncTeamCache(1)
+
+    client.hold_commands = {'GET', 'MGET'}
+    d_team = cache.get_team_profile(1)
+    d_users = cache.get_user_profiles(1)
+
+    # 读取期间收到变更通知
+    invalidator = TeamCacheInvalidator([AsyncTeamCache._local_team_profiles, AsyncTeamCache._local_user_profiles])
+    invalidator.on_sub_notification(AsyncTeamCache.INVALIDATION_CHANNEL, 'team.p.1 user.p.1')
+    client.release()
+
+    assert result_of(d_team) == {'name': 'old'}
+    assert result_of(d_users) == [{'name': 'old'}]
+    assert AsyncTeamCache._local_team_profiles.get('team.p.1') is None
+    assert AsyncTeamCache._local_user_profiles.get('user.p.1') is None
+
+
+def test_empty_team_groups_waits_for_delete():
+    client = _init_cache({'team.pg.1': {'10'}, 'team.sg.1': {'11'},
+                          'group.p.10': '{"group_id": 10}', 'group.p.11': '{"group_id": 11}'})
+    cache = AsyncTeamCache(1)
+    result_of(cache.get_group_profiles(10))
+
+    client.hold_commands = {'DEL'}
+    d = cache.empty_team_groups()
+
+    # 资料还没有删除：不通知，不删除群组列表
+    assert client.published == []
+    assert AsyncTeamCache._local_group_profiles.get('group.p.10') is not None
+    assert 'team.pg.1' in client.data
+
+    client.release()
+    assert result_of(d) == 2
+    assert client.published == [(AsyncTeamCache.INVALIDATION_CHANNEL, 'group.p.10 group.p.11')]
+    assert AsyncTeamCache._local_group_profiles.get('group.p.10') is None
+    assert client.data == {}
+
+
+def test_empty_team_groups_reports_errors():
+    client = _init_cache({'team.pg.1': {'10'}, 'group.p.10': '{"group_id": 10}'})
+    client.fail_commands = {'DEL'}
+
+    failure = result_of(AsyncTeamCache(1).empty_team_groups())
+    assert failure.check(ResponseError)
+    assert client.published == []
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+
+from gcommon.data.app.user_cache import AsyncUserCache
+from gcommon.data.cache.test.test_txcache import FakeRedisClient, create_pool, result_of
+from gcommon.utils.jsonobj import JsonObject
+
+
+def test_role_tokens():
+    client = FakeRedisClient()
+    AsyncUserCache.init_cache(create_pool(clients=[client]))
+    cache = AsyncUserCache()
+
+    assert result_of(cache.verify_role_token(1, 'admin', 2, 'secret', ['owner'])) is False
+
+    token = JsonObject()
+    token.token = 'secret'
+    token.roles = ['owner']
+    result_of(cache.update_or_add_role_token(1, 'admin', token, 2))
+
+    token = JsonObject()
+    token.token = 'secret'
+    token.roles = ['member']
+    result_of(cache.update_or_add_role_token(1, 'admin', token, 2))
+
+    # 保留已经缓存的角色
+    assert sorted(json.loads(client.data['atoken.1.sys.admin.2'])['roles']) == ['member', 'owner']
+    assert client.sent[-1][-2] == 'EX'
+
+    assert result_of(cache.verify_role_token(1, 'admin', 2, 'secret', ['owner'])) is True
+    assert result_of(cache.verify_role_token(1, 'admin', 2, 'other', ['owner'])) is False
+
+    assert result_of(cache.delete_role_token(1, 'admin', 2)) == 1
+    assert result_of(cache.get_role_token(1, 'admin', 2)) is None
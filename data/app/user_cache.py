@@ -5,9 +5,10 @@
 from gcommon.app import const
 from gcommon.utils.jsonobj import JsonObject
 from gcommon.data.cache.keyvalue import KeyValue
+from gcommon.data.cache.txcache import SyncCalls, DeferredCalls, AsyncKeyValue
 
 
-class UserCache(object):
+class UserCache(SyncCalls):
     """ Currently used only in Role based access control """
     def __init__(self):
         # stoken.<host_id>
@@ -15,10 +16,13 @@ class UserCache(object):
         # atoken.<host_id>.sys.<sys_name>.<sys_id>
         self._admin_token_template = 'atoken.%s.sys.%s.%s'
 
+    # 缓存对象的类型（AsyncUserCache 使用异步版本）
+    _KeyValue = KeyValue
+
     @classmethod
     def init_cache(cls, conn_user):
-        cls._auth_token_cache = KeyValue(conn_user, cls._encoder, cls._decoder)
-        cls._admin_token_cache = KeyValue(conn_user, cls._encoder, cls._decoder)
+        cls._auth_token_cache = cls._KeyValue(conn_user, cls._encoder, cls._decoder)
+        cls._admin_token_cache = cls._KeyValue(conn_user, cls._encoder, cls._decoder)
 
     @staticmethod
     def _encoder(token_context):
@@ -41,24 +45,26 @@ class UserCache(object):
 
     def add_auth_token(self, host_id, token_context):
         key = self._get_stoken_key_name(host_id)
-        self._auth_token_cache.set(key, token_context, const.AUTH_TOKEN_EXPIRATION)
+        return self._auth_token_cache.set(key, token_context, const.AUTH_TOKEN_EXPIRATION)
 
     def verify_auth_token(self, host_id, token_text):
         pass
 
     def verify_role_token(self, host_id, sub_sys_name, sub_sys_id, token, accepted_roles):
-        cached_token = self.get_role_token(host_id, sub_sys_name, sub_sys_id)
-        if not cached_token:
-            # No matching token in cache
-            return False
-        elif cached_token.token != token:
-            # Token value mismatched
-            return False
-        elif not set(accepted_roles).union(set(cached_token.roles)):
-            # No demanded roles
-            return False
-        else:
-            return True
+        def _verify(cached_token):
+            if not cached_token:
+                # No matching token in cache
+                return False
+            elif cached_token.token != token:
+                # Token value mismatched
+                return False
+            elif not set(accepted_roles).union(set(cached_token.roles)):
+                # No demanded roles
+                return False
+            else:
+                return True
+
+        return self._then(self.get_role_token(host_id, sub_sys_name, sub_sys_id), _verify)
 
     def get_role_token(self, host_id, sub_sys_name, sub_sys_id):
         key = self._get_atoken_key_name(host_id, sub_sys_name, sub_sys_id)
@@ -67,18 +73,25 @@ class UserCache(object):
     def update_or_add_role_token(self, host_id, sub_sys_name, token_context, sub_sys_id):
         key = self._get_atoken_key_name(host_id, sub_sys_name, sub_sys_id)
 
-        # Cached roles shouldn't be dropped
-        cached_token = self._admin_token_cache.get(key)
-        if cached_token:
-            valid_roles = list(set(cached_token.roles).union(set(token_context.roles)))
-            token_context.roles = valid_roles
+        def _update(cached_token):
+            # Cached roles shouldn't be dropped
+            if cached_token:
+                valid_roles = list(set(cached_token.roles).union(set(token_context.roles)))
+                token_context.roles = valid_roles
+
+            return self._admin_token_cache.set(key, token_context, const.ADMIN_TOKEN_EXPIRATION)
 
-        self._admin_token_cache.set(key, token_context, const.ADMIN_TOKEN_EXPIRATION)
+        return self._then(self._admin_token_cache.get(key), _update)
 
     def delete_role_token(self, host_id, sub_sys_name, sub_sys_id):
         key = self._get_atoken_key_name(host_id, sub_sys_name, sub_sys_id)
 
-        self._admin_token_cache.remove_keys(key)
+        return self._admin_token_cache.remove_keys(key)
+
+
+class AsyncUserCache(DeferredCalls, UserCache):
+    """UserCache 的异步版本：conn_user 为 TxRedisPool，所有方法返回 Deferred."""
+    _KeyValue = AsyncKeyValue
 
 
 if __name__ == "__main__":
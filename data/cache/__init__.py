@@ -64,6 +64,7 @@ conn_security = None
 
 sub_manager = None
 script_manager = None
+msg_cache_manager = None
 
 
 def _create_redis_connection(host, port, db_index):
@@ -104,10 +105,11 @@ def init(cfg, *args):
             g[g_db_name] = _create_redis_connection_from_config(cfg, db_conn)
 
 
-def init_subscriber(cfg):
+def init_subscriber(cfg, shards=1):
+    """shards: 订阅连接的个数，频道按照哈希值分配到各个连接上"""
     global sub_manager
 
-    sub_manager = SlimSubscriberManager()
+    sub_manager = SlimSubscriberManager(shards)
 
     server = cfg.get('redis.redis.server')
     port = cfg.get_int('redis.redis.port')
@@ -121,6 +123,23 @@ def init_subscriber(cfg):
     return d
 
 
+def init_msg_cacher(cfg, size=2):
+    global msg_cache_manager
+
+    msg_cache_manager = SlimMsgCacheManager(size)
+
+    server = cfg.get('redis.redis_message.server') or cfg.get('redis.redis.server')
+    port = cfg.get_int('redis.redis_message.port') or cfg.get_int('redis.redis.port')
+
+    assert server and port
+
+    d = msg_cache_manager.create_msg_cacher(server, port, Redis_DB_Message)
+
+    MessageCacher.set_cache_manager(msg_cache_manager)
+
+    return d
+
+
 def init_script_manger():
     global script_manager
     script_manager = SlimScriptsManager(conn_pub)
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""将多个缓存操作合并到一个 redis pipeline 中执行（一次网络往返）。
+
+    with team_profiles.batch() as b:
+        profile = b.on(team_profiles).get('team.p.1')
+        is_member = b.on(team_members).ismember('team.m.1', uid)
+        messages = b.on(team_messages).fetch('team.msg.1', 0, 0)
+
+    # 退出 with 语句时执行 pipeline，结果经过 decoder 处理
+    profile.value, is_member.value, messages.value
+
+KeyValue / Set / SortedSet 的同一个 batch 必须使用同一个 redis 连接。
+"""
+
+import copy
+
+import logging
+
+logger = logging.getLogger('redisbatch')
+
+
+class BatchNotExecuted(RuntimeError):
+    """batch 尚未执行，结果不可用"""
+
+
+class BatchResult(object):
+    """batch 中一个操作的结果，batch 执行后可用。"""
+    __slots__ = ('_value', '_error', 'ready')
+
+    def __init__(self):
+        self._value = None
+        self._error = None
+        self.ready = False
+
+    @property
+    def value(self):
+        if not self.ready:
+            raise BatchNotExecuted('redis batch has not been executed')
+
+        if self._error is not None:
+            raise self._error
+
+        return self._value
+
+    def _resolve(self, value):
+        self._value = value
+        self.ready = True
+
+    def _fail(self, error):
+        self._error = error
+        self.ready = True
+
+
+class RedisBatch(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.pipeline = conn.pipeline(transaction=False)
+
+        # [(BatchResult, command count, transform)]
+        self._operations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.pipeline.reset()
+            self._operations = []
+
+        return False
+
+    def __len__(self):
+        return len(self._operations)
+
+    def on(self, cache):
+        """返回缓存对象的一个副本，副本上的操作加入当前 batch，返回 BatchResult."""
+        if cache.conn is not self.conn:
+            raise ValueError('cache object uses a different redis connection')
+
+        bound = copy.copy(cache)
+        bound._batch = self
+        return bound
+
+    def add(self, transform, commands):
+        """加入一组命令：[(command, args, kwargs)]，执行后使用 transform(结果列表) 计算返回值"""
+        for command, args, kwargs in commands:
+            getattr(self.pipeline, command)(*args, **kwargs)
+
+        result = BatchResult()
+        self._operations.append((result, len(commands), transform))
+        return result
+
+    def execute(self):
+        operations, self._operations = self._operations, []
+        if not operations:
+            return
+
+        values = self.pipeline.execute(raise_on_error=False)
+        logger.debug('- RedisBatch execute, operations: %s, commands: %s', len(operations), len(values))
+
+        resolve_operations(operations, values)
+
+
+def resolve_operations(operations, values):
+    """operations: [(BatchResult, command count, transform)]，values: 所有命令的结果（出错的命令为异常对象）"""
+    index = 0
+    for result, count, transform in operations:
+        replies = values[index:index + count]
+        index += count
+
+        errors = [reply for reply in replies if isinstance(reply, Exception)]
+        if errors:
+            result._fail(errors[0])
+            continue
+
+        try:
+            result._resolve(transform(replies))
+        except Exception, e:
+            result._fail(e)
+
+
+class BatchableCache(object):
+    """KeyValue / Set / SortedSet 的基类：所有 redis 命令通过 _call / _call_many 发送。"""
+    _batch = None
+
+    def batch(self):
+        """创建一个使用当前 redis 连接的 batch."""
+        return RedisBatch(self.conn)
+
+    def _call(self, transform, command, *args, **kwargs):
+        """执行一个 redis 命令，返回 transform(结果)；在 batch 中时返回 BatchResult."""
+        if self._batch is not None:
+            return self._batch.add(lambda replies: transform(replies[0]), [(command, args, kwargs)])
+
+        return self._execute(transform, command, args, kwargs)
+
+    def _call_many(self, transform, commands):
+        """在一个 pipeline 中执行多个 redis 命令，返回 transform(结果列表)."""
+        if self._batch is not None:
+            return self._batch.add(transform, commands)
+
+        return self._execute_many(transform, commands)
+
+    def _execute(self, transform, command, args, kwargs):
+        return transform(getattr(self.conn, command)(*args, **kwargs))
+
+    def _execute_many(self, transform, commands):
+        pipeline = self.conn.pipeline()
+        for command, args, kwargs in commands:
+            getattr(pipeline, command)(*args, **kwargs)
+
+        return transform(pipeline.execute())
+
+
+def no_transform(result):
+    return result
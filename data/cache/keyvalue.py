@@ -4,10 +4,12 @@
 
 import logging
 
+from gcommon.data.cache.batch import BatchableCache, no_transform
+
 logger = logging.getLogger('rediskv')
 
 
-class KeyValue(object):
+class KeyValue(BatchableCache):
     # Messages and Team Profiles are saved in Key-Value pairs
 
     def __init__(self, redis_conn, encoder = None, decoder = None):
@@ -23,14 +25,16 @@ class KeyValue(object):
         else:
             value = item
 
-        self.conn.set(key, value, ex=expire)
+        return self._call(no_transform, 'set', key, value, ex=expire)
 
     def get(self, key):
-        item = self.conn.get(key)
+        return self._call(self._decode_item, 'get', key)
+
+    def _decode_item(self, item):
         if item and self.decoder:
             item = self.decoder(item)
 
-        #logger.debug('- KeyValue get, key:%s, item:%s', key, item)
+        #logger.debug('- KeyValue get, item:%s', item)
         return item
 
     def mset(self, keys, items):
@@ -41,36 +45,36 @@ class KeyValue(object):
             items = [self.encoder(item) for item in items]
 
         mapping = dict(zip(keys, items))
-        self.conn.mset(mapping)
-
-        return mapping
+        return self._call(lambda _: mapping, 'mset', mapping)
 
     def mget(self, *keys):
-        items = self.conn.mget(*keys)
+        return self._call(self._decode_items, 'mget', *keys)
 
+    def _decode_items(self, items):
         if items and self.decoder:
             items = [item and self.decoder(item) for item in items]
 
-        #logger.debug('- KeyValue mget, key:%s, item:%s', keys, items)
+        #logger.debug('- KeyValue mget, item:%s', items)
         return items
 
     def keys(self, pattern):
-        cached_keys = self.conn.keys(pattern)
-        return cached_keys
+        return self._call(no_transform, 'keys', pattern)
 
     def pttl(self, key):
-        return self.conn.pttl(key)
+        return self._call(no_transform, 'pttl', key)
 
     def pexpire(self, key, ttl):
-        return self.conn.pexpire(key, ttl)
+        return self._call(no_transform, 'pexpire', key, ttl)
 
     def remove_keys(self, *keys):
-        result = None
-        if keys:
-            result = self.conn.delete(*keys)
+        if not keys:
+            return self._call_many(lambda _: None, [])
+
+        def _on_removed(result):
+            logger.debug('- KeyValue remove_keys, keys: %s, result: %s', keys, result)
+            return result
 
-        logger.debug('- KeyValue remove_keys, keys: %s, result: %s', keys, result)
-        return result
+        return self._call(_on_removed, 'delete', *keys)
 
 
 def test():
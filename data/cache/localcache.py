@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""进程内缓存（L1）：容量有限的 LRU，缓存项有过期时间。
+
+用于读多写少的数据（比如团队、用户资料），减少访问 redis 和解析 JSON 的次数。
+缓存的对象被多个调用者共享，调用者不应修改返回的对象。
+
+异步加载时，加载期间 key 可能被删除（资料已修改），加载到的是旧数据，不能再写入缓存：
+
+    version = cache.version()
+    d = load(keys)
+    d.addCallback(lambda values: cache.set_many(keys, values, version))
+"""
+
+import time
+from collections import OrderedDict
+
+from gcommon.utils.gcounter import Counter
+
+
+class LocalCache(object):
+    def __init__(self, name, max_size=10000, ttl=60):
+        """
+        :param name: 缓存名称，计数器名称为 <name>.hit / <name>.miss / <name>.eviction
+        :param max_size: 最多缓存的对象个数
+        :param ttl: 缓存对象的过期时间（秒）
+        """
+        assert max_size > 0 and ttl > 0
+
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # key -> (expire time, value)
+        self._items = OrderedDict()
+
+        # 每次 remove / clear 加 1
+        self._version = 0
+
+        # key -> 最后一次删除时的 version，最多保存 max_size 个；
+        # 丢弃的记录以及 clear 合并到 _min_version：更早开始的加载都不写入缓存
+        self._removed = OrderedDict()
+        self._min_version = 0
+
+        self.hits = Counter.get('%s.hit' % name)
+        self.misses = Counter.get('%s.miss' % name)
+        self.evictions = Counter.get('%s.eviction' % name)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """返回缓存的对象；不存在或者已经过期时返回 None."""
+        item = self._items.pop(key, None)
+        if item is None:
+            self.misses.inc()
+            return None
+
+        expire_time, value = item
+        if expire_time < time.time():
+            self.misses.inc()
+            return None
+
+        # 移到队尾（最近使用）
+        self._items[key] = item
+        self.hits.inc()
+        return value
+
+    def get_many(self, keys):
+        """返回 (values, missing)：values 与 keys 一一对应（未命中为 None），missing 为未命中的 key 列表"""
+        values = [self.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+        return values, missing
+
+    def version(self):
+        """开始加载之前取得，传给 set / set_many"""
+        return self._version
+
+    def _is_stale(self, key, version):
+        return version < self._min_version or self._removed.get(key, -1) > version
+
+    def set(self, key, value, version=None):
+        """
+        :param version: 开始加载时的 version()：加载期间 key 被删除时不写入
+        """
+        if value is None:
+            return
+
+        if version is not None and self._is_stale(key, version):
+            return
+
+        self._items.pop(key, None)
+        self._items[key] = (time.time() + self.ttl, value)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions.inc()
+
+    def set_many(self, keys, values, version=None):
+        for key, value in zip(keys, values):
+            self.set(key, value, version)
+
+    def remove(self, *keys):
+        if not keys:
+            return
+
+        self._version += 1
+        for key in keys:
+            self._items.pop(key, None)
+
+            self._removed.pop(key, None)
+            self._removed[key] = self._version
+
+        while len(self._removed) > self.max_size:
+            _, version = self._removed.popitem(last=False)
+            self._min_version = max(self._min_version, version)
+
+    def clear(self):
+        self._items.clear()
+
+        self._version += 1
+        self._removed.clear()
+        self._min_version = self._version
@@ -1,6 +1,23 @@
-from twisted.internet import reactor, protocol
-from twisted.internet.defer import inlineCallbacks
-from txredis.client import RedisClient
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""消息缓存：使用 txredis 连接池异步读写聊天消息。
+
+    manager = SlimMsgCacheManager(size=4)
+    yield manager.create_msg_cacher(server, port, Redis_DB_Message)
+
+    yield manager.mset({'msg.1': content1, 'msg.2': content2}, expire=3600)
+    contents = yield manager.mget(['msg.1', 'msg.2', 'msg.3'])     # [content1, content2, None]
+"""
+
+import logging
+
+from twisted.internet import defer
+
+from gcommon.data.cache.txpool import TxRedisPool
+
+logger = logging.getLogger('msgcache')
+
 
 class MessageCacher(object):
     _MsgCache_Manager = None
@@ -19,37 +36,92 @@ class MessageCacher(object):
     msg.created
     """
 
+
+def _is_ok(reply):
+    return reply == 'OK'
+
+
 class SlimMsgCacheManager(object):
-    def __init__(self):
-        self.cacher = None
+    """
+    :param size: redis 连接个数
+    :param policy: 连接选择策略，TxRedisPool.LEAST_BUSY 或者 TxRedisPool.ROUND_ROBIN
+    """
+    # 一个 MGET 命令最多包含的 key 个数，更多的 key 拆分后在多个连接上并行发送
+    MGET_CHUNK_SIZE = 200
 
-    def create_msg_cacher(self, server, port, db = None):
-        client_creator = protocol.ClientCreator(reactor, SlimMessageCacher, manager = self, db = db)
-        d = client_creator.connectTCP(server, port)
+    def __init__(self, size=2, policy=TxRedisPool.LEAST_BUSY):
+        self.size = size
+        self.policy = policy
+        self.pool = None
 
-        d.addCallback(self._set_redis_msg_cacher, self._connection_failed)
+    def create_msg_cacher(self, server, port, db=None, password=None):
+        """连接 redis 服务器，返回的 Deferred 在第一个连接可用时触发。断线后自动重连。"""
+        assert self.pool is None
 
-    def _set_redis_msg_cacher(self, cacher, _):
-        self.cacher = cacher
-        return cacher
+        self.pool = TxRedisPool(server, port, db=db, password=password, size=self.size, policy=self.policy)
+        return self.pool.start()
 
-    def _connection_failed(self, reason):
-        # TODO: retry
-        pass
+    def stop(self):
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
 
-class SlimMessageCacher(RedisClient):
-    def __init__(self, manager, *args, **kws):
-        super(SlimMessageCacher, self).__init__(*args, **kws)
-        self.manager = manager
+    def is_connected(self):
+        return self.pool is not None and self.pool.connected_count() > 0
 
-    @inlineCallbacks
-    def set(self, key, value, preserve=False, getset=False, expire=None):
-        super(SlimMessageCacher, self).set(key, value, preserve, getset, expire)
+    def set(self, key, value, expire=None):
+        d = self.pool.execute_command('set', key, value, ex=expire)
+        d.addCallback(_is_ok)
+        return d
 
-    @inlineCallbacks
     def get(self, key):
-        super(SlimMessageCacher, self).get(key)
+        return self.pool.execute_command('get', key)
+
+    def mset(self, mapping, expire=None):
+        """写入多个 key. 指定 expire 时，在同一个连接上连续发送多个 SET 命令（不等待响应）。"""
+        if not mapping:
+            return defer.succeed(True)
+
+        if not expire:
+            d = self.pool.execute_command('mset', mapping)
+            d.addCallback(_is_ok)
+            return d
+
+        commands = [('set', (key, value), {'ex': expire}) for key, value in mapping.iteritems()]
+
+        d = self.pool.execute_commands(commands)
+        d.addCallback(lambda replies: all(_is_ok(reply) for reply in replies))
+        return d
+
+    def mget(self, keys):
+        """返回与 keys 一一对应的结果列表，不存在的 key 对应 None."""
+        if not keys:
+            return defer.succeed([])
+
+        if len(keys) <= self.MGET_CHUNK_SIZE:
+            return self.pool.execute_command('mget', keys)
+
+        chunks = [keys[i:i + self.MGET_CHUNK_SIZE] for i in xrange(0, len(keys), self.MGET_CHUNK_SIZE)]
+        deferreds = [self.pool.execute_command('mget', chunk) for chunk in chunks]
+
+        d = defer.gatherResults(deferreds, consumeErrors=True)
+        d.addCallbacks(self._join_chunks, lambda failure: failure.value.subFailure)
+        return d
+
+    @staticmethod
+    def _join_chunks(results):
+        values = []
+        for result in results:
+            values.extend(result)
+        return values
+
+    def delete(self, *keys):
+        if not keys:
+            return defer.succeed(0)
+
+        return self.pool.execute_command('delete', *keys)
+
 
 # Test Codes
 if __name__ == "__main__":
-    print 'Done'
\ No newline at end of file
+    print 'Done'
@@ -5,52 +5,62 @@
 """Message subscriber"""
 
 import logging
-import fnmatch
 
 from gcommon.data.cache import SlimSubscriberManager
+from gcommon.data.cache.msgsub import MessageEnvelope, SlimRedisSubscriber, SlimRedisSubscriberFactory
+from gcommon.data.cache.patindex import PatternIndex
 
 logger = logging.getLogger('pubsub')
 
 
 class SlimPatternSubscriberManager(SlimSubscriberManager):
-    """Connection resume and clients management."""
-    def __init__(self):
-        SlimSubscriberManager.__init__(self)
+    """Connection resume and clients management.
 
-    def on_connected(self):
-        """Connection resumed. Try re-subscribe all channels."""
-        logger.info('connection to redis resumed')
-        for chid in self.clients.iterkeys():
-            self.subscriber.psubscribe(chid)
+    self.clients 的 key 为订阅的模式。
+    """
+    _subscribe_command = 'psubscribe'
+    _unsubscribe_command = 'punsubscribe'
 
-    def on_message(self, channel_id, message):
-        """Broad the incoming message to all clients which have subscription
-        on the channel."""
-        logger.access('-- SlimPatternSubscriberManager subscribe, channel_id: %s, message: %s', channel_id, message)
+    def __init__(self, shards=1):
+        SlimSubscriberManager.__init__(self, shards)
+
+        # 已订阅的模式，用于查找与频道匹配的所有模式
+        self._pattern_index = PatternIndex()
 
-        clients = None
-        for key in self.clients.iterkeys():
-            # redis 仅支持 glob-style 的正则
-            if fnmatch.fnmatchcase(channel_id, key):
-                clients = self.clients.get(key, None)
-                break
+    def get_matched_patterns(self, channel_id):
+        """已订阅的模式中与 channel_id 匹配的模式"""
+        return self._pattern_index.match(channel_id)
 
+    def on_pattern_message(self, pattern, channel_id, message):
+        """redis 为每个匹配的模式发送一条 pmessage，只需发送给订阅了该模式的客户端。"""
+        logger.access('-- SlimPatternSubscriberManager message, pattern: %s, channel_id: %s, message: %s',
+                      pattern, channel_id, message)
+
+        clients = self.clients.get(pattern, None)
         if clients is None:
             return
 
-        bad_clients = []
-        for client in clients:
-            if client.is_alive():
-                client.on_sub_notification(channel_id, message)
-            else:
-                bad_clients.append(client)
+        self._dispatch(pattern, clients, MessageEnvelope(channel_id, message, self.message_decoder))
 
-        for client in bad_clients:
-            clients.remove(client)
+    def on_message(self, channel_id, message):
+        """Broad the incoming message to all clients which have subscription
+        on the channel.
 
-        if not clients:
-            del self.clients[channel_id]
-            self.subscriber.punsubscribe(channel_id)
+        没有模式信息时，发送给所有匹配模式的客户端（每个客户端只发送一次）。
+        """
+        logger.access('-- SlimPatternSubscriberManager message, channel_id: %s, message: %s', channel_id, message)
+
+        envelope = MessageEnvelope(channel_id, message, self.message_decoder)
+
+        notified = set()
+        for pattern in self._pattern_index.match(channel_id):
+            clients = self.clients.get(pattern, None)
+            if clients is not None:
+                self._dispatch(pattern, clients, envelope, notified)
+
+    def _remove_channel(self, pattern):
+        del self.clients[pattern]
+        self._pattern_index.remove(pattern)
 
     def subscribe(self, client, channel_id):
         """Subscribe to a chid.
@@ -69,14 +79,18 @@ class SlimPatternSubscriberManager(SlimSubscriberManager):
         if not clients:
             clients = set()
             self.clients[channel_id] = clients
+            self._pattern_index.add(channel_id)
 
             need_subscribe = True
 
         clients.add(client)
 
         if need_subscribe:
-            # this function return None
-            self.subscriber.psubscribe(channel_id)
+            if self._cancel_pending_unsubscribe(channel_id):
+                # 取消订阅请求尚未发送，模式仍处于订阅状态
+                return True
+
+            self._queue_subscribe(channel_id)
             logger.debug('SlimSubscriberManger need subscribe')
             return False
 
@@ -102,30 +116,47 @@ class SlimPatternSubscriberManager(SlimSubscriberManager):
 
         if not clients:
             # no client subscribed on this channel...
-            del self.clients[channel_id]
+            self._remove_channel(channel_id)
 
             if channel_id in self._subscribed_channels:
                 # the channel maybe is under subscribing - ignore it
-                self.subscriber.punsubscribe(channel_id)
+                self._queue_unsubscribe(channel_id)
 
     def channel_subscribed(self, channel_id, num):
         logger.debug('-- SlimPatternSubscriberManager channel_subscribed, channel_id: %s, num: %s', channel_id, num)
         self._subscribed_channels.add(channel_id)
+        self._pending_acks.discard(channel_id)
 
         clients = self.clients.get(channel_id, None)
 
         if not clients:
-            self.subscriber.punsubscribe(channel_id)
+            self._queue_unsubscribe(channel_id)
             logger.debug('-- SlimPatternSubscriberManager channel_subscribed, after punsub')
             if clients is not None:
-                del self.clients[channel_id]
+                self._remove_channel(channel_id)
         else:
             for client in clients:
                 client.on_sub_registered(channel_id)
 
     def channel_unsubscribed(self, channel_id, _num):
         self._subscribed_channels.remove(channel_id)
-        
+
+    def _build_factory(self, db):
+        return SlimRedisPatternSubscriberFactory(manager=self, db=db)
+
+
+class SlimRedisPatternSubscriber(SlimRedisSubscriber):
+    """pmessage 连同匹配的模式一起交给 manager."""
+    def handleCompleteMultiBulkData(self, reply):
+        if reply[0] == u"pmessage":
+            pattern, channel_id, message = reply[1:]
+            self.manager.on_pattern_message(pattern, channel_id, message)
+        else:
+            SlimRedisSubscriber.handleCompleteMultiBulkData(self, reply)
+
+
+class SlimRedisPatternSubscriberFactory(SlimRedisSubscriberFactory):
+    protocol = SlimRedisPatternSubscriber
 
 # Test Codes
 if __name__ == "__main__":
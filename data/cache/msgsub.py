@@ -5,11 +5,14 @@
 """Message subscriber"""
 
 import logging
+import zlib
 
 from twisted.internet import reactor
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, gatherResults
 from txredis.client import RedisSubscriber, RedisSubscriberFactory
 
+from gcommon.utils.gjsonobj import JsonObject
+
 
 logger = logging.getLogger('pubsub')
 
@@ -17,9 +20,36 @@ logger = logging.getLogger('pubsub')
 class BadSubscriptionStatus(Exception): pass
 
 
+class MessageEnvelope(object):
+    """一条订阅消息，由频道的所有客户端共享。
+
+    decoded 在第一次访问时解码（每条消息只解码一次），客户端不应修改解码后的对象。
+    """
+    __slots__ = ('channel_id', 'raw', '_decoder', '_decoded')
+
+    _NOT_DECODED = object()
+
+    def __init__(self, channel_id, raw, decoder):
+        self.channel_id = channel_id
+        self.raw = raw
+
+        self._decoder = decoder
+        self._decoded = self._NOT_DECODED
+
+    @property
+    def decoded(self):
+        if self._decoded is self._NOT_DECODED:
+            self._decoded = self._decoder(self.raw)
+
+        return self._decoded
+
+
 class ChannelSubscriber(object):
     """Redis Channel Subscriber"""
     _Sub_Manager = None
+
+    # True: 收到消息时调用 on_sub_envelope，否则调用 on_sub_notification
+    receive_envelope = False
     
     @classmethod
     def set_sub_manager(cls, sub_manager):
@@ -68,6 +98,10 @@ class ChannelSubscriber(object):
     def on_sub_notification(self, channel_id, message):
         """Received a new message from the target channel."""
         raise NotImplemented('for sub-class')    
+
+    def on_sub_envelope(self, envelope):
+        """Received a new message (MessageEnvelope) from the target channel."""
+        raise NotImplemented('for sub-class')
         
     def on_sub_registered(self, channel_id):
         """Subscription on one channel has been resumed."""
@@ -86,27 +120,160 @@ class ChannelSubscriber(object):
 
 
 class SlimSubscriberManager(object):
-    """Connection resume and clients management."""
-    def __init__(self):        
+    """Connection resume and clients management.
+
+    shards > 1 时使用多个订阅连接，频道按照 crc32(channel_id) 分配到各个连接上。
+    每个连接独立重连，重连后只重新订阅该连接上的频道。
+
+    同一次 reactor 循环中的订阅、取消订阅请求合并为多频道的 SUBSCRIBE / UNSUBSCRIBE 命令发送。
+    redis 对每个频道分别确认，因此 channel_subscribed 仍然按频道触发。
+    """
+    # 一个 SUBSCRIBE / UNSUBSCRIBE 命令最多包含的频道个数
+    COMMAND_CHUNK_SIZE = 500
+
+    # 订阅连接上的命令（SlimPatternSubscriberManager 使用 psubscribe / punsubscribe）
+    _subscribe_command = 'subscribe'
+    _unsubscribe_command = 'unsubscribe'
+
+    # MessageEnvelope.decoded 使用的解码函数
+    message_decoder = staticmethod(JsonObject.loads)
+
+    def __init__(self, shards=1):
+        assert shards > 0
+
         # {channel_id : [channels]} 
         self.clients = {}
+
+        # 第一个分片的连接
         self.subscriber = None
-        
+
+        self.shards = shards
+        self.subscribers = [None] * shards
+
         self._subscribed_channels = set()
 
-    def on_connected(self):
+        # 等待发送的订阅、取消订阅请求（每个分片一个集合）
+        self._pending_subscribe = [set() for _ in xrange(shards)]
+        self._pending_unsubscribe = [set() for _ in xrange(shards)]
+        self._flush_call = None
+
+        # 已经发送 SUBSCRIBE，尚未收到确认的频道
+        self._pending_acks = set()
+
+        # 存在失效客户端的频道，在之后的 reactor 循环中清理
+        self._dirty_channels = set()
+        self._compact_call = None
+
+    def get_shard(self, channel_id):
+        if self.shards == 1:
+            return 0
+
+        return (zlib.crc32(channel_id) & 0xffffffff) % self.shards
+
+    def _get_subscriber(self, channel_id):
+        return self.subscribers[self.get_shard(channel_id)]
+
+    def _shard_channels(self, shard):
+        if self.shards == 1:
+            return self.clients.keys()
+
+        return [chid for chid in self.clients.iterkeys() if self.get_shard(chid) == shard]
+
+    def pending_acks(self):
+        """已发送订阅请求、尚未收到确认的频道个数"""
+        return len(self._pending_acks)
+
+    def _queue_subscribe(self, channel_id):
+        if channel_id in self._pending_acks:
+            # 订阅请求已经发送，等待确认即可
+            return
+
+        self._pending_subscribe[self.get_shard(channel_id)].add(channel_id)
+        self._schedule_flush()
+
+    def _queue_unsubscribe(self, channel_id):
+        shard = self.get_shard(channel_id)
+        if channel_id in self._pending_subscribe[shard]:
+            # 订阅请求尚未发送
+            self._pending_subscribe[shard].remove(channel_id)
+            return
+
+        self._pending_unsubscribe[shard].add(channel_id)
+        self._schedule_flush()
+
+    def _cancel_pending_unsubscribe(self, channel_id):
+        """取消尚未发送的取消订阅请求。返回 True 表示频道仍处于订阅状态。"""
+        pending = self._pending_unsubscribe[self.get_shard(channel_id)]
+        if channel_id not in pending:
+            return False
+
+        pending.remove(channel_id)
+        return True
+
+    def _schedule_flush(self):
+        if self._flush_call is None:
+            self._flush_call = reactor.callLater(0, self.flush_commands)
+
+    def flush_commands(self):
+        """发送等待中的订阅、取消订阅请求。"""
+        if self._flush_call is not None:
+            if self._flush_call.active():
+                self._flush_call.cancel()
+            self._flush_call = None
+
+        for shard in xrange(self.shards):
+            # 等待期间所有客户端都已经取消订阅的频道不再订阅
+            channels = [chid for chid in self._pending_subscribe[shard] if self.clients.get(chid)]
+            unsubscribe_channels = list(self._pending_unsubscribe[shard])
+
+            self._pending_subscribe[shard].clear()
+            self._pending_unsubscribe[shard].clear()
+
+            subscriber = self.subscribers[shard]
+            if subscriber is None:
+                # 连接建立后会重新订阅所有频道
+                continue
+
+            self._pending_acks.update(channels)
+
+            self._send_in_chunks(getattr(subscriber, self._subscribe_command), channels)
+            self._send_in_chunks(getattr(subscriber, self._unsubscribe_command), unsubscribe_channels)
+
+    def _send_in_chunks(self, command, channels):
+        for i in xrange(0, len(channels), self.COMMAND_CHUNK_SIZE):
+            command(*channels[i:i + self.COMMAND_CHUNK_SIZE])
+
+    def on_connected(self, shard=0):
         """Connection resumed. Try re-subscribe all channels."""
-        logger.info('connection to redis resumed')
-        for chid in self.clients.iterkeys():
-            self.subscriber.subscribe(chid)
+        channels = self._shard_channels(shard)
+        logger.info('connection to redis resumed, shard: %s, channels: %s', shard, len(channels))
 
-    def on_disconnected(self):
+        for channel_id in channels:
+            self._queue_subscribe(channel_id)
+
+    def on_disconnected(self, shard=0):
         """Connection to redis server has been closed somehow, so we will not
         be able to send push notification to clients."""
-        logger.critical('connection to REDIS lost!!!!')
-        self._subscribed_channels = set()
-        for _channel_id, clients in self.clients.iteritems():
-            for client in clients:
+        logger.critical('connection to REDIS lost!!!! shard: %s', shard)
+
+        # 连接恢复（_set_redis_subscriber）之前 flush_commands 跳过该分片，on_connected 重新订阅所有频道
+        self.subscribers[shard] = None
+        if shard == 0:
+            self.subscriber = None
+
+        self._pending_subscribe[shard].clear()
+        self._pending_unsubscribe[shard].clear()
+
+        if self.shards == 1:
+            self._subscribed_channels = set()
+            self._pending_acks = set()
+        else:
+            self._subscribed_channels = set(chid for chid in self._subscribed_channels
+                                            if self.get_shard(chid) != shard)
+            self._pending_acks = set(chid for chid in self._pending_acks if self.get_shard(chid) != shard)
+
+        for channel_id in self._shard_channels(shard):
+            for client in self.clients[channel_id]:
                 client.on_sub_disconnected()
         
     def on_message(self, channel_id, message):
@@ -115,20 +282,56 @@ class SlimSubscriberManager(object):
         clients = self.clients.get(channel_id, None)
         if clients is None:
             return
-        
-        bad_clients = []
+
+        self._dispatch(channel_id, clients, MessageEnvelope(channel_id, message, self.message_decoder))
+
+    def _dispatch(self, channel_id, clients, envelope, notified=None):
+        """发送给 clients 中的所有客户端（notified 中的客户端除外）。
+
+        失效的客户端暂时跳过，由 compact_clients 统一删除。
+        """
+        has_dead_clients = False
         for client in clients:
-            if client.is_alive():
-                client.on_sub_notification(channel_id, message)
+            if notified is not None:
+                if client in notified:
+                    continue
+                notified.add(client)
+
+            if not client.is_alive():
+                has_dead_clients = True
+            elif client.receive_envelope:
+                client.on_sub_envelope(envelope)
             else:
-                bad_clients.append(client)
-                
-        for client in bad_clients:
-            clients.remove(client)
+                client.on_sub_notification(envelope.channel_id, envelope.raw)
+
+        if has_dead_clients:
+            self._dirty_channels.add(channel_id)
+            if self._compact_call is None:
+                self._compact_call = reactor.callLater(0, self.compact_clients)
+
+    def compact_clients(self):
+        """删除失效的客户端；频道没有客户端时取消订阅。"""
+        if self._compact_call is not None:
+            if self._compact_call.active():
+                self._compact_call.cancel()
+            self._compact_call = None
+
+        dirty_channels, self._dirty_channels = self._dirty_channels, set()
+        for channel_id in dirty_channels:
+            clients = self.clients.get(channel_id, None)
+            if not clients:
+                continue
+
+            clients.difference_update([client for client in clients if not client.is_alive()])
+            if clients:
+                continue
+
+            self._remove_channel(channel_id)
+            if channel_id in self._subscribed_channels:
+                self._queue_unsubscribe(channel_id)
 
-        if not clients:
-            del self.clients[channel_id]
-            self.subscriber.unsubscribe(channel_id)
+    def _remove_channel(self, channel_id):
+        del self.clients[channel_id]
 
     def subscribe(self, client, channel_id):
         """Subscribe to a chid.
@@ -151,8 +354,11 @@ class SlimSubscriberManager(object):
         clients.add(client)
         
         if need_subscribe:
-            # this function return None
-            self.subscriber.subscribe(channel_id)
+            if self._cancel_pending_unsubscribe(channel_id):
+                # 取消订阅请求尚未发送，频道仍处于订阅状态
+                return True
+
+            self._queue_subscribe(channel_id)
             return False
 
         elif channel_id in self._subscribed_channels:
@@ -178,15 +384,16 @@ class SlimSubscriberManager(object):
 
             if channel_id in self._subscribed_channels:
                 # the channel maybe is under subscribing - ignore it
-                self.subscriber.unsubscribe(channel_id)
+                self._queue_unsubscribe(channel_id)
 
     def channel_subscribed(self, channel_id, num):
         self._subscribed_channels.add(channel_id)
-        
+        self._pending_acks.discard(channel_id)
+
         clients = self.clients.get(channel_id, None)
         
         if not clients:
-            self.subscriber.unsubscribe(channel_id)
+            self._queue_unsubscribe(channel_id)
             if clients is not None:   
                 del self.clients[channel_id]
         else:
@@ -202,15 +409,30 @@ class SlimSubscriberManager(object):
         #        client.on_sub_disconnected()
         
     def create_subscriber(self, server, port, db=None):
-        factory = SlimRedisSubscriberFactory(manager=self, db=db)
-        reactor.connectTCP(server, port, factory)
-        d = factory.deferred
-        d.addCallbacks(self._set_redis_subscriber, self._connection_failed)
+        """连接所有分片，返回的 Deferred 在所有分片都连接成功后触发。"""
+        deferreds = []
+        for shard in xrange(self.shards):
+            factory = self._build_factory(db)
+            factory.shard = shard
+            reactor.connectTCP(server, port, factory)
+
+            d = factory.deferred
+            d.addCallbacks(self._set_redis_subscriber, self._connection_failed)
+            deferreds.append(d)
+
+        if self.shards == 1:
+            return deferreds[0]
+
+        return gatherResults(deferreds, consumeErrors=True)
+
+    def _build_factory(self, db):
+        return SlimRedisSubscriberFactory(manager=self, db=db)
 
-        return d
-        
     def _set_redis_subscriber(self, subscriber):
-        self.subscriber = subscriber
+        self.subscribers[subscriber.shard] = subscriber
+        if subscriber.shard == 0:
+            self.subscriber = subscriber
+
         return subscriber
     
     def _connection_failed(self, reason):
@@ -220,18 +442,21 @@ class SlimSubscriberManager(object):
 
 class SlimRedisSubscriber(RedisSubscriber):
     """A connection for subscription."""
+    shard = 0
+
     def __init__(self, manager, *args, **kws):
         super(SlimRedisSubscriber, self).__init__(*args, **kws)
         self.manager = manager
 
     def connectionMade(self):
         RedisSubscriber.connectionMade(self)
+        self.shard = self.factory.shard
         self.manager._set_redis_subscriber(self)
-        self.manager.on_connected()
+        self.manager.on_connected(self.shard)
 
     def connectionLost(self, reason):
         RedisSubscriber.connectionLost(self, reason)
-        self.manager.on_disconnected()
+        self.manager.on_disconnected(self.shard)
         
     def messageReceived(self, channel_id, message):
         """Broad the incoming message to all clients which have subscription
@@ -254,6 +479,9 @@ class SlimRedisSubscriber(RedisSubscriber):
 class SlimRedisSubscriberFactory(RedisSubscriberFactory):
     protocol = SlimRedisSubscriber
 
+    # 连接所属的分片
+    shard = 0
+
 
 # Test Codes
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""大频道广播：每个客户端各自解码消息 vs 共享 MessageEnvelope
+
+Run: python msgsub_bench.py
+"""
+
+import json
+import time
+
+from gcommon.data.cache.msgsub import ChannelSubscriber, SlimSubscriberManager
+
+
+CLIENTS = 5000
+MESSAGES = 20
+
+MESSAGE = json.dumps({
+    'id': 123456789, 'sender': 10001, 'type': 1, 'target': 20001, 'target_type': 2,
+    'content': u'广播消息 ' * 50, 'status': 0, 'created': 1476777600,
+})
+
+
+class _FakeRedisSubscriber(object):
+    shard = 0
+
+    def subscribe(self, *channels):
+        pass
+
+    def unsubscribe(self, *channels):
+        pass
+
+
+class DecodingClient(ChannelSubscriber):
+    def on_sub_notification(self, channel_id, message):
+        json.loads(message)['content']
+
+
+class EnvelopeClient(ChannelSubscriber):
+    receive_envelope = True
+
+    def on_sub_envelope(self, envelope):
+        envelope.decoded['content']
+
+
+def bench(client_class):
+    manager = SlimSubscriberManager()
+    manager.message_decoder = json.loads
+    manager._set_redis_subscriber(_FakeRedisSubscriber())
+    ChannelSubscriber.set_sub_manager(manager)
+
+    for _ in xrange(CLIENTS):
+        client_class().subscribe('team.1')
+
+    manager.flush_commands()
+    manager.channel_subscribed('team.1', 1)
+
+    started = time.time()
+    for _ in xrange(MESSAGES):
+        manager.on_message('team.1', MESSAGE)
+
+    return (time.time() - started) / MESSAGES
+
+
+def main():
+    for client_class in (DecodingClient, EnvelopeClient):
+        print('%-16s %d clients: %7.2f ms/message' % (client_class.__name__, CLIENTS, bench(client_class) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""glob 模式索引：查找与频道名称匹配的所有订阅模式。
+
+模式按照字面前缀（第一个通配符 * ? [ 之前的部分）保存在前缀树中，剩余部分预先编译为正则表达式。
+查找时沿着频道名称遍历前缀树，只需检查前缀匹配的模式，而不必对每个模式执行 fnmatch.
+匹配规则与 fnmatch.fnmatchcase 相同。
+"""
+
+import fnmatch
+import re
+
+
+GLOB_CHARS = '*?['
+
+
+def literal_prefix(pattern):
+    """模式中第一个通配符之前的部分"""
+    for i, c in enumerate(pattern):
+        if c in GLOB_CHARS:
+            return pattern[:i]
+
+    return pattern
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'patterns')
+
+    def __init__(self):
+        self.children = {}
+
+        # 字面前缀在此结束的模式：pattern -> 编译后的正则
+        self.patterns = {}
+
+
+class PatternIndex(object):
+    def __init__(self):
+        self._root = _TrieNode()
+
+        # 不包含通配符的模式
+        self._literals = set()
+
+        self._patterns = set()
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern):
+        return pattern in self._patterns
+
+    def add(self, pattern):
+        if pattern in self._patterns:
+            return
+
+        self._patterns.add(pattern)
+
+        prefix = literal_prefix(pattern)
+        if prefix == pattern:
+            self._literals.add(pattern)
+            return
+
+        node = self._root
+        for c in prefix:
+            child = node.children.get(c)
+            if child is None:
+                child = node.children[c] = _TrieNode()
+            node = child
+
+        node.patterns[pattern] = re.compile(fnmatch.translate(pattern))
+
+    def remove(self, pattern):
+        if pattern not in self._patterns:
+            return
+
+        self._patterns.remove(pattern)
+
+        prefix = literal_prefix(pattern)
+        if prefix == pattern:
+            self._literals.discard(pattern)
+            return
+
+        # 记录路径，删除后清理空节点
+        path = [self._root]
+        for c in prefix:
+            node = path[-1].children.get(c)
+            if node is None:
+                return
+            path.append(node)
+
+        path[-1].patterns.pop(pattern, None)
+
+        for i in xrange(len(prefix) - 1, -1, -1):
+            node = path[i + 1]
+            if node.patterns or node.children:
+                break
+            del path[i].children[prefix[i]]
+
+    def match(self, channel):
+        """返回与 channel 匹配的所有模式"""
+        matched = [channel] if channel in self._literals else []
+
+        node = self._root
+        for i in xrange(len(channel) + 1):
+            for pattern, regex in node.patterns.iteritems():
+                if regex.match(channel):
+                    matched.append(pattern)
+
+            if i == len(channel):
+                break
+
+            node = node.children.get(channel[i])
+            if node is None:
+                break
+
+        return matched
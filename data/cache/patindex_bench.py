@@ -0,0 +1,53 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""模式匹配性能对比：逐个 fnmatch vs PatternIndex
+
+每个团队订阅一个模式 team.<id>.*，另有少量全局模式。
+
+Run: python patindex_bench.py
+"""
+
+import fnmatch
+import random
+import time
+
+from gcommon.data.cache.patindex import PatternIndex
+
+
+MESSAGES = 20000
+
+# fnmatch 只缓存 100 个编译后的模式，模式较多时非常慢，只测试少量消息
+LINEAR_MESSAGES = 200
+
+
+def bench(team_count):
+    patterns = ['team.%d.*' % i for i in xrange(team_count)] + ['system.*', 'user.*.status']
+    channels = ['team.%d.msg' % random.randint(0, team_count - 1) for _ in xrange(MESSAGES)]
+
+    started = time.time()
+    for channel in channels[:LINEAR_MESSAGES]:
+        [pattern for pattern in patterns if fnmatch.fnmatchcase(channel, pattern)]
+    linear_time = time.time() - started
+
+    index = PatternIndex()
+    for pattern in patterns:
+        index.add(pattern)
+
+    started = time.time()
+    for channel in channels:
+        index.match(channel)
+    index_time = time.time() - started
+
+    print('%5d patterns: fnmatch %8.2f us/msg, PatternIndex %6.2f us/msg' % (
+        len(patterns), linear_time * 1e6 / LINEAR_MESSAGES, index_time * 1e6 / MESSAGES))
+
+
+def main():
+    for team_count in (10, 100, 1000, 5000):
+        bench(team_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,12 @@
 
 import logging
 
+from gcommon.data.cache.batch import BatchableCache, no_transform
+
 logger = logging.getLogger('rediset')
 
 
-class Set(object):
+class Set(BatchableCache):
     # Presence info are saved in Key-Value pairs
 
     def __init__(self, redis_conn, encoder = None, decoder = None):
@@ -18,7 +20,7 @@ class Set(object):
     def add(self, key, *items):
         if not items:
             logger.debug('[] - Set add, key: %s, item is empty', key)
-            return
+            return self._call_many(lambda _: None, [])
 
         values = []
         for item in items:
@@ -28,7 +30,7 @@ class Set(object):
                 values.append(item)
 
         logger.debug('- Set add, key: %s, item: %s', key, values)
-        self.conn.sadd(key, *values)
+        return self._call(no_transform, 'sadd', key, *values)
 
     def ismember(self, key, item):
         if self.encoder:
@@ -36,9 +38,11 @@ class Set(object):
         else:
             value = item
 
-        returnValue = self.conn.sismember(key, value)
-        logger.debug('- Set ismember, key: %s, item: %s',  key, returnValue)
-        return returnValue
+        def _on_result(returnValue):
+            logger.debug('- Set ismember, key: %s, item: %s',  key, returnValue)
+            return returnValue
+
+        return self._call(_on_result, 'sismember', key, value)
 
     def remove(self, key, *items):
         values = []
@@ -49,36 +53,38 @@ class Set(object):
                 values.append(item)
 
         logger.debug('- Set remove, key: %s, item: %s', key, values)
-        return self.conn.srem(key, *values)
+        return self._call(no_transform, 'srem', key, *values)
 
     def get_all(self, key):
-        items = self.conn.smembers(key)
-        if items:
-            if self.decoder:
-                result = list(self.decoder(x) for x in items)
+        def _decode_items(items):
+            if items:
+                if self.decoder:
+                    result = list(self.decoder(x) for x in items)
+                else:
+                    result = list(items)
             else:
                 result = list(items)
-        else:
-            result = list(items)
-        logger.debug('- Set get_all, key: %s, item: %s', key, result)
-        return result
+            logger.debug('- Set get_all, key: %s, item: %s', key, result)
+            return result
+
+        return self._call(_decode_items, 'smembers', key)
 
     def count(self, *keys):
-        pipeline = self.conn.pipeline()
-        for key in keys:
-            pipeline.scard(key)
+        def _on_counts(counts):
+            logger.debug('- Set count, keys: %s, counts: %s', keys, counts)
+            return counts
 
-        counts = pipeline.execute()
-        logger.debug('- Set count, keys: %s, counts: %s', keys, counts)
-        return counts
+        return self._call_many(_on_counts, [('scard', (key,), {}) for key in keys])
 
     def remove_keys(self, *keys):
-        result = None
-        if keys:
-            result = self.conn.delete(*keys)
+        if not keys:
+            return self._call_many(lambda _: None, [])
+
+        def _on_removed(result):
+            logger.debug('- Set remove_keys, keys: %s, result: %s', keys, result)
+            return result
 
-        logger.debug('- Set remove_keys, keys: %s, result: %s', keys, result)
-        return result
+        return self._call(_on_removed, 'delete', *keys)
 
 
 def test():
@@ -4,10 +4,12 @@
 
 import logging
 
+from gcommon.data.cache.batch import BatchableCache, no_transform
+
 logger = logging.getLogger('redisrts')
 
 
-class SortedSet(object):
+class SortedSet(BatchableCache):
     """Item list is saved in a sorted sets."""
     MAX_SCORE = 0xffffffff    
     MAX_ITEMS_WITHIN_ONE_FETCH = 50
@@ -31,11 +33,9 @@ class SortedSet(object):
         else:
             value = item
 
-        self.conn.zadd(key, value, score)
-
         # return encoded string for convenience of redis publish
         logger.debug('[%06x] - SortedSet append, key: %s, item: %s, score: %s', 0, key, value, score)
-        return value
+        return self._call(lambda _: value, 'zadd', key, value, score)
 
     def append_with_score(self, key, item, item_score):
         if self.encoder:
@@ -44,7 +44,7 @@ class SortedSet(object):
             value = item
 
         logger.debug('[%06x] - SortedSet append_with_score, key: %s, item: %s, score: %s', 0, key, value, item_score)
-        self.conn.zadd(key, value, item_score)
+        return self._call(no_transform, 'zadd', key, value, item_score)
 
     def append_items(self, key, items):
         params = []
@@ -60,14 +60,13 @@ class SortedSet(object):
             params.append(score)
 
         logger.debug('[%06x] - SortedSet append_items, key:%s, params:%s', 0, key, params)
-        self.conn.zadd(key, *params)
+        return self._call(no_transform, 'zadd', key, *params)
 
     def append_items_with_multi_keys(self, keys, items):
-        pipeline = self.conn.pipeline()
-
         # 每个key，对应一个item，只能为同一个key追加一个item
         assert len(keys) == len(items)
 
+        commands = []
         encoded_values = []
         for i, key in enumerate(keys):
             item = items[i]
@@ -78,101 +77,97 @@ class SortedSet(object):
             else:
                 value = item
 
-            pipeline.zadd(key, value, score)
+            commands.append(('zadd', (key, value, score), {}))
             encoded_values.append(value)
 
-        pipeline.execute()
-
-        return encoded_values
+        return self._call_many(lambda _: encoded_values, commands)
 
     def _get_item_by_index(self, key, index):
-        items = self.conn.zrange(key, index, index)
-        assert(len(items) <= 1)
+        def _decode_item(items):
+            assert(len(items) <= 1)
 
-        logger.debug('[%06x] - SortedSet _get_item_by_index, key: %s, index: %s, items: %s', 0, key, index, items)
+            logger.debug('[%06x] - SortedSet _get_item_by_index, key: %s, index: %s, items: %s',
+                         0, key, index, items)
 
-        if items:
-            if self.decoder:
-                return self.decoder(items[0])
-            else:
-                return items[0]
+            if items:
+                if self.decoder:
+                    return self.decoder(items[0])
+                else:
+                    return items[0]
 
-        return None
+            return None
 
-    def get_first_item(self, key):
-        item = self._get_item_by_index(key, 0)
+        return self._call(_decode_item, 'zrange', key, index, index)
 
-        logger.debug('[%06x] - SortedSet get_first_item, key: %s, item: %s', 0, key, item)
-        return item
+    def get_first_item(self, key):
+        return self._get_item_by_index(key, 0)
 
     def get_last_item(self, key):
-        item = self._get_item_by_index(key, -1)
-        logger.debug('[%06x] - SortedSet get_last_item, key: %s, item: %s', 0, key, item)
-        return item
+        return self._get_item_by_index(key, -1)
 
     def get_last_item_score(self, *keys):
-        pipeline = self.conn.pipeline()
-        for key in keys:
-            pipeline.zrange(key, -1, -1, withscores=True)
+        def _get_scores(items):
+            # item -> [(value, score), ...] for every key
+            # item[0] -> (value, score)
+            # item[0][1] -> score
+            scores = [int(item[0][1]) if item else 0 for item in items]
+            logger.debug('[%06x] - SortedSet get_last_item_score, keys: %s, scores: %s', 0, keys, scores)
 
-        items = pipeline.execute()
-        # item -> [(value, score), ...] for every key
-        # item[0] -> (value, score)
-        # item[0][1] -> score
-        scores = [int(item[0][1]) if item else 0 for item in items]
-        logger.debug('[%06x] - SortedSet get_last_item_score, keys: %s, scores: %s', 0, keys, scores)
+            return scores
 
-        return scores
+        commands = [('zrange', (key, -1, -1), {'withscores': True}) for key in keys]
+        return self._call_many(_get_scores, commands)
 
     def fetch(self, key, min_, max_, count=None, reverse=False):
         max_ = max_ or self.max_score
         count = count or self.max_items_within_one_fetch
 
-        if reverse:
-            items = self.conn.zrevrangebyscore(key, max_, min_, 0, count)
-        else:
-            items = self.conn.zrangebyscore(key, min_, max_, 0, count)
+        def _decode_items(items):
+            logger.debug('[%06x] - SortedSet fetch, key: %s, min: %s, max: %s, num: %s, item: %s',
+                         0, key, min_, max_, count, items)
 
-        logger.debug('[%06x] - SortedSet fetch, key: %s, min: %s, max: %s, num: %s, item: %s',
-                     0, key, min_, max_, count, items)
+            if self.decoder:
+                for i in range(len(items)):
+                    items[i] = self.decoder(items[i])
+                return items
+            else:
+                return items
 
-        if self.decoder:
-            for i in range(len(items)):
-                items[i] = self.decoder(items[i])
-            return items
+        if reverse:
+            return self._call(_decode_items, 'zrevrangebyscore', key, max_, min_, 0, count)
         else:
-            return items
+            return self._call(_decode_items, 'zrangebyscore', key, min_, max_, 0, count)
 
     def remove_by_score(self, key, score):
-        count = self.remove_by_scores(key, score, score)
+        def _on_removed(count):
+            logger.debug('[%06x] - SortedSet remove_by_score, key: %s, score: %s, count: %s', 0, key, score, count)
+            assert count == 1 or count == 0
+            return count
 
-        logger.debug('[%06x] - SortedSet remove_by_score, key: %s, score: %s, count: %s', 0, key, score, count)
-        assert count == 1 or count == 0
-        return count
+        return self._call(_on_removed, 'zremrangebyscore', key, score, score)
 
     def remove_by_scores(self, key, min_score, max_score):
-        count = self.conn.zremrangebyscore(key, min_score, max_score)
-        logger.debug('[%06x] - SortedSet remove_by_score, key: %s, min: %s, max: %s, count: %s',
-                     0, key, min_score, max_score, count)
+        def _on_removed(count):
+            logger.debug('[%06x] - SortedSet remove_by_score, key: %s, min: %s, max: %s, count: %s',
+                         0, key, min_score, max_score, count)
+
+            return count
 
-        return count
+        return self._call(_on_removed, 'zremrangebyscore', key, min_score, max_score)
 
     def count(self, *keys):
-        pipeline = self.conn.pipeline()
-        for key in keys:
-            pipeline.zcard(key)
+        def _on_counts(counts):
+            logger.debug('- Set count, keys: %s, counts: %s', keys, counts)
 
-        counts = pipeline.execute()
-        logger.debug('- Set count, keys: %s, counts: %s', keys, counts)
+            if len(keys) == 1:
+                return counts[0]
+            else:
+                return counts
 
-        if len(keys) == 1:
-            return counts[0]
-        else:
-            return counts
+        return self._call_many(_on_counts, [('zcard', (key,), {}) for key in keys])
 
     def key_exists(self, key):
-        result = self.conn.exists(key)
-        return result
+        return self._call(no_transform, 'exists', key)
 
 
 def test():
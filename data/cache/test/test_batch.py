@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+
+import pytest
+
+from gcommon.data.cache.batch import BatchNotExecuted
+from gcommon.data.cache.keyvalue import KeyValue
+from gcommon.data.cache.set import Set
+from gcommon.data.cache.sortedset import SortedSet
+
+
+class ResponseError(Exception):
+    pass
+
+
+class FakePipeline(object):
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+        self.reset_count = 0
+
+    def __getattr__(self, command):
+        def _queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return _queue
+
+    def reset(self):
+        self.commands = []
+        self.reset_count += 1
+
+    def execute(self, raise_on_error=True):
+        commands, self.commands = self.commands, []
+        self.redis.executed.append([command for command, _, _ in commands])
+
+        results = []
+        for command, args, kwargs in commands:
+            try:
+                results.append(getattr(self.redis, command)(*args, **kwargs))
+            except ResponseError, e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+
+        return results
+
+
+class FakeRedis(object):
+    """只实现测试用到的命令，sorted set 的 zadd 使用 redis-py 2.x 的 (value, score) 参数顺序"""
+
+    def __init__(self):
+        self.data = {}
+        self.executed = []
+        self.pipelines = []
+
+    def pipeline(self, transaction=True):
+        pipeline = FakePipeline(self)
+        self.pipelines.append(pipeline)
+        return pipeline
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        value = self.data.get(key)
+        if isinstance(value, (set, dict)):
+            raise ResponseError('WRONGTYPE')
+        return value
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def delete(self, *keys):
+        return len([self.data.pop(key) for key in keys if key in self.data])
+
+    def sadd(self, key, *values):
+        members = self.data.setdefault(key, set())
+        added = len(set(values) - members)
+        members.update(values)
+        return added
+
+    def sismember(self, key, value):
+        return value in self.data.get(key, ())
+
+    def scard(self, key):
+        return len(self.data.get(key, ()))
+
+    def zadd(self, key, *pairs):
+        scores = self.data.setdefault(key, {})
+        for i in range(0, len(pairs), 2):
+            scores[pairs[i]] = pairs[i + 1]
+        return len(pairs) / 2
+
+    def zcard(self, key):
+        return len(self.data.get(key, ()))
+
+    def zrangebyscore(self, key, min_, max_, start, num):
+        items = sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+        return [value for value, score in items if min_ <= score <= max_][start:start + num]
+
+
+def _caches():
+    r = FakeRedis()
+    profiles = KeyValue(r, json.dumps, json.loads)
+    members = Set(r)
+    messages = SortedSet(r, lambda item: item['seq'], json.dumps, json.loads)
+    return r, profiles, members, messages
+
+
+def test_commands_queued_and_executed_once():
+    r, profiles, members, messages = _caches()
+    profiles.set('team.p.1', {'name': 'dev'})
+    members.add('team.m.1', 'u1', 'u2')
+    messages.append_items('team.msg.1', [{'seq': 1}, {'seq': 2}])
+    del r.executed[:]
+
+    with profiles.batch() as b:
+        profile = b.on(profiles).get('team.p.1')
+        missing = b.on(profiles).mget('team.p.1', 'team.p.2')
+        is_member = b.on(members).ismember('team.m.1', 'u2')
+        counts = b.on(members).count('team.m.1', 'team.m.2')
+        fetched = b.on(messages).fetch('team.msg.1', 0, 0)
+
+        # 退出之前不执行
+        assert r.executed == [] and len(b) == 5
+        with pytest.raises(BatchNotExecuted):
+            profile.value
+
+    assert r.executed == [['get', 'mget', 'sismember', 'scard', 'scard', 'zrangebyscore']]
+
+    assert profile.value == {'name': 'dev'}
+    assert missing.value == [{'name': 'dev'}, None]
+    assert is_member.value is True
+    assert counts.value == [2, 0]
+    assert fetched.value == [{'seq': 1}, {'seq': 2}]
+
+    # batch 之外直接执行
+    assert profiles.get('team.p.1') == {'name': 'dev'}
+    assert messages.count('team.msg.1') == 2
+
+
+def test_errors_resolve_per_operation():
+    r, profiles, members, _ = _caches()
+    members.add('team.m.1', 'u1')
+    r.set('bad', 'not json')
+
+    with profiles.batch() as b:
+        wrong_type = b.on(profiles).get('team.m.1')
+        bad_json = b.on(profiles).get('bad')
+        ok = b.on(members).ismember('team.m.1', 'u1')
+
+    with pytest.raises(ResponseError):
+        wrong_type.value
+    with pytest.raises(ValueError):
+        bad_json.value
+    assert ok.value is True
+
+
+def test_exception_inside_block_discards_commands():
+    r, profiles, _, _ = _caches()
+    del r.executed[:]
+
+    with pytest.raises(KeyError):
+        with profiles.batch() as b:
+            result = b.on(profiles).set('team.p.1', {'name': 'dev'})
+            raise KeyError('abort')
+
+    assert r.executed == [] and r.data == {}
+    assert b.pipeline.reset_count == 1 and len(b) == 0
+    with pytest.raises(BatchNotExecuted):
+        result.value
+
+
+def test_batch_requires_same_connection():
+    _, profiles, _, _ = _caches()
+    other = KeyValue(FakeRedis())
+
+    with profiles.batch() as b:
+        with pytest.raises(ValueError):
+            b.on(other)
+
+    # 原来的对象不受影响
+    assert profiles._batch is None
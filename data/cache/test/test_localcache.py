@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.data.cache.localcache import LocalCache
+
+
+def test_lru_and_ttl():
+    cache = LocalCache('test.local', max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert cache.get_many(['a', 'b', 'c']) == ([1, None, 3], ['b'])
+
+    cache.ttl = -1
+    cache.set('d', 4)
+    assert cache.get('d') is None
+
+
+def test_skip_fill_invalidated_during_load():
+    cache = LocalCache('test.local', max_size=2)
+
+    version = cache.version()
+    cache.remove('a')
+    cache.set_many(['a', 'b'], ['old a', 'b'], version)
+    assert cache.get('a') is None and cache.get('b') == 'b'
+
+    # 删除之后开始的加载可以写入
+    cache.set('a', 'new a', cache.version())
+    assert cache.get('a') == 'new a'
+
+    version = cache.version()
+    cache.clear()
+    cache.set('b', 'old b', version)
+    assert cache.get('b') is None
+
+    # 删除记录超过 max_size 时，更早开始的加载都不写入
+    version = cache.version()
+    cache.remove('x')
+    cache.remove('y', 'z')
+    cache.set('c', 'old c', version)
+    assert cache.get('c') is None
+    cache.set('c', 'c', cache.version())
+    assert cache.get('c') == 'c'
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.data.cache.msgcache import SlimMsgCacheManager
+from gcommon.data.cache.test.test_txcache import FakeRedisClient, create_pool, result_of
+from gcommon.data.cache.txpool import TxRedisPool
+
+
+def _create_manager(data):
+    clients = [FakeRedisClient(data), FakeRedisClient(data)]
+
+    manager = SlimMsgCacheManager(size=2, policy=TxRedisPool.ROUND_ROBIN)
+    manager.pool = create_pool(policy=TxRedisPool.ROUND_ROBIN, clients=clients)
+    return manager, clients
+
+
+def _mget_sizes(clients):
+    return sorted(len(command) - 1 for client in clients for command in client.sent if command[0] == 'MGET')
+
+
+def test_mget_chunks():
+    size = SlimMsgCacheManager.MGET_CHUNK_SIZE
+    data = dict(('msg.%d' % i, 'content %d' % i) for i in range(0, 2 * size, 2))
+
+    for count, chunks in ((size - 1, [size - 1]), (size, [size]), (size + 1, [1, size])):
+        manager, clients = _create_manager(data)
+        keys = ['msg.%d' % i for i in range(count)]
+
+        values = result_of(manager.mget(keys))
+        assert _mget_sizes(clients) == chunks
+        assert values == [data.get(key) for key in keys]
+
+
+def test_mget_keeps_order_across_chunks():
+    size = SlimMsgCacheManager.MGET_CHUNK_SIZE
+    data = dict(('msg.%d' % i, 'content %d' % i) for i in range(3 * size))
+    manager, clients = _create_manager(data)
+
+    # 第一个块的结果最后返回
+    clients[1].hold_commands = {'MGET'}
+    keys = ['msg.%d' % i for i in range(3 * size - 10)]
+    d = manager.mget(keys)
+    clients[1].release()
+
+    assert _mget_sizes(clients) == [size - 10, size, size]
+    assert result_of(d) == [data[key] for key in keys]
+    assert SlimMsgCacheManager._join_chunks([[1, 2], [], [3]]) == [1, 2, 3]
+
+
+def test_set_get_delete():
+    data = {}
+    manager, clients = _create_manager(data)
+
+    assert result_of(manager.set('msg.1', 'a')) is True
+    assert result_of(manager.get('msg.1')) == 'a'
+
+    assert result_of(manager.mset({'msg.2': 'b', 'msg.3': 'c'})) is True
+    assert result_of(manager.mset({'msg.4': 'd'}, expire=60)) is True
+    assert ('SET', 'msg.4', 'd', 'EX', 60) in clients[0].sent + clients[1].sent
+
+    assert result_of(manager.delete('msg.1', 'msg.2')) == 2
+    assert sorted(data) == ['msg.3', 'msg.4']
+
+
+def test_empty_requests():
+    manager, clients = _create_manager({})
+
+    assert result_of(manager.mget([])) == []
+    assert result_of(manager.mset({})) is True
+    assert result_of(manager.delete()) == 0
+    assert clients[0].sent == [] and clients[1].sent == []
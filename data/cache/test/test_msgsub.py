@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.data.cache.msgsub import ChannelSubscriber, SlimSubscriberManager
+
+
+class FakeRedisSubscriber(object):
+    def __init__(self, shard):
+        self.shard = shard
+        self.subscribed = []
+        self.unsubscribed = []
+        self.commands = []
+
+    def subscribe(self, *channels):
+        self.commands.append(('subscribe', len(channels)))
+        self.subscribed.extend(channels)
+
+    def unsubscribe(self, *channels):
+        self.commands.append(('unsubscribe', len(channels)))
+        self.unsubscribed.extend(channels)
+
+
+class Client(ChannelSubscriber):
+    def __init__(self):
+        ChannelSubscriber.__init__(self)
+        self.messages = []
+        self.disconnected = 0
+
+    def on_sub_notification(self, channel_id, message):
+        self.messages.append((channel_id, message))
+
+    def on_sub_disconnected(self):
+        self.disconnected += 1
+
+
+def _create_manager(shards, channels):
+    manager = SlimSubscriberManager(shards)
+    for shard in range(shards):
+        manager._set_redis_subscriber(FakeRedisSubscriber(shard))
+
+    ChannelSubscriber.set_sub_manager(manager)
+
+    clients = {}
+    for channel_id in channels:
+        client = Client()
+        client.subscribe(channel_id)
+        clients[channel_id] = client
+
+    manager.flush_commands()
+    for channel_id in channels:
+        manager.channel_subscribed(channel_id, 1)
+
+    return manager, clients
+
+
+def test_channels_spread_across_shards():
+    channels = ['team.%d' % i for i in range(200)]
+    manager, clients = _create_manager(4, channels)
+
+    for subscriber in manager.subscribers:
+        assert subscriber.subscribed
+        assert all(manager.get_shard(channel_id) == subscriber.shard for channel_id in subscriber.subscribed)
+
+    assert sorted(sum([s.subscribed for s in manager.subscribers], [])) == sorted(channels)
+
+    manager.on_message('team.7', 'hello')
+    assert clients['team.7'].messages == [('team.7', 'hello')]
+
+    clients['team.7'].unsubscribe('team.7')
+    manager.flush_commands()
+    assert manager._get_subscriber('team.7').unsubscribed == ['team.7']
+
+
+def test_reconnect_one_shard():
+    channels = ['team.%d' % i for i in range(200)]
+    manager, clients = _create_manager(4, channels)
+    manager.COMMAND_CHUNK_SIZE = 10
+
+    shard_channels = [channel_id for channel_id in channels if manager.get_shard(channel_id) == 1]
+
+    manager.on_disconnected(1)
+    assert sum(client.disconnected for client in clients.itervalues()) == len(shard_channels)
+    assert len(manager._subscribed_channels) == len(channels) - len(shard_channels)
+
+    subscriber = FakeRedisSubscriber(1)
+    manager._set_redis_subscriber(subscriber)
+    manager.on_connected(1)
+    manager.flush_commands()
+    assert sorted(subscriber.subscribed) == sorted(shard_channels)
+    assert all(count <= 10 for _, count in subscriber.commands)
+    assert manager.pending_acks() == len(shard_channels)
+
+    # 其它分片不受影响
+    assert len(manager.subscribers[0].subscribed) == len([c for c in channels if manager.get_shard(c) == 0])
+
+
+def test_subscribe_while_disconnected():
+    manager, clients = _create_manager(1, ['a'])
+    old_subscriber = manager.subscriber
+
+    manager.on_disconnected()
+    assert manager.subscriber is None
+
+    # 连接断开期间订阅的频道不发送命令，连接恢复后与其它频道一起订阅
+    Client().subscribe('newch')
+    manager.flush_commands()
+    assert old_subscriber.subscribed == ['a']
+    assert manager.pending_acks() == 0
+
+    subscriber = FakeRedisSubscriber(0)
+    manager._set_redis_subscriber(subscriber)
+    manager.on_connected()
+    manager.flush_commands()
+    assert sorted(subscriber.subscribed) == ['a', 'newch']
+    assert manager.pending_acks() == 2
+
+
+def test_commands_coalesced():
+    channels = ['team.%d' % i for i in range(120)]
+    manager, clients = _create_manager(1, channels)
+
+    subscriber = manager.subscriber
+    assert subscriber.commands == [('subscribe', 120)]
+    assert manager.pending_acks() == 0
+
+    # 同一次循环中取消订阅后又重新订阅：不发送任何命令
+    clients['team.1'].unsubscribe('team.1')
+    assert Client().subscribe('team.1') is None
+    # 订阅后立即取消：不发送任何命令
+    client = Client()
+    client.subscribe('new.channel')
+    client.unsubscribe('new.channel')
+
+    clients['team.2'].unsubscribe('team.2')
+    clients['team.3'].unsubscribe('team.3')
+
+    manager.flush_commands()
+    assert subscriber.commands[1:] == [('unsubscribe', 2)]
+    assert sorted(subscriber.unsubscribed) == ['team.2', 'team.3']
+
+
+class EnvelopeClient(Client):
+    receive_envelope = True
+
+    def on_sub_envelope(self, envelope):
+        self.messages.append(envelope)
+
+
+def test_envelope_decoded_once():
+    decoded = []
+
+    def _decoder(raw):
+        decoded.append(raw)
+        return {'content': raw}
+
+    manager, clients = _create_manager(1, ['team.1'])
+    manager.message_decoder = _decoder
+
+    subscribers = [EnvelopeClient() for _ in range(10)]
+    for client in subscribers:
+        client.subscribe('team.1')
+
+    manager.on_message('team.1', 'hello')
+
+    envelopes = [client.messages[0] for client in subscribers]
+    assert all(envelope is envelopes[0] for envelope in envelopes)
+    assert decoded == []
+
+    assert all(envelope.decoded == {'content': 'hello'} for envelope in envelopes)
+    assert decoded == ['hello']
+
+    # 未选择 envelope 的客户端收到原始消息
+    assert clients['team.1'].messages == [('team.1', 'hello')]
+
+
+def test_dead_clients_compacted_lazily():
+    manager, clients = _create_manager(1, ['team.1', 'team.2'])
+
+    extra = Client()
+    extra.subscribe('team.1')
+    extra._is_alive = False
+    clients['team.2']._is_alive = False
+
+    manager.on_message('team.1', 'a')
+    manager.on_message('team.2', 'b')
+    assert clients['team.1'].messages == [('team.1', 'a')]
+    assert extra.messages == [] and clients['team.2'].messages == []
+    assert len(manager.clients['team.1']) == 2
+
+    manager.compact_clients()
+    assert manager.clients['team.1'] == set([clients['team.1']])
+    assert 'team.2' not in manager.clients
+
+    manager.flush_commands()
+    assert manager.subscriber.unsubscribed == ['team.2']
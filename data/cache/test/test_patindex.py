@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import fnmatch
+import random
+
+from gcommon.data.cache.patindex import PatternIndex
+
+
+PATTERNS = ['team.*', 'team.1.*', 'team.1.msg', 'team.?.msg', 'team.[12].*', 'user.*.status', '*', 'team.1*']
+CHANNELS = ['team.1.msg', 'team.2.msg', 'team.12.msg', 'team.', 'user.3.status', 'user.status', 'other', '']
+
+
+def test_match_all_patterns():
+    index = PatternIndex()
+    for pattern in PATTERNS:
+        index.add(pattern)
+
+    for channel in CHANNELS:
+        expected = sorted(p for p in PATTERNS if fnmatch.fnmatchcase(channel, p))
+        assert sorted(index.match(channel)) == expected
+
+
+def test_remove():
+    index = PatternIndex()
+    for pattern in PATTERNS:
+        index.add(pattern)
+
+    index.remove('team.*')
+    index.remove('team.1.msg')
+    index.remove('not.added.*')
+
+    assert len(index) == len(PATTERNS) - 2
+    assert 'team.*' not in index
+    assert sorted(index.match('team.1.msg')) == ['*', 'team.1*', 'team.1.*', 'team.?.msg', 'team.[12].*']
+
+    for pattern in PATTERNS:
+        index.remove(pattern)
+
+    assert len(index) == 0
+    assert index.match('team.1.msg') == []
+    assert not index._root.children
+
+
+def test_random_patterns():
+    rand = random.Random(7)
+    patterns = ['team.%d.%s' % (rand.randint(0, 50), rand.choice(['*', 'msg', 'm?g', '[ms]*'])) for _ in range(300)]
+
+    index = PatternIndex()
+    for pattern in patterns:
+        index.add(pattern)
+
+    for i in range(200):
+        channel = 'team.%d.%s' % (rand.randint(0, 50), rand.choice(['msg', 'mag', 'status']))
+        expected = sorted(set(p for p in patterns if fnmatch.fnmatchcase(channel, p)))
+        assert sorted(index.match(channel)) == expected
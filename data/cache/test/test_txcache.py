@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+
+import pytest
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from gcommon.data.cache.batch import BatchNotExecuted
+from gcommon.data.cache.txcache import SyncCalls, DeferredCalls, AsyncKeyValue, AsyncSet
+from gcommon.data.cache.txpool import TxRedisPool, PooledRedisClient, NoRedisConnection, REDIS_COMMANDS
+
+
+class ResponseError(Exception):
+    pass
+
+
+class FakeRedisClient(PooledRedisClient):
+    """只实现测试用到的 redis 命令（redis 协议参数）。
+
+    hold_commands 中的命令在 release() 之后才返回结果，fail_commands 中的命令返回错误。
+    """
+
+    def __init__(self, data=None, pending=0):
+        self._request_queue = [None] * pending
+        self.data = {} if data is None else data
+
+        self.sent = []
+        self.published = []
+
+        self.hold_commands = set()
+        self.fail_commands = set()
+        self._held = []
+
+    def send(self, command, *args):
+        self.sent.append((command,) + args)
+
+        d = defer.Deferred()
+        if command in self.hold_commands:
+            self._held.append((d, command, args))
+        else:
+            self._reply(d, command, args)
+        return d
+
+    def release(self):
+        held, self._held = self._held, []
+        self.hold_commands = set()
+        for d, command, args in held:
+            self._reply(d, command, args)
+
+    def _reply(self, d, command, args):
+        if command in self.fail_commands:
+            d.errback(ResponseError('%s failed' % command))
+            return
+
+        try:
+            value = getattr(self, '_' + command.lower())(*args)
+        except ResponseError, e:
+            d.errback(e)
+        else:
+            d.callback(value)
+
+    def _get(self, key):
+        value = self.data.get(key)
+        if isinstance(value, set):
+            raise ResponseError('WRONGTYPE')
+        return value
+
+    def _set(self, key, value, *options):
+        self.data[key] = value
+        return 'OK'
+
+    def _mget(self, *keys):
+        return [self._get(key) for key in keys]
+
+    def _mset(self, *args):
+        for i in range(0, len(args), 2):
+            self.data[args[i]] = args[i + 1]
+        return 'OK'
+
+    def _del(self, *keys):
+        return len([self.data.pop(key) for key in keys if key in self.data])
+
+    def _sadd(self, key, *values):
+        members = self.data.setdefault(key, set())
+        added = set(str(value) for value in values) - members
+        members.update(added)
+        return len(added)
+
+    def _sismember(self, key, value):
+        return int(str(value) in self.data.get(key, ()))
+
+    def _smembers(self, key):
+        return list(self.data.get(key, ()))
+
+    def _scard(self, key):
+        return len(self.data.get(key, ()))
+
+    def _publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+def create_pool(count=1, policy=TxRedisPool.LEAST_BUSY, data=None, clients=None):
+    """count 为 0 时连接池中没有可用的连接"""
+    if clients is None:
+        data = {} if data is None else data
+        clients = [FakeRedisClient(data) for _ in range(count)]
+
+    pool = TxRedisPool('localhost', 6379, size=max(len(clients), 1), policy=policy)
+    for client in clients:
+        pool._on_client_connected(client)
+
+    return pool
+
+
+def result_of(d):
+    results = []
+    d.addBoth(results.append)
+    assert results, 'deferred has not fired'
+    return results[0]
+
+
+def test_sync_and_deferred_calls():
+    assert SyncCalls._then(2, lambda value: value + 1) == 3
+    assert SyncCalls._result(2) == 2
+
+    assert result_of(DeferredCalls._then(defer.succeed(2), lambda value: value + 1)) == 3
+    assert result_of(DeferredCalls._then(defer.succeed(2), lambda value: defer.succeed(value * 2))) == 4
+    assert result_of(DeferredCalls._result(2)) == 2
+
+
+def test_pool_selection():
+    clients = [FakeRedisClient(pending=pending) for pending in (3, 0, 5)]
+
+    pool = create_pool(3, TxRedisPool.LEAST_BUSY, clients=clients)
+    assert pool.get_client() is clients[1]
+
+    pool = create_pool(3, TxRedisPool.ROUND_ROBIN, clients=clients)
+    assert set(pool.get_client() for _ in range(3)) == set(clients)
+    assert pool.get_client() is not pool.get_client()
+
+    pool._on_client_disconnected(clients[0])
+    assert pool.connected_count() == 2
+
+    result = result_of(create_pool(0).execute_command('get', 'a'))
+    assert isinstance(result, Failure) and result.check(NoRedisConnection)
+
+
+def test_command_translation():
+    def translate(command, *args, **kwargs):
+        return REDIS_COMMANDS[command](*args, **kwargs)[0]
+
+    assert translate('set', 'k', 'v', ex=10) == ['SET', 'k', 'v', 'EX', 10]
+    assert translate('set', 'k', 'v', px=5, nx=True) == ['SET', 'k', 'v', 'PX', 5, 'NX']
+    assert translate('mget', ['a', 'b']) == translate('mget', 'a', 'b') == ['MGET', 'a', 'b']
+    assert sorted(translate('mset', {'a': 1, 'b': 2})[1:]) == [1, 2, 'a', 'b']
+    assert translate('delete', 'a', 'b') == ['DEL', 'a', 'b']
+
+    # redis-py 2.x: zadd(name, value1, score1, ...)
+    assert translate('zadd', 'z', 'a', 1, 'b', 2) == ['ZADD', 'z', 1, 'a', 2, 'b']
+    assert translate('zrange', 'z', 0, -1, desc=True) == ['ZREVRANGE', 'z', 0, -1]
+    assert translate('zrangebyscore', 'z', 0, 10) == ['ZRANGEBYSCORE', 'z', 0, 10]
+    assert translate('zrevrangebyscore', 'z', 10, 0, 0, 5) == ['ZREVRANGEBYSCORE', 'z', 10, 0, 'LIMIT', 0, 5]
+
+    args, reply_handler = REDIS_COMMANDS['zrange']('z', -1, -1, withscores=True)
+    assert args == ['ZRANGE', 'z', -1, -1, 'WITHSCORES']
+    assert reply_handler(['a', '1', 'b', '2.5']) == [('a', 1.0), ('b', 2.5)]
+
+    assert REDIS_COMMANDS['exists']('k')[1](1) is True
+    assert REDIS_COMMANDS['smembers']('k')[1](['1', '2']) == {'1', '2'}
+
+
+def test_execute_commands():
+    pool = create_pool(data={'s': {'1'}})
+    commands = [('set', ('a', '1'), {}), ('get', ('s',), {}), ('get', ('a',), {})]
+
+    failure = result_of(pool.execute_commands(commands))
+    assert isinstance(failure, Failure) and failure.check(ResponseError)
+
+    values = result_of(pool.execute_commands(commands, raise_on_error=False))
+    assert values[0] == 'OK' and isinstance(values[1], ResponseError) and values[2] == '1'
+
+
+def test_async_wrappers():
+    pool = create_pool(2)
+    profiles = AsyncKeyValue(pool, json.dumps, json.loads)
+    members = AsyncSet(pool, decoder=int)
+
+    assert result_of(profiles.set('team.p.1', {'name': 'dev'})) == 'OK'
+    assert result_of(profiles.get('team.p.1')) == {'name': 'dev'}
+    assert result_of(profiles.mget('team.p.1', 'team.p.2')) == [{'name': 'dev'}, None]
+
+    assert result_of(members.add('team.m.1', 1, 2)) == 2
+    assert result_of(members.ismember('team.m.1', 2)) is True
+    assert sorted(result_of(members.get_all('team.m.1'))) == [1, 2]
+    assert result_of(members.count('team.m.1', 'team.m.2')) == [2, 0]
+    assert result_of(members.remove_keys()) is None
+
+
+def test_async_batch():
+    client = FakeRedisClient({'team.p.1': json.dumps({'name': 'dev'}), 'team.m.1': {'1'}})
+    pool = create_pool(clients=[client])
+    profiles = AsyncKeyValue(pool, json.dumps, json.loads)
+    members = AsyncSet(pool, decoder=int)
+
+    with profiles.batch() as b:
+        profile = b.on(profiles).get('team.p.1')
+        wrong_type = b.on(profiles).get('team.m.1')
+        counts = b.on(members).count('team.m.1', 'team.m.2')
+        nothing = b.on(members).remove_keys()
+
+        assert client.sent == []
+        with pytest.raises(BatchNotExecuted):
+            profile.value
+
+    assert result_of(b.done) is None
+    assert [command[0] for command in client.sent] == ['GET', 'GET', 'SCARD', 'SCARD']
+
+    assert profile.value == {'name': 'dev'}
+    assert counts.value == [1, 0]
+    assert nothing.value is None
+    with pytest.raises(ResponseError):
+        wrong_type.value
+
+    # 没有可用的连接
+    profiles = AsyncKeyValue(create_pool(0))
+    with profiles.batch() as b:
+        profile = b.on(profiles).get('team.p.1')
+
+    assert result_of(b.done).check(NoRedisConnection)
+    with pytest.raises(NoRedisConnection):
+        profile.value
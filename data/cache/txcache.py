@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""KeyValue / Set / SortedSet 的异步版本：使用 TxRedisPool，所有操作返回 Deferred.
+
+编码、解码逻辑与同步版本完全相同（只替换了发送 redis 命令的方式），可以在 reactor 线程中
+直接调用而不会阻塞事件循环。
+
+    pool = TxRedisPool(host, port, db=Redis_DB_Team_Cache)
+    yield pool.start()
+
+    profiles = AsyncKeyValue(pool, encoder, decoder)
+    profile = yield profiles.get('team.p.1')
+
+batch 在退出 with 语句时发送所有命令，结果可用之后 done 触发：
+
+    with profiles.batch() as b:
+        profile = b.on(profiles).get('team.p.1')
+        is_member = b.on(team_members).ismember('team.m.1', uid)
+    yield b.done
+    profile.value, is_member.value
+"""
+
+from twisted.internet import defer
+
+from gcommon.data.cache.batch import BatchResult, RedisBatch, resolve_operations
+from gcommon.data.cache.keyvalue import KeyValue
+from gcommon.data.cache.set import Set
+from gcommon.data.cache.sortedset import SortedSet
+
+
+class SyncCalls(object):
+    """同步缓存对象的结果处理：直接使用返回值。
+
+    TeamCache 等应用层缓存通过 _then / _result 处理结果，同一份代码可以用于同步和异步连接。
+    """
+    @staticmethod
+    def _then(result, func):
+        return func(result)
+
+    @staticmethod
+    def _result(value):
+        return value
+
+
+class DeferredCalls(object):
+    """异步缓存对象的结果处理：结果是 Deferred."""
+    @staticmethod
+    def _then(d, func):
+        return d.addCallback(func)
+
+    @staticmethod
+    def _result(value):
+        return defer.succeed(value)
+
+
+class AsyncRedisBatch(RedisBatch):
+    """RedisBatch 的异步版本：所有命令在连接池的同一个连接上连续发送。
+
+    done 为 execute() 返回的 Deferred：结果可用时以 None 触发；连接不可用时所有结果都是该错误，
+    done 也以该错误失败。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.done = None
+
+        # [(command, args, kwargs)]
+        self._commands = []
+        self._operations = []
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.done = self.execute()
+        else:
+            self._commands = []
+            self._operations = []
+
+        return False
+
+    def add(self, transform, commands):
+        self._commands.extend(commands)
+
+        result = BatchResult()
+        self._operations.append((result, len(commands), transform))
+        return result
+
+    def execute(self):
+        operations, self._operations = self._operations, []
+        commands, self._commands = self._commands, []
+        if not commands:
+            resolve_operations(operations, [])
+            return defer.succeed(None)
+
+        def _on_executed(values):
+            resolve_operations(operations, values)
+
+        def _on_failed(failure):
+            for result, _, _ in operations:
+                result._fail(failure.value)
+            return failure
+
+        d = self.conn.execute_commands(commands, raise_on_error=False)
+        d.addCallbacks(_on_executed, _on_failed)
+        return d
+
+
+class AsyncCache(object):
+    """替换 BatchableCache 发送命令的方式；conn 为 TxRedisPool."""
+
+    def batch(self):
+        return AsyncRedisBatch(self.conn)
+
+    def _execute(self, transform, command, args, kwargs):
+        d = self.conn.execute_command(command, *args, **kwargs)
+        d.addCallback(transform)
+        return d
+
+    def _execute_many(self, transform, commands):
+        if not commands:
+            return defer.maybeDeferred(transform, [])
+
+        d = self.conn.execute_commands(commands)
+        d.addCallback(transform)
+        return d
+
+
+class AsyncKeyValue(AsyncCache, KeyValue):
+    pass
+
+
+class AsyncSet(AsyncCache, Set):
+    pass
+
+
+class AsyncSortedSet(AsyncCache, SortedSet):
+    pass
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""同步 KeyValue 与 AsyncKeyValue 对 reactor 的影响
+
+并发执行 CONCURRENCY 个 "读取 -> 写入" 循环，同时用 LoopingCall 每 10ms 记录一次
+reactor 的调度延迟。同步版本在 reactor 线程中阻塞等待 redis 响应，延迟随负载增长；
+异步版本只在发送和解析时占用 reactor.
+
+需要本地 redis 服务器。
+
+Run: python txcache_bench.py [host] [port]
+"""
+
+import sys
+import time
+
+from redis import Redis
+from twisted.internet import reactor, defer, task
+
+from gcommon.data.cache.keyvalue import KeyValue
+from gcommon.data.cache.txcache import AsyncKeyValue
+from gcommon.data.cache.txpool import TxRedisPool
+
+
+DB = 15
+CONCURRENCY = 200
+ROUNDS = 50
+TICK = 0.01
+
+
+class LagMonitor(object):
+    def __init__(self):
+        self.lags = []
+        self._last = None
+        self._loop = task.LoopingCall(self._tick)
+
+    def start(self):
+        self._last = time.time()
+        self._loop.start(TICK, now=False)
+
+    def stop(self):
+        self._loop.stop()
+
+    def _tick(self):
+        now = time.time()
+        self.lags.append(max(0, now - self._last - TICK))
+        self._last = now
+
+    def report(self, name, elapsed):
+        lags = sorted(self.lags) or [0]
+        print('%-14s %d ops in %6.2fs, reactor lag p50 %6.1f ms, p99 %6.1f ms, max %6.1f ms' % (
+            name, CONCURRENCY * ROUNDS * 2, elapsed,
+            lags[len(lags) / 2] * 1000, lags[int(len(lags) * 0.99)] * 1000, lags[-1] * 1000))
+
+
+@defer.inlineCallbacks
+def bench_sync(host, port):
+    cache = KeyValue(Redis(host=host, port=port, db=DB))
+
+    def worker(index):
+        # 同步调用：每个请求都阻塞 reactor
+        for _ in xrange(ROUNDS):
+            key = 'bench.%s' % index
+            cache.get(key)
+            cache.set(key, 'x' * 100)
+            yield task.deferLater(reactor, 0, lambda: None)
+
+    monitor = LagMonitor()
+    monitor.start()
+    started = time.time()
+    yield defer.gatherResults([task.cooperate(worker(i)).whenDone() for i in xrange(CONCURRENCY)])
+    monitor.stop()
+    monitor.report('KeyValue', time.time() - started)
+
+
+@defer.inlineCallbacks
+def bench_async(host, port):
+    pool = TxRedisPool(host, port, db=DB, size=4)
+    yield pool.start()
+    cache = AsyncKeyValue(pool)
+
+    @defer.inlineCallbacks
+    def worker(index):
+        for _ in xrange(ROUNDS):
+            key = 'bench.%s' % index
+            yield cache.get(key)
+            yield cache.set(key, 'x' * 100)
+
+    monitor = LagMonitor()
+    monitor.start()
+    started = time.time()
+    yield defer.gatherResults([worker(i) for i in xrange(CONCURRENCY)])
+    monitor.stop()
+    monitor.report('AsyncKeyValue', time.time() - started)
+
+    pool.stop()
+
+
+@defer.inlineCallbacks
+def main(host, port):
+    try:
+        yield bench_sync(host, port)
+        yield bench_async(host, port)
+    finally:
+        reactor.stop()
+
+
+if __name__ == '__main__':
+    _host = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
+    _port = int(sys.argv[2]) if len(sys.argv) > 2 else 6379
+
+    reactor.callWhenRunning(main, _host, _port)
+    reactor.run()
@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""基于 txredis 的异步 redis 连接池。
+
+txredis 的一个连接上可以连续发送多个命令（不需要等待响应），因此连接池只需要少量连接。
+断线后由 ReconnectingClientFactory 按指数退避重连。
+
+execute_command 接受与 redis-py (redis.Redis) 相同的命令名称和参数，返回 Deferred，
+因此 KeyValue / Set / SortedSet 可以在同步和异步两种连接上使用相同的编码、解码逻辑。
+"""
+
+import itertools
+
+from twisted.internet import reactor, defer
+from txredis.client import RedisClient, RedisClientFactory
+
+import logging
+logger = logging.getLogger('txredis')
+
+
+class NoRedisConnection(RuntimeError):
+    """连接池中没有可用的连接"""
+
+
+def _flatten_keys(args):
+    """redis-py 允许 mget(['a', 'b']) 和 mget('a', 'b') 两种形式"""
+    if len(args) == 1 and isinstance(args[0], (list, tuple)):
+        return list(args[0])
+    return list(args)
+
+
+def _score_pairs(values):
+    """WITHSCORES 的结果：[value, score, ...] -> [(value, score), ...]"""
+    return [(values[i], float(values[i + 1])) for i in xrange(0, len(values) - 1, 2)]
+
+
+def _cmd_set(key, value, ex=None, px=None, nx=False, xx=False):
+    args = ['SET', key, value]
+    if ex:
+        args += ['EX', ex]
+    if px:
+        args += ['PX', px]
+    if nx:
+        args.append('NX')
+    if xx:
+        args.append('XX')
+    return args, None
+
+
+def _cmd_mset(mapping):
+    return ['MSET'] + list(itertools.chain(*mapping.iteritems())), None
+
+
+def _cmd_zadd(key, *args):
+    # redis.Redis.zadd(name, value1, score1, value2, score2, ...)
+    params = []
+    for i in xrange(0, len(args), 2):
+        params += [args[i + 1], args[i]]
+    return ['ZADD', key] + params, None
+
+
+def _cmd_zrange(key, start, end, desc=False, withscores=False):
+    args = ['ZREVRANGE' if desc else 'ZRANGE', key, start, end]
+    if withscores:
+        args.append('WITHSCORES')
+        return args, _score_pairs
+    return args, None
+
+
+def _cmd_zrangebyscore(key, min_, max_, start=None, num=None, withscores=False):
+    return _range_by_score('ZRANGEBYSCORE', key, min_, max_, start, num, withscores)
+
+
+def _cmd_zrevrangebyscore(key, max_, min_, start=None, num=None, withscores=False):
+    return _range_by_score('ZREVRANGEBYSCORE', key, max_, min_, start, num, withscores)
+
+
+def _range_by_score(command, key, first, second, start, num, withscores):
+    args = [command, key, first, second]
+    if start is not None and num is not None:
+        args += ['LIMIT', start, num]
+    if withscores:
+        args.append('WITHSCORES')
+        return args, _score_pairs
+    return args, None
+
+
+def _simple(command, reply_handler=None):
+    def _build(*args):
+        return [command] + list(args), reply_handler
+    return _build
+
+
+# redis-py 命令名称 -> 函数(*args, **kwargs) 返回 (redis 协议参数, 结果转换函数)
+REDIS_COMMANDS = {
+    'get': _simple('GET'),
+    'set': _cmd_set,
+    'mget': lambda *args: (['MGET'] + _flatten_keys(args), None),
+    'mset': _cmd_mset,
+    'keys': _simple('KEYS'),
+    'exists': _simple('EXISTS', bool),
+    'delete': _simple('DEL'),
+    'pttl': _simple('PTTL'),
+    'pexpire': _simple('PEXPIRE', bool),
+    'sadd': _simple('SADD'),
+    'srem': _simple('SREM'),
+    'sismember': _simple('SISMEMBER', bool),
+    'smembers': _simple('SMEMBERS', set),
+    'scard': _simple('SCARD'),
+    'zadd': _cmd_zadd,
+    'zcard': _simple('ZCARD'),
+    'zrange': _cmd_zrange,
+    'zrangebyscore': _cmd_zrangebyscore,
+    'zrevrangebyscore': _cmd_zrevrangebyscore,
+    'zremrangebyscore': _simple('ZREMRANGEBYSCORE'),
+    'publish': _simple('PUBLISH'),
+}
+
+
+class PooledRedisClient(RedisClient):
+    """连接池中的一个连接：连接建立或断开时通知连接池。"""
+
+    def connectionMade(self):
+        d = RedisClient.connectionMade(self)
+        d.addCallback(lambda _: self.factory.pool._on_client_connected(self))
+        return d
+
+    def connectionLost(self, reason):
+        RedisClient.connectionLost(self, reason)
+        self.factory.pool._on_client_disconnected(self)
+
+    def pending_requests(self):
+        return len(self._request_queue)
+
+
+class PooledRedisClientFactory(RedisClientFactory):
+    protocol = PooledRedisClient
+
+    # 重连的最大间隔（秒）
+    maxDelay = 30
+
+    def __init__(self, pool, *args, **kwargs):
+        RedisClientFactory.__init__(self, *args, **kwargs)
+        self.pool = pool
+
+
+class TxRedisPool(object):
+    """
+    :param size: 连接个数
+    :param policy: 连接选择策略 'least_busy'（等待响应最少的连接）或者 'round_robin'
+    """
+    LEAST_BUSY = 'least_busy'
+    ROUND_ROBIN = 'round_robin'
+
+    def __init__(self, host, port, db=None, password=None, size=2, policy=LEAST_BUSY):
+        assert size > 0 and policy in (self.LEAST_BUSY, self.ROUND_ROBIN)
+
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+
+        self.size = size
+        self.policy = policy
+
+        self._factories = []
+        self._clients = []
+        self._next_client = 0
+
+        # 第一个连接建立时触发
+        self._ready = defer.Deferred()
+
+    def start(self):
+        """连接服务器。返回的 Deferred 在第一个连接可用时触发。"""
+        for _ in xrange(self.size):
+            factory = PooledRedisClientFactory(self, db=self.db, password=self.password)
+            self._factories.append(factory)
+            reactor.connectTCP(self.host, self.port, factory)
+
+        return self._ready
+
+    def stop(self):
+        for factory in self._factories:
+            factory.stopTrying()
+            if factory.client and factory.client.transport:
+                factory.client.transport.loseConnection()
+
+        self._factories = []
+
+    def connected_count(self):
+        return len(self._clients)
+
+    def _on_client_connected(self, client):
+        logger.info('redis connection ready - %s:%s, db: %s', self.host, self.port, self.db)
+        self._clients.append(client)
+
+        if not self._ready.called:
+            self._ready.callback(self)
+
+    def _on_client_disconnected(self, client):
+        logger.warning('redis connection lost - %s:%s, db: %s', self.host, self.port, self.db)
+        if client in self._clients:
+            self._clients.remove(client)
+
+    def get_client(self):
+        if not self._clients:
+            raise NoRedisConnection('no redis connection available - %s:%s' % (self.host, self.port))
+
+        if self.policy == self.ROUND_ROBIN:
+            self._next_client = (self._next_client + 1) % len(self._clients)
+            return self._clients[self._next_client]
+
+        return min(self._clients, key=PooledRedisClient.pending_requests)
+
+    def execute_command(self, command, *args, **kwargs):
+        """执行一个 redis 命令（redis-py 的命令名称和参数），返回 Deferred."""
+        try:
+            client = self.get_client()
+        except NoRedisConnection:
+            return defer.fail()
+
+        return self._send(client, command, args, kwargs)
+
+    def execute_commands(self, commands, raise_on_error=True):
+        """在同一个连接上连续发送一组命令：[(command, args, kwargs)]，返回结果列表的 Deferred.
+
+        :param raise_on_error: 与 redis-py 的 pipeline.execute 相同：为 False 时出错的命令的结果为异常对象，
+                               其它命令的结果仍然可用
+        """
+        try:
+            client = self.get_client()
+        except NoRedisConnection:
+            return defer.fail()
+
+        deferreds = [self._send(client, command, args, kwargs) for command, args, kwargs in commands]
+        if not raise_on_error:
+            d = defer.DeferredList(deferreds, consumeErrors=True)
+            d.addCallback(lambda results: [value if ok else value.value for ok, value in results])
+            return d
+
+        d = defer.gatherResults(deferreds, consumeErrors=True)
+        d.addErrback(lambda failure: failure.value.subFailure)
+        return d
+
+    @staticmethod
+    def _send(client, command, args, kwargs):
+        redis_args, reply_handler = REDIS_COMMANDS[command](*args, **kwargs)
+
+        d = client.send(*redis_args)
+        if reply_handler:
+            d.addCallback(reply_handler)
+        return d
+
+    def publish(self, channel, message):
+        return self.execute_command('publish', channel, message)
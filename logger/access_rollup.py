@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""汇总 JSON lines 格式的 access log（JsonAccessFormatter）：按分钟和名称（路由或者 RPC 方法）输出请求数、
+错误数和处理时间的百分位数。
+
+只读一遍日志，每个 (分钟, 名称) 使用固定大小的直方图（gcounter.Histogram）。日志基本按时间顺序写入，
+比最新的日志早 window 分钟以上的数据输出后释放，内存不随日志大小增长；更早到达的日志计入 late.
+
+成功请求的 access log 被采样（rpc.access_log_sample_rate）时，请求数和错误率需要按照采样比例换算。
+
+Run: python access_rollup.py [-w window] [-n name-prefix] access.jsonl.2026-10-17.gz access.jsonl ...
+"""
+
+import gzip
+import json
+import optparse
+import sys
+import time
+
+from gcommon.utils.gcounter import Histogram
+
+
+COLUMNS = ('minute', 'name', 'count', 'errors', 'p50', 'p90', 'p99', 'p999', 'max')
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class _MinuteStats(object):
+    __slots__ = ('errors', 'histogram')
+
+    def __init__(self):
+        self.errors = 0
+        self.histogram = Histogram()
+
+
+class AccessRollup(object):
+    """
+    :param window: 保留最近几分钟的数据等待晚到的日志
+    :param name_prefix: 只统计名称以此开头的日志
+    """
+
+    def __init__(self, window=2, name_prefix=''):
+        self.window = window
+        self.name_prefix = name_prefix
+
+        # minute -> {name: _MinuteStats}
+        self._minutes = {}
+        self._newest = None
+
+        self.late = 0
+        self.invalid = 0
+
+    def add_line(self, line):
+        """返回已经完成的行（见 COLUMNS）"""
+        try:
+            entry = json.loads(line)
+            ts = entry['ts']
+            name = entry['name']
+            latency = entry['latency_ms']
+        except (ValueError, KeyError, TypeError):
+            self.invalid += 1
+            return []
+
+        if not name.startswith(self.name_prefix):
+            return []
+
+        rows = []
+
+        minute = int(ts // 60)
+        if self._newest is None or minute > self._newest:
+            self._newest = minute
+            rows = self._flush(minute - self.window)
+
+        if minute < self._newest - self.window:
+            # 该分钟已经输出
+            self.late += 1
+            return rows
+
+        names = self._minutes.get(minute)
+        if names is None:
+            names = self._minutes[minute] = {}
+
+        stats = names.get(name)
+        if stats is None:
+            stats = names[name] = _MinuteStats()
+
+        stats.histogram.observe(latency)
+        if entry.get('status') != 'ok':
+            stats.errors += 1
+
+        return rows
+
+    def finish(self):
+        return self._flush(None)
+
+    def _flush(self, before):
+        """输出并删除 before 之前（不包括 before）的分钟，before 为 None 时输出所有"""
+        rows = []
+        for minute in sorted(self._minutes):
+            if before is not None and minute >= before:
+                break
+
+            names = self._minutes.pop(minute)
+            label = time.strftime('%Y-%m-%d %H:%M', time.localtime(minute * 60))
+            for name in sorted(names):
+                stats = names[name]
+                histogram = stats.histogram
+
+                row = [label, name, histogram.count, stats.errors]
+                row.extend(histogram.percentile(q) for q in QUANTILES)
+                row.append(histogram.max)
+                rows.append(row)
+
+        return rows
+
+
+def _open(filename):
+    if filename == '-':
+        return sys.stdin
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def _format_row(row):
+    return '\t'.join('%.2f' % value if isinstance(value, float) else str(value) for value in row)
+
+
+def rollup_files(filenames, output, window=2, name_prefix=''):
+    """按照时间顺序读取文件（轮转的文件在前），以 TSV 格式写入 output"""
+    rollup = AccessRollup(window, name_prefix)
+
+    output.write('\t'.join(COLUMNS) + '\n')
+    for filename in filenames:
+        stream = _open(filename)
+        try:
+            for line in stream:
+                for row in rollup.add_line(line):
+                    output.write(_format_row(row) + '\n')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    for row in rollup.finish():
+        output.write(_format_row(row) + '\n')
+
+    return rollup
+
+
+def parse_command_line(parser, argv):
+    parser.set_usage("""Aggregate JSON lines access logs into per-minute percentile tables.
+    %(app)s [-w window] [-n name prefix] file [file ...]""" % {'app': argv[0]})
+
+    parser.add_option('-w', '--window', dest='window', action='store', type='int',
+                      default=2, help='minutes to wait for out-of-order records')
+    parser.add_option('-n', '--name', dest='name_prefix', action='store',
+                      default='', help='only aggregate routes / methods with this prefix')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    parser = optparse.OptionParser()
+    options, args = parse_command_line(parser, sys.argv)
+    if not args:
+        parser.error('no access log files')
+
+    rollup = rollup_files(args, sys.stdout, options.window, options.name_prefix)
+    if rollup.late or rollup.invalid:
+        sys.stderr.write('late records: %d, invalid lines: %d\n' % (rollup.late, rollup.invalid))
+
+
+if __name__ == '__main__':
+    main()
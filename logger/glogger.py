@@ -5,10 +5,15 @@
 
 import os
 import sys
+import json
+import Queue
 import logging
+import threading
 
 from logging.handlers import TimedRotatingFileHandler
 
+from gcommon.utils.gcounter import registry
+
 
 VERBOSE = logging.DEBUG - 5
 ACCESS = logging.INFO + 5
@@ -60,7 +65,10 @@ class StdIORedirector:
 
 
 class RotatingFileHandler(TimedRotatingFileHandler):
-    """Rotate log file by both time and size."""
+    """Rotate log file by both time and size.
+
+    文件大小在写入时累加（unicode 按照编码后的字节数计算），不需要每条日志 seek/tell，每条日志只格式化一次。
+    """
 
     def __init__(self, filename, max_bytes=0, when='d', interval=1, backup_count=0, encoding=None, delay=False,
                  utc=False):
@@ -71,22 +79,77 @@ class RotatingFileHandler(TimedRotatingFileHandler):
         utc         - if using UTC time
         """
 
+        # 当前文件的大小，打开文件时读取
+        self._size = 0
+
         TimedRotatingFileHandler.__init__(self, filename, when, interval, backup_count, encoding, delay, utc)
         self.maxBytes = max_bytes
 
-    def shouldRollover(self, record):
+    def _open(self):
+        stream = TimedRotatingFileHandler._open(self)
+        self._size = os.path.getsize(self.baseFilename)
+        return stream
+
+    def shouldRollover(self, record, length=0):
         if self.stream is None:
             self.stream = self._open()
 
-        if self.maxBytes > 0:
-            msg = "%s\n" % self.format(record)
-            self.stream.seek(0, 2)
-
-            if self.stream.tell() + len(msg) >= self.maxBytes:
-                return True
+        if self.maxBytes > 0 and self._size + length >= self.maxBytes:
+            return True
 
         return TimedRotatingFileHandler.shouldRollover(self, record)
 
+    def doRollover(self):
+        TimedRotatingFileHandler.doRollover(self)
+
+        if self.stream is None:
+            self.stream = self._open()
+
+    def emit(self, record):
+        try:
+            self.write_messages([self.format(record)])
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+    def write_messages(self, messages):
+        """写入已经格式化的日志，需要时切换文件。调用者负责加锁（或者通过 handle 调用）。"""
+        for msg in messages:
+            length = self._encoded_length(msg) + 1
+            if self.shouldRollover(None, length):
+                self.doRollover()
+
+            self._write_message(msg)
+            self._size += length
+
+        self.stream.flush()
+
+    def _encoded_length(self, msg):
+        if not isinstance(msg, unicode):
+            return len(msg)
+
+        # 与 _write_message 相同：不能按照文件的编码写入时写入 UTF-8
+        try:
+            return len(msg.encode(self.encoding or 'utf-8'))
+        except UnicodeError:
+            return len(msg.encode('utf-8'))
+
+    def _write_message(self, msg):
+        # 与 logging.StreamHandler.emit 相同的编码处理
+        stream = self.stream
+        try:
+            if isinstance(msg, unicode) and getattr(stream, 'encoding', None):
+                ufs = u'%s\n'
+                try:
+                    stream.write(ufs % msg)
+                except UnicodeEncodeError:
+                    stream.write((ufs % msg).encode(stream.encoding))
+            else:
+                stream.write("%s\n" % msg)
+        except UnicodeError:
+            stream.write("%s\n" % msg.encode("UTF-8"))
+
 
 class LevelFilter(logging.Filter):
     def __init__(self, level, name=''):
@@ -100,6 +163,49 @@ class LevelFilter(logging.Filter):
         return 1
 
 
+def access_fields(kind, name, status, latency_ms, code=None, peer=None, request_bytes=None, response_bytes=None):
+    """结构化 access log 的字段，作为 extra 参数传给 logger.access:
+
+        logger.access('...', ..., extra=access_fields('rpc', 'get_user', 'ok', 12))
+
+    :param kind: 'http' 或者 'rpc'
+    :param name: 路由（URL 模式）或者 RPC 方法
+    :param status: 'ok' 或者 'error'
+    :param code: 返回给客户端的结果代码
+    """
+    return {'access': {
+        'kind': kind,
+        'name': name,
+        'status': status,
+        'code': code,
+        'latency_ms': latency_ms,
+        'peer': peer,
+        'request_bytes': request_bytes,
+        'response_bytes': response_bytes,
+    }}
+
+
+class JsonAccessFormatter(logging.Formatter):
+    """每条日志一行 JSON: ts（秒）和 access_fields 中的字段。没有 access_fields 的日志输出 logger 名称和消息。"""
+
+    def format(self, record):
+        fields = getattr(record, 'access', None)
+        if fields is None:
+            data = {'logger': record.name, 'message': record.getMessage()}
+        else:
+            data = dict((key, value) for key, value in fields.iteritems() if value is not None)
+
+        data['ts'] = round(record.created, 3)
+        return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def create_json_access_handler(filename, backup_count, max_bytes):
+    """只写入 ACCESS 级别日志的 JSON lines 文件"""
+    handler = create_file_handler(filename, JsonAccessFormatter(), ACCESS, backup_count, max_bytes)
+    handler.addFilter(LevelFilter(ACCESS, 'json_access_filter'))
+    return handler
+
+
 def create_file_handler(filename, formatter, level, backup_count, max_bytes):
     handler = RotatingFileHandler(filename, when='midnight', interval=1,
                                   backup_count=backup_count, max_bytes=max_bytes, encoding='utf-8')
@@ -109,6 +215,144 @@ def create_file_handler(filename, formatter, level, backup_count, max_bytes):
     return handler
 
 
+_exc_formatter = logging.Formatter()
+
+
+class AsyncLogWriter(logging.Handler):
+    """在后台线程中写日志：emit 只把日志放入队列，后台线程格式化、批量写入 handlers 并切换文件，
+    磁盘变慢时不会阻塞 reactor.
+
+    与 logging.handlers.QueueHandler.prepare 相同，emit 在调用线程中合并日志参数（record.getMessage()）
+    并缓存异常的 traceback，之后修改参数对象不影响日志内容；formatter 格式化和写入在后台线程中完成。
+
+    :param handlers: 实际写日志的 handler（使用各自的 level、filter 和 formatter）
+    :param max_queue: 队列中最多的日志条数
+    :param policy: 队列已满时丢弃新的日志（DropNew）或者等待（Block）
+    :param batch_size: 每次最多写入的日志条数
+    """
+    DropNew = 0
+    Block = 1
+
+    def __init__(self, handlers, max_queue=10000, policy=DropNew, batch_size=256, name='log'):
+        logging.Handler.__init__(self)
+
+        self.handlers = list(handlers)
+        self.policy = policy
+        self.batch_size = batch_size
+
+        self._queue = Queue.Queue(max_queue)
+
+        self.dropped = registry.counter('log_dropped', '队列已满时丢弃的日志条数', labels=('writer',)).labels(name)
+        self.blocked = registry.counter('log_blocked', '队列已满时等待的次数', labels=('writer',)).labels(name)
+
+        self._thread = threading.Thread(target=self._run, name='AsyncLogWriter-%s' % name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def prepare(self, record):
+        """合并日志参数，缓存异常信息（exc_text），不再引用参数对象和 traceback"""
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def emit(self, record):
+        # 没有 handler 需要的日志不放入队列（也不合并参数）
+        if all(record.levelno < handler.level for handler in self.handlers):
+            return
+
+        try:
+            record = self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            self._queue.put_nowait(record)
+        except Queue.Full:
+            if self.policy == self.DropNew:
+                self.dropped.inc()
+                return
+
+            self.blocked.inc()
+            self._queue.put(record)
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            try:
+                while len(records) < self.batch_size:
+                    records.append(self._queue.get_nowait())
+            except Queue.Empty:
+                pass
+
+            count = len(records)
+
+            # None: close() 要求线程退出
+            stop = None in records
+            if stop:
+                records = records[:records.index(None)]
+
+            for handler in self.handlers:
+                self._write(handler, records)
+
+            for _ in xrange(count):
+                self._queue.task_done()
+
+            if stop:
+                return
+
+    @staticmethod
+    def _write(handler, records):
+        records = [record for record in records if record.levelno >= handler.level and handler.filter(record)]
+        if not records:
+            return
+
+        write_messages = getattr(handler, 'write_messages', None)
+        if write_messages is None:
+            for record in records:
+                handler.handle(record)
+            return
+
+        messages = []
+        for record in records:
+            try:
+                messages.append(handler.format(record))
+            except Exception:
+                handler.handleError(record)
+
+        handler.acquire()
+        try:
+            write_messages(messages)
+        except Exception:
+            handler.handleError(records[0])
+        finally:
+            handler.release()
+
+    def flush(self):
+        """等待队列中的日志写入完成"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        for handler in self.handlers:
+            handler.close()
+
+        logging.Handler.close(self)
+
+
 def access_logging_func(self, msg, *args, **kwargs):
     self.log(ACCESS, msg, *args, **kwargs)
 
@@ -122,7 +366,14 @@ def init_stdio_logger():
 
 
 def init_logger(log_folder='', redirect_stdio=False, stdio_handler=True,
-                file_handler=True, thread_logger=False, detail=False):
+                file_handler=True, thread_logger=False, detail=False,
+                async_writer=False, max_queue=10000, block_on_full=False, json_access_log=False):
+    """
+    :param json_access_log: 同时把 access log 写入 access.jsonl（见 JsonAccessFormatter 和 access_rollup）
+    :param async_writer: 在后台线程中写日志文件（见 AsyncLogWriter）
+    :param max_queue: async_writer 的队列大小
+    :param block_on_full: 队列已满时等待，否则丢弃日志
+    """
     # Create a new handler for "root logger" on console (stdout):
     # logging.basicConfig(level=logging.DEBUG, format='%(asctime)-15s %(name)-5s %(levelname)-5s %(message)s')
 
@@ -166,7 +417,6 @@ def init_logger(log_folder='', redirect_stdio=False, stdio_handler=True,
 
         # debug log
         debug_handle = create_file_handler(debug_log, formatter, logging.DEBUG, backup_count, 1280 * 1024 * 1024)
-        logger.addHandler(debug_handle)
 
         # access log
         access_handle = create_file_handler(access_log, formatter, ACCESS, backup_count, 512 * 1024 * 1024)
@@ -174,11 +424,20 @@ def init_logger(log_folder='', redirect_stdio=False, stdio_handler=True,
         access_filter = LevelFilter(ACCESS, 'access_filter')
         access_handle.addFilter(access_filter)
 
-        logger.addHandler(access_handle)
-
         # monitor log
         monitor_handler = create_file_handler(monitor_log, formatter, logging.CRITICAL, backup_count, 128 * 1024 * 1024)
-        logger.addHandler(monitor_handler)
+
+        file_handlers = [debug_handle, access_handle, monitor_handler]
+
+        if json_access_log:
+            json_access_log = os.path.join(log_folder, 'access.jsonl')
+            file_handlers.append(create_json_access_handler(json_access_log, backup_count, 512 * 1024 * 1024))
+        if async_writer:
+            policy = AsyncLogWriter.Block if block_on_full else AsyncLogWriter.DropNew
+            logger.addHandler(AsyncLogWriter(file_handlers, max_queue, policy, name='file'))
+        else:
+            for handler in file_handlers:
+                logger.addHandler(handler)
 
         if redirect_stdio:
             sys.stderr = StdIORedirector(StdIORedirector.STD_ERR)
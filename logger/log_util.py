@@ -83,3 +83,31 @@ def log_callback(logger, name=None):
 
         return _func_logger
     return _func_logger_decorator
+
+
+class LazyArg(object):
+    """日志参数：只在日志被输出（格式化）时才调用 func(*args)，结果被缓存，多个 handler 只计算一次。
+
+        logger.access('%s - ok - %s', name, LazyArg(scrub, result))
+
+    日志级别没有打开时，func 不会被调用。
+    """
+    __slots__ = ('_func', '_args', '_text')
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            text = '%s' % (self._func(*self._args),)
+            if isinstance(text, unicode):
+                text = text.encode('utf-8')
+
+            self._text = text
+            self._func = self._args = None
+
+        return self._text
+
+    __repr__ = __str__
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""RPC access log 的开销：每次复制并清除敏感信息 vs LazyArg
+
+模拟 RpcServiceHandler.call_with_access_log 对一个约 100 KB 的 thrift 结果写 access log：
+- eager: 之前的实现，每次调用都 deepcopy 并清除敏感信息
+- lazy: LazyArg，只在日志被输出时计算
+- lazy, 10% sampled: 成功的请求只输出 10%
+
+Run: python log_util_bench.py
+"""
+
+import logging
+import random
+import time
+from copy import deepcopy
+
+from gcommon.logger.log_util import LazyArg
+
+
+CALLS = 200
+ACCESS = logging.INFO + 5
+
+
+class Member(object):
+    """类似 thrift 生成的结构"""
+    def __init__(self, index):
+        self.user_id = index
+        self.name = 'user-%06d' % index
+        self.email = 'user-%06d@example.com' % index
+        self.password = 'secret-%06d' % index
+        self.tags = ['tag-%d' % i for i in range(5)]
+
+    def __repr__(self):
+        return 'Member(%r)' % self.__dict__
+
+
+class TeamResult(object):
+    def __init__(self, size):
+        self.team_id = 1
+        self.members = [Member(i) for i in range(size)]
+
+    def __repr__(self):
+        return 'TeamResult(%r)' % self.__dict__
+
+
+def erase_security_info(result):
+    for member in result.members:
+        member.password = '***'
+    return result
+
+
+def scrubbed(result):
+    return erase_security_info(deepcopy(result))
+
+
+class NullStream(object):
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def bench(name, logger, result, log):
+    started = time.time()
+    for _ in xrange(CALLS):
+        log(logger, result)
+    elapsed = (time.time() - started) / CALLS
+    print('%-30s %8.3f ms/call' % (name, elapsed * 1000))
+
+
+def eager(logger, result):
+    logger.log(ACCESS, 'get_team - ok - %s', scrubbed(result))
+
+
+def lazy(logger, result):
+    logger.log(ACCESS, 'get_team - ok - %s', LazyArg(scrubbed, result))
+
+
+def lazy_sampled(logger, result):
+    if random.random() < 0.1:
+        logger.log(ACCESS, 'get_team - ok - %s', LazyArg(scrubbed, result))
+
+
+if __name__ == '__main__':
+    _result = TeamResult(600)
+    print('result size: %d KB' % (len(repr(_result)) / 1024))
+
+    _logger = logging.getLogger('bench')
+    _logger.propagate = False
+    _logger.addHandler(logging.StreamHandler(NullStream()))
+
+    _logger.setLevel(logging.WARNING)
+    bench('eager, access log disabled', _logger, _result, eager)
+    bench('lazy, access log disabled', _logger, _result, lazy)
+
+    _logger.setLevel(logging.DEBUG)
+    bench('eager, access log enabled', _logger, _result, eager)
+    bench('lazy, access log enabled', _logger, _result, lazy)
+    bench('lazy, 10% sampled', _logger, _result, lazy_sampled)
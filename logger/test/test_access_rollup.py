@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+
+from gcommon.logger.access_rollup import AccessRollup
+
+
+def _line(minute, name, latency, status='ok', second=0):
+    return json.dumps({'ts': minute * 60 + second, 'name': name, 'latency_ms': latency, 'status': status})
+
+
+def test_rollup_per_minute():
+    rollup = AccessRollup(window=1)
+
+    rows = []
+    for latency in range(1, 101):
+        rows += rollup.add_line(_line(1000, 'get_user', latency, 'error' if latency > 95 else 'ok'))
+    rows += rollup.add_line(_line(1000, 'get_team', 5))
+    rows += rollup.add_line(_line(1001, 'get_user', 7))
+    assert rows == []
+
+    # 1000 分钟在 1002 分钟的日志到达后输出
+    rows += rollup.add_line(_line(1002, 'get_user', 9))
+    assert [row[1:4] for row in rows] == [['get_team', 1, 0], ['get_user', 100, 5]]
+
+    p50, p90, p99, p999, max_latency = rows[1][4:]
+    assert abs(p50 - 50) <= 2 and abs(p99 - 99) <= 4
+    assert max_latency == 100
+
+    # 晚到的日志
+    assert rollup.add_line(_line(1000, 'get_user', 1)) == []
+    assert rollup.late == 1
+
+    assert rollup.add_line('broken line') == []
+    assert rollup.invalid == 1
+
+    rows = rollup.finish()
+    assert [row[1:3] for row in rows] == [['get_user', 1], ['get_user', 1]]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+import logging
+import os
+import threading
+
+from gcommon.logger.glogger import ACCESS, AsyncLogWriter, RotatingFileHandler, access_fields, \
+    create_json_access_handler
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_rotating_file_handler_size(tmpdir):
+    filename = str(tmpdir.join('debug.log'))
+    handler = RotatingFileHandler(filename, max_bytes=100, backup_count=10)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = _logger('test_rotating_size', handler)
+
+    for i in range(10):
+        logger.info('%02d' % i * 10)
+
+    handler.close()
+    logger.removeHandler(handler)
+
+    # 每个文件 100 字节以内
+    files = sorted(os.listdir(str(tmpdir)))
+    assert len(files) > 1
+    for name in files:
+        assert os.path.getsize(str(tmpdir.join(name))) <= 100
+
+
+def test_rotating_file_handler_unicode_size(tmpdir):
+    # 每条日志 20 个字符、41 个字节（UTF-8）
+    for encoding in (None, 'utf-8'):
+        folder = tmpdir.mkdir(encoding or 'default')
+        handler = RotatingFileHandler(str(folder.join('debug.log')), max_bytes=100, backup_count=10,
+                                      encoding=encoding)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = _logger('test_rotating_unicode_size', handler)
+
+        for i in range(10):
+            logger.info(u'日志%02d' % i * 5)
+
+        handler.close()
+        logger.removeHandler(handler)
+
+        # 按照字符数计算时每个文件 4 条日志（164 字节）
+        for name in os.listdir(str(folder)):
+            assert os.path.getsize(str(folder.join(name))) == 82
+
+
+def test_async_writer(tmpdir):
+    filename = str(tmpdir.join('access.log'))
+    handler = RotatingFileHandler(filename)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    handler.setLevel(logging.INFO)
+
+    writer = AsyncLogWriter([handler], name='test')
+    logger = _logger('test_async_writer', writer)
+
+    logger.debug('skipped')
+    for i in range(1000):
+        logger.info('line %d', i)
+    writer.flush()
+
+    lines = open(filename).read().splitlines()
+    assert lines[0] == 'INFO line 0'
+    assert len(lines) == 1000
+
+    writer.close()
+    logger.removeHandler(writer)
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.unblock = threading.Event()
+        self.records = []
+        self.formatted = []
+
+    def emit(self, record):
+        self.unblock.wait()
+        self.records.append(record.getMessage())
+        self.formatted.append(self.format(record))
+
+
+def test_async_writer_drop_new():
+    handler = BlockingHandler()
+    writer = AsyncLogWriter([handler], max_queue=10, batch_size=1, name='test_drop')
+    logger = _logger('test_async_writer_drop', writer)
+
+    dropped = writer.dropped.value
+    for i in range(100):
+        logger.info('line %d', i)
+
+    # 队列中 10 条，后台线程正在写的最多 1 条
+    assert writer.dropped.value - dropped >= 89
+
+    handler.unblock.set()
+    writer.flush()
+    assert handler.records[:10] == ['line %d' % i for i in range(10)]
+
+    writer.close()
+    logger.removeHandler(writer)
+
+
+def test_json_access_log(tmpdir):
+    filename = str(tmpdir.join('access.jsonl'))
+    handler = create_json_access_handler(filename, 10, 0)
+    logger = _logger('test_json_access', handler)
+
+    logger.info('not an access log')
+    logger.log(ACCESS, 'get_user - %s - ok', 'args', extra=access_fields('rpc', 'get_user', 'ok', 12))
+    logger.log(ACCESS, 'free form')
+    handler.close()
+    logger.removeHandler(handler)
+
+    first, second = [json.loads(line) for line in open(filename)]
+    assert set(first) == {'ts', 'kind', 'name', 'status', 'latency_ms'}
+    assert (first['kind'], first['name'], first['status'], first['latency_ms']) == ('rpc', 'get_user', 'ok', 12)
+    assert second['message'] == 'free form'
+
+
+def test_async_writer_freeze_record():
+    handler = BlockingHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    writer = AsyncLogWriter([handler], name='test_freeze')
+    logger = _logger('test_async_writer_freeze', writer)
+
+    # 记录日志之后修改参数，日志中是记录时的值
+    members = ['guli']
+    logger.info('members: %s', members)
+    members.append('slim')
+
+    try:
+        raise ValueError('bad value')
+    except ValueError:
+        logger.exception('failed')
+
+    handler.unblock.set()
+    writer.flush()
+    assert handler.records == ["members: ['guli']", 'failed']
+    assert handler.formatted[1].startswith('failed\nTraceback')
+    assert handler.formatted[1].endswith('ValueError: bad value')
+
+    writer.close()
+    logger.removeHandler(writer)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import logging
+
+from gcommon.logger.log_util import LazyArg
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_lazy_arg():
+    calls = []
+
+    def scrub(value):
+        calls.append(value)
+        return {'password': '***'}
+
+    logger = logging.getLogger('test_lazy_arg')
+    logger.propagate = False
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.addHandler(ListHandler())
+
+    logger.setLevel(logging.WARNING)
+    logger.info('result: %s', LazyArg(scrub, {'password': 'secret'}))
+    assert calls == []
+
+    # 多个 handler 只计算一次
+    logger.setLevel(logging.INFO)
+    logger.info('result: %s', LazyArg(scrub, {'password': 'secret'}))
+    assert len(calls) == 1
+    assert handler.messages == ["result: {'password': '***'}"]
+
+    assert str(LazyArg(lambda: u'中')) == '\xe4\xb8\xad'
@@ -7,7 +7,11 @@
 import logging
 import math
 
-from twisted.internet import reactor
+from twisted.internet import reactor, task
+
+from gcommon.net.endpoints import TCPEndpoint, endpoint_from_config
+from gcommon.net.poolctl import AdaptivePoolController
+from gcommon.net.qscheduler import FifoScheduler
 
 logger = logging.getLogger('connpool')
 
@@ -15,6 +19,9 @@ logger = logging.getLogger('connpool')
 class MessageBase:
     _Prefix = 'Msg-ID'
 
+    # FairScheduler 的优先级类别，None 表示默认类别
+    priority = None
+
     def __init__(self, msg_id=''):
         self.msg_id = msg_id
         self.failures = 0
@@ -22,15 +29,23 @@ class MessageBase:
     def __str__(self):
         return '<%s: %s>' % (self._Prefix, self.msg_id)
 
+    def fairness_key(self):
+        """FairScheduler 在不同的 key（比如应用、团队）之间轮流发送请求"""
+        return None
+
 
 class MessageQueue:
-    """ Manage connection pool to a server and all requests to it."""
+    """ Manage connection pool to a server and all requests to it.
+
+    队列最多保存 max_requests 个请求。队列已满时，DropOld 丢弃最早的请求，RejectNew 拒绝新的请求。
+    请求的发送顺序由 scheduler 决定（默认先进先出，见 qscheduler）。
+    """
     DropOld = 0
     RejectNew = 1
 
-    def __init__(self, name, max_requests, policy_on_full):
+    def __init__(self, name, max_requests, policy_on_full, scheduler=None):
         self._name = name
-        self._requests = []
+        self._requests = scheduler if scheduler is not None else FifoScheduler()
 
         self._max_requests = max_requests
         self._policy = policy_on_full
@@ -46,25 +61,40 @@ class MessageQueue:
         consumer.set_queue_producer(self)
 
     def enqueue(self, req):
-        """ Incoming new request """
-        if len(self._requests) > self._max_requests:
-            # too much pending requests...
-            if self._policy == self.DropOld:
-                old_req = self.dequeue()
-                logger.error("Queue is full, drop the oldest request: %s" % str(old_req))
-            else:
-                # Queue full, reject new request
-                logger.error("Queue is full, reject current request: %s" % str(req))
-                return False
+        """ Incoming new request (a request or a list of requests).
 
-        logger.info("insert req into server queue")
+        return: False if the request is rejected because the queue is full.
+        """
+        requests = self._requests
+        reject_new = self._policy == self.RejectNew
 
         if type(req) is list:
-            self._requests.extend(req)
+            if reject_new and len(requests) + len(req) > self._max_requests:
+                return self._reject(req)
+            requests.push_many(req)
         else:
-            self._requests.append(req)
+            if reject_new and len(requests) >= self._max_requests:
+                return self._reject(req)
+            requests.push(req)
+
+        logger.info("insert req into server queue")
+
+        if len(requests) > self._max_requests:
+            self._drop_old()
 
         self.check_idle_and_consume()
+        return True
+
+    def _reject(self, req):
+        # Queue full, reject new request
+        logger.error("Queue is full, reject current request: %s" % str(req))
+        return False
+
+    def _drop_old(self):
+        # too much pending requests, drop the oldest ones
+        dropped = self._requests.drop_oldest(len(self._requests) - self._max_requests)
+
+        logger.error("Queue is full, drop %d oldest requests, the last one: %s" % (len(dropped), str(dropped[-1])))
 
     def _start_consume(self):
         """ Schedule consuming after new requests coming """
@@ -73,18 +103,14 @@ class MessageQueue:
 
     def fetch_head(self, count):
         """ Fetch a bunch of requests from the head of list """
-        if len(self._requests) <= count:
-            products = self._requests * 1
-            self._requests = []
-        else:
-            products = self._requests[:count]
-            self._requests = self._requests[count:]
-
-        return products
+        return self._requests.pop_many(count)
 
     def insert_front(self, reqs):
-        """ Some requests should placed in the front of the queue, i.e. retry requests """
-        self._requests[0:0] = reqs
+        """ Some requests should placed in the front of the queue, i.e. retry requests
+
+        重试的请求之前已经在队列中，不受 max_requests 限制。
+        """
+        self._requests.push_front(reqs)
 
         self.check_idle_and_consume()
 
@@ -96,15 +122,16 @@ class MessageQueue:
 
     def dequeue(self):
         """ Dequeue as the name says """
-        if self._requests:
-            return self._requests.pop(0)
-
-        return None
+        return self._requests.pop()
 
     def size(self):
         """ Get queue size """
         return len(self._requests)
 
+    def depths(self):
+        """ Queue size of each priority class: {class name: size} """
+        return self._requests.depths()
+
     def close(self):
         """ Not implemented """
         pass
@@ -115,31 +142,80 @@ class ConnectionPool:
 
     Connection pool consumes "requests" from a outgoing message queue (all
     requests in this queue must be targeted for the same server).
+
+    endpoint 为 TCPEndpoint 或者 TLSEndpoint（见 endpoints）。连接池的参数从配置的 section 中读取：
+        max_connections, max_request_in_one_fetch, retry_timeout
+        min_idle: 启动时（warm_up）预先建立并且一直保留的连接个数
+        idle_timeout: 空闲超过该时间（秒）的连接被关闭，保留 min_idle 个
+        max_lifetime: 建立超过该时间（秒）的连接在空闲时关闭，需要时重新建立
+        keepalive_interval: 连接空闲超过该时间（秒）时调用连接的 keepalive()（比如 SMTP 的 NOOP）
+        target_drain_time, min_connections: 见 poolctl
+        retire_grace: 配置了 target_drain_time 时，需求在该时间（秒，默认 30）内一直低于连接数才关闭多余的空闲连接
+
+        pool = ConnectionPool(SmtpClientFactory, TCPEndpoint('smtp.example.com', 25), cfg, 'mail.smtp_pool')
+        queue.set_queue_consumer(pool)
+        pool.warm_up()
+
+    兼容之前的调用方式：endpoint 不是 TCPEndpoint 时作为 context_factory，连接 postman.ios_push_server.
     """
 
-    def __init__(self, client_factory, context_factory, config):
+    def __init__(self, client_factory, endpoint, config, section='postman.connection', clock=None):
+        if not isinstance(endpoint, TCPEndpoint):
+            endpoint = endpoint_from_config(config, 'postman.ios_push_server', endpoint())
 
-        self.server_name = config.get('postman.ios_push_server.name')
-        self.server_port = config.get_int('postman.ios_push_server.port')
+        self.endpoint = endpoint
+        self.server_name = endpoint.host
+        self.server_port = endpoint.port
+
+        self._clock = clock or reactor
 
         self._idle_connections = []
         self._connections = []
         self._queue_producer = None
 
+        # 正在关闭的（多余的或者不健康的）连接
+        self._retiring_connections = set()
+
         # The number of connections which is still not connected to server (in
         # connecting status).
         self._new_connections = 0
-        self._max_connections = config.get_int('postman.connection.max_connections')
-        self._max_request_in_one_fetch = config.get_int('postman.connection.max_request_in_one_fetch')
-        self._connection_retry_timeout = config.get_int('postman.connection.retry_timeout')
+        self._max_connections = config.get_int(section + '.max_connections')
+        self._max_request_in_one_fetch = config.get_int(section + '.max_request_in_one_fetch')
+        self._connection_retry_timeout = config.get_int(section + '.retry_timeout')
+
+        self._min_idle = min(config.get_int(section + '.min_idle') or 0, self._max_connections)
+        self._idle_timeout = config.get_float(section + '.idle_timeout') or 0
+        self._max_lifetime = config.get_float(section + '.max_lifetime') or 0
+        self._keepalive_interval = config.get_float(section + '.keepalive_interval') or 0
+
+        # conn -> 连接建立的时间、开始空闲的时间、上次 keepalive 的时间
+        self._created_at = {}
+        self._idle_since = {}
+        self._keepalive_at = {}
+
+        self._maintenance = None
+        self._closed = False
 
         self._max_failed_connections = 20
         self._count_failed_connections = 0
         self._block_times = 0
         self._block_new_connections = False
 
+        # 配置了 target_drain_time 时，根据连接的吞吐量、延迟和错误率调整连接个数。
+        # 多余的连接由 _maintain 关闭：需求在 retire_grace 秒内一直低于当前连接数时才关闭
+        self._controller = None
+        self._retire_grace = 0
+        target_drain_time = config.get_float(section + '.target_drain_time')
+        if target_drain_time > 0:
+            self._retire_grace = config.get_float(section + '.retire_grace') or 30.0
+            self._controller = AdaptivePoolController(
+                self._max_connections,
+                min_connections=max(config.get_int(section + '.min_connections') or 1, self._min_idle),
+                target_drain_time=target_drain_time,
+                retire_grace=self._retire_grace,
+                clock=self._clock.seconds)
+
         self.Client_Factory = client_factory(self, self._connection_retry_timeout)
-        self.SSL_Context = context_factory()
 
     def set_queue_producer(self, producer):
         self._queue_producer = producer
@@ -147,9 +223,26 @@ class ConnectionPool:
 
     def consume(self):
         logger.debug("start consume requests from server queue [%s]" % self.server_name)
+        self._start_maintenance()
         self._create_connections()
         self._do_consume()
 
+    def warm_up(self):
+        """建立 min_idle 个连接，在 set_queue_consumer 之后调用"""
+        logger.info("warm up %d connections to %s" % (self._min_idle, self.endpoint))
+        self._start_maintenance()
+        self._create_connections()
+
+    def _start_maintenance(self):
+        intervals = [t for t in (self._idle_timeout, self._max_lifetime, self._keepalive_interval,
+                                 self._retire_grace) if t > 0]
+        if not intervals or self._maintenance is not None:
+            return
+
+        self._maintenance = task.LoopingCall(self._maintain)
+        self._maintenance.clock = self._clock
+        self._maintenance.start(min(intervals) / 2.0, now=False)
+
     def _do_consume(self):
         """Try get a new request and an idle connection to process the request."""
 
@@ -159,6 +252,9 @@ class ConnectionPool:
             reqs = self._queue_producer.fetch_head(self._max_request_in_one_fetch)
             conn = self._idle_connections.pop()
 
+            if self._controller is not None:
+                self._controller.on_dispatch(conn, len(reqs))
+
             conn.process(reqs)
 
     def _reconnect(self):
@@ -170,7 +266,7 @@ class ConnectionPool:
     def _create_connections(self):
         """Check if more connections are required and create them."""
 
-        if self._block_new_connections:
+        if self._block_new_connections or self._closed:
             return
         elif self._max_failed_connections < self._count_failed_connections:
             self._block_times += 1
@@ -182,7 +278,7 @@ class ConnectionPool:
 
             wait_time = pow(1.1, self._block_times)
             wait_time = min(wait_time, 24 * 3600)
-            reactor.callLater(wait_time, self._reconnect)
+            self._clock.callLater(wait_time, self._reconnect)
             return
 
         queue_size = self._queue_producer.size()
@@ -203,6 +299,12 @@ class ConnectionPool:
         # math.ceil ensures any pending requests could be processed
         n_max = min(int(math.ceil(float(queue_size)/self._max_request_in_one_fetch)) + n_conn, self._max_connections)
 
+        if self._controller is not None:
+            # 根据观察到的吞吐量计算，没有统计数据时使用上面的估计
+            n_max = self._controller.desired_connections(queue_size, n_conn, n_max)
+
+        n_max = max(n_max, self._min_idle)
+
         # n_new indicates how many new connections will be made in this estimation
         n_new = max(n_max - n_conn, 0)
 
@@ -213,7 +315,7 @@ class ConnectionPool:
         logger.debug("will create %d new connections" % n_new)
 
         for i in range(n_new):
-            reactor.connectSSL(self.server_name, self.server_port, self.Client_Factory, self.SSL_Context)
+            self.endpoint.connect(self.Client_Factory)
             self._new_connections += 1
 
     def on_connection_lost(self, protocol):
@@ -226,9 +328,22 @@ class ConnectionPool:
 
         if protocol in self._idle_connections:
             self._idle_connections.remove(protocol)
+        elif protocol in self._retiring_connections:
+            self._retiring_connections.remove(protocol)
         else:
             protocol.set_idle()
 
+            if self._controller is not None:
+                # 处理请求时断开
+                self._controller.on_error(protocol)
+
+        if self._controller is not None:
+            self._controller.remove_connection(protocol)
+
+        self._created_at.pop(protocol, None)
+        self._idle_since.pop(protocol, None)
+        self._keepalive_at.pop(protocol, None)
+
         self._create_connections()
 
     def new_connection_failed(self):
@@ -239,6 +354,10 @@ class ConnectionPool:
                          % (self.server_name, self._new_connections - 1) )
 
         self._new_connections -= 1
+
+        if self._controller is not None:
+            self._controller.on_error()
+
         self._create_connections()
 
     def new_connection_made(self, protocol):
@@ -249,9 +368,16 @@ class ConnectionPool:
 
         self._new_connections -= 1
 
+        now = self._clock.seconds()
+        self._created_at[protocol] = now
+        self._idle_since[protocol] = now
+
         self._idle_connections.append(protocol)
         self._connections.append(protocol)
 
+        if self._controller is not None:
+            self._controller.add_connection(protocol)
+
         self._do_consume()
 
     def on_request_processed(self, conn):
@@ -260,14 +386,86 @@ class ConnectionPool:
         logger.info('request has been processed! %s on %s' % (str(conn.current_request()), str(conn)))
 
         conn.set_idle()
-        self._idle_connections.append(conn)
+
+        if self._controller is not None:
+            self._controller.on_done(conn)
+
+        now = self._clock.seconds()
+        if self._closed:
+            self._close_connection(conn, 'pool closed')
+        elif self._expired(conn, now):
+            self._close_connection(conn, 'max lifetime')
+        else:
+            self._idle_since[conn] = now
+            self._idle_connections.append(conn)
+
         self._do_consume()
 
     def on_retry_timeout(self, conn):
+        if self._controller is not None:
+            self._controller.on_error(conn)
+
         self.on_request_processed(conn)
 
+    def _retire_connections(self):
+        """关闭不健康的以及多余的空闲连接。
+
+        多余的连接按照 retire_grace 秒内的最大需求计算，而不是当前的队列长度：
+        队列暂时为空时不关闭连接，避免下一批请求到来时又重新建立连接。
+        """
+        n_conn = len(self._connections) - len(self._retiring_connections)
+        self._controller.desired_connections(self._queue_producer.size(), n_conn, n_conn)
+        desired = self._controller.peak_demand()
+
+        for conn in self._controller.retire_candidates(self._idle_connections, n_conn, desired):
+            self._close_connection(conn, 'retired, health: %s' % self._controller.health(conn))
+
+    def _close_connection(self, conn, reason):
+        """关闭空闲的连接，on_connection_lost 从连接池中删除连接"""
+        logger.info('close connection %s: %s' % (str(conn), reason))
+
+        if conn in self._idle_connections:
+            self._idle_connections.remove(conn)
+
+        self._retiring_connections.add(conn)
+        conn.transport.loseConnection()
+
+    def _expired(self, conn, now):
+        return self._max_lifetime and now - self._created_at[conn] >= self._max_lifetime
+
+    def _maintain(self):
+        """关闭空闲超时、过期和多余的连接，向空闲的连接发送 keepalive"""
+        now = self._clock.seconds()
+
+        if self._controller is not None:
+            self._retire_connections()
+
+        # _do_consume 从末尾取连接，列表前面的连接空闲时间最长
+        for conn in list(self._idle_connections):
+            n_open = len(self._connections) - len(self._retiring_connections)
+            idle_since = self._idle_since[conn]
+
+            if self._expired(conn, now):
+                self._close_connection(conn, 'max lifetime')
+            elif self._idle_timeout and now - idle_since >= self._idle_timeout and n_open > self._min_idle:
+                self._close_connection(conn, 'idle timeout')
+            elif self._keepalive_interval and \
+                    now - max(idle_since, self._keepalive_at.get(conn, 0)) >= self._keepalive_interval:
+                keepalive = getattr(conn, 'keepalive', None)
+                if keepalive is not None:
+                    self._keepalive_at[conn] = now
+                    keepalive()
+
     def close(self):
-        pass
+        """关闭空闲的连接，正在处理请求的连接在处理完成后关闭，不再建立新的连接"""
+        self._closed = True
+
+        if self._maintenance is not None:
+            self._maintenance.stop()
+            self._maintenance = None
+
+        for conn in list(self._idle_connections):
+            self._close_connection(conn, 'pool closed')
 
 
 # Test Codes
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""MessageQueue 性能测试：1M 个请求入队、批量取出、重试时放回队首
+
+FairScheduler 的请求分属 1000 个租户。
+
+Run: python connpool_bench.py
+"""
+
+import time
+
+from gcommon.net.connpool import MessageQueue
+from gcommon.net.qscheduler import FifoScheduler, FairScheduler
+
+
+COUNT = 1000000
+FETCH = 100
+TENANTS = 1000
+
+
+def bench(scheduler):
+    queue = MessageQueue('bench', COUNT, MessageQueue.DropOld, scheduler)
+
+    started = time.time()
+    for i in xrange(COUNT):
+        queue.enqueue(i)
+    enqueue_time = time.time() - started
+
+    started = time.time()
+    batches = 0
+    while queue.size():
+        reqs = queue.fetch_head(FETCH)
+        batches += 1
+
+        # 每 10 批中有一批部分失败，放回队首重试（重试的请求不再失败）
+        if batches % 10 == 0 and batches <= COUNT / FETCH:
+            queue.insert_front(reqs[:FETCH / 2])
+    fetch_time = time.time() - started
+
+    print('%s enqueue %d: %6.0f ms' % (scheduler.__class__.__name__, COUNT, enqueue_time * 1000))
+    print('%s fetch + requeue (%d batches of %d): %6.0f ms' % (
+        scheduler.__class__.__name__, batches, FETCH, fetch_time * 1000))
+
+
+def main():
+    bench(FifoScheduler())
+    bench(FairScheduler(key_func=lambda req: req % TENANTS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""ConnectionPool 连接的服务器：TCP 或者 TLS.
+
+    endpoint = TCPEndpoint('smtp.example.com', 25)
+    endpoint = TLSEndpoint('gateway.push.apple.com', 2195, context_factory)
+
+    # 从配置中读取：<section>.host（或者 <section>.name）、<section>.port、
+    # <section>.tls、<section>.connect_timeout
+    endpoint = endpoint_from_config(cfg, 'mail.smtp')
+"""
+
+from twisted.internet import reactor
+
+
+class TCPEndpoint(object):
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+
+    def __str__(self):
+        return 'tcp:%s:%s' % (self.host, self.port)
+
+    def connect(self, factory):
+        return reactor.connectTCP(self.host, self.port, factory, self.timeout)
+
+
+class TLSEndpoint(TCPEndpoint):
+    """
+    :param context_factory: twisted 的 ClientContextFactory，默认为 ssl.ClientContextFactory()
+    """
+
+    def __init__(self, host, port, context_factory=None, timeout=None):
+        TCPEndpoint.__init__(self, host, port, timeout)
+
+        if context_factory is None:
+            # 需要 pyOpenSSL，只使用 TCP 时不导入
+            from twisted.internet import ssl
+            context_factory = ssl.ClientContextFactory()
+
+        self.context_factory = context_factory
+
+    def __str__(self):
+        return 'tls:%s:%s' % (self.host, self.port)
+
+    def connect(self, factory):
+        return reactor.connectSSL(self.host, self.port, factory, self.context_factory, self.timeout)
+
+
+def _is_true(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def endpoint_from_config(config, section, context_factory=None):
+    """指定 context_factory 或者配置了 <section>.tls 时使用 TLS"""
+    host = config.get(section + '.host') or config.get(section + '.name')
+    port = config.get_int(section + '.port')
+    timeout = config.get_int(section + '.connect_timeout')
+
+    if context_factory is not None or _is_true(config.get(section + '.tls')):
+        return TLSEndpoint(host, port, context_factory, timeout)
+
+    return TCPEndpoint(host, port, timeout)
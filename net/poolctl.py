@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""ConnectionPool 的连接数控制：根据观察到的吞吐量、延迟和错误率调整连接个数。
+
+- 每个连接统计请求的往返时间、每秒处理的请求数和错误率（指数加权平均）。
+- 连接个数以 target_drain_time 秒内处理完队列中的请求为目标，每次最多增加一倍。
+- 连接数上限按照 AIMD 调整：出现错误（超时、断线、连接失败，通常是服务器限流）时减半，
+  请求正常完成时缓慢增加，避免打开服务器会限流的连接。
+- 错误率高或者明显比其它连接慢的空闲连接优先关闭。
+- 多余的连接按照最近 retire_grace 秒内的最大需求计算，队列短暂为空时不关闭连接，
+  避免每次流量下降都关闭连接、下一批请求又重新建立。
+"""
+
+import math
+import time
+from collections import deque
+
+
+class ConnectionHealth(object):
+    # 指数加权平均的权重
+    ALPHA = 0.2
+
+    __slots__ = ('rtt', 'rps', 'error_rate', 'requests', 'errors', '_dispatched_at', '_dispatched')
+
+    def __init__(self):
+        self.rtt = None
+        self.rps = None
+        self.error_rate = 0.0
+
+        self.requests = 0
+        self.errors = 0
+
+        self._dispatched_at = None
+        self._dispatched = 0
+
+    def __repr__(self):
+        return '<ConnectionHealth rtt: %s, rps: %s, error rate: %.2f, requests: %d, errors: %d>' % (
+            self.rtt, self.rps, self.error_rate, self.requests, self.errors)
+
+    def _average(self, old, value):
+        if old is None:
+            return value
+
+        return old + self.ALPHA * (value - old)
+
+    def on_dispatch(self, now, count):
+        self._dispatched_at = now
+        self._dispatched = count
+
+    def on_done(self, now):
+        """返回 False 表示没有正在处理的请求（比如已经超时）"""
+        if self._dispatched_at is None:
+            return False
+
+        rtt = max(now - self._dispatched_at, 1e-6)
+        self.rtt = self._average(self.rtt, rtt)
+        self.rps = self._average(self.rps, self._dispatched / rtt)
+        self.error_rate = self._average(self.error_rate, 0.0)
+
+        self.requests += self._dispatched
+        self._dispatched_at = None
+        return True
+
+    def on_error(self):
+        self.errors += 1
+        self.error_rate = self._average(self.error_rate, 1.0)
+        self._dispatched_at = None
+
+    def score(self):
+        """越大越差"""
+        return (self.rtt or 0.0) * (1 + 4 * self.error_rate)
+
+
+class AdaptivePoolController(object):
+    """
+    :param max_connections: 最多连接个数
+    :param min_connections: 最少保留的连接个数
+    :param target_drain_time: 处理完队列中所有请求的目标时间（秒）
+    :param max_error_rate: 错误率超过该值的连接被关闭
+    :param slow_factor: 往返时间超过所有连接中位数的 slow_factor 倍时，连接被关闭
+    :param retire_grace: peak_demand() 的时间窗口（秒）
+    """
+
+    def __init__(self, max_connections, min_connections=1, target_drain_time=1.0,
+                 max_error_rate=0.2, slow_factor=3.0, retire_grace=30.0, clock=time.time):
+        assert 0 < min_connections <= max_connections and target_drain_time > 0 and retire_grace >= 0
+
+        self.max_connections = max_connections
+        self.min_connections = min_connections
+        self.target_drain_time = target_drain_time
+        self.max_error_rate = max_error_rate
+        self.slow_factor = slow_factor
+        self.retire_grace = retire_grace
+
+        self._clock = clock
+
+        # desired_connections 的结果：[(time, desired)]，desired 单调递减，第一个为时间窗口内的最大值
+        self._demand = deque()
+
+        # conn -> ConnectionHealth
+        self._health = {}
+
+        # AIMD 调整的连接数上限
+        self.cap = max_connections
+        self._cap_credit = 0.0
+
+    def health(self, conn):
+        return self._health.get(conn)
+
+    def add_connection(self, conn):
+        self._health[conn] = ConnectionHealth()
+
+    def remove_connection(self, conn):
+        self._health.pop(conn, None)
+
+    def on_dispatch(self, conn, count):
+        health = self._health.get(conn)
+        if health is not None:
+            health.on_dispatch(self._clock(), count)
+
+    def on_done(self, conn):
+        health = self._health.get(conn)
+        if health is None or not health.on_done(self._clock()):
+            return
+
+        # additive increase：大约每一轮（所有连接各完成一次）增加 1
+        if self.cap < self.max_connections:
+            self._cap_credit += 1.0 / self.cap
+            if self._cap_credit >= 1:
+                self._cap_credit = 0.0
+                self.cap += 1
+
+    def on_error(self, conn=None):
+        """请求超时、连接断开或者连接失败"""
+        if conn is not None:
+            health = self._health.get(conn)
+            if health is not None:
+                health.on_error()
+
+        # multiplicative decrease
+        self.cap = max(self.min_connections, min(self.cap, len(self._health)) // 2)
+        self._cap_credit = 0.0
+
+    def connection_rps(self):
+        """一个连接每秒能处理的请求数（所有连接的平均值），没有统计数据时返回 None"""
+        rates = [health.rps for health in self._health.itervalues() if health.rps]
+        if not rates:
+            return None
+
+        return sum(rates) / len(rates)
+
+    def desired_connections(self, queue_size, n_conn, fallback):
+        """
+        :param queue_size: 等待处理的请求个数
+        :param n_conn: 当前（包括正在连接的）连接个数
+        :param fallback: 没有统计数据时使用的连接个数
+        """
+        rps = self.connection_rps()
+        if rps is None:
+            needed = fallback
+        else:
+            needed = int(math.ceil(queue_size / (rps * self.target_drain_time)))
+
+        # 每次最多增加一倍，观察新连接的效果后再继续增加
+        needed = min(needed, max(n_conn * 2, n_conn + 1))
+
+        desired = max(self.min_connections, min(needed, self.cap, self.max_connections))
+        self._record_demand(desired)
+        return desired
+
+    def _record_demand(self, desired):
+        demand = self._demand
+        while demand and demand[-1][1] <= desired:
+            demand.pop()
+        demand.append((self._clock(), desired))
+
+    def peak_demand(self):
+        """最近 retire_grace 秒内 desired_connections 的最大值，没有数据时返回 min_connections"""
+        demand = self._demand
+        expire_time = self._clock() - self.retire_grace
+        while len(demand) > 1 and demand[0][0] < expire_time:
+            demand.popleft()
+
+        if not demand or demand[0][0] < expire_time:
+            return self.min_connections
+
+        return demand[0][1]
+
+    def is_unhealthy(self, conn):
+        health = self._health.get(conn)
+        if health is None:
+            return False
+
+        if health.error_rate > self.max_error_rate:
+            return True
+
+        if health.rtt is None:
+            return False
+
+        rtts = sorted(h.rtt for h in self._health.itervalues() if h.rtt is not None)
+        median = rtts[len(rtts) / 2]
+        return health.rtt > median * self.slow_factor
+
+    def retire_candidates(self, idle_connections, n_conn, desired):
+        """需要关闭的空闲连接：不健康的连接，以及超过 desired 的连接（最差的优先）"""
+        excess = n_conn - desired
+
+        candidates = sorted(idle_connections, key=lambda conn: self._score(conn), reverse=True)
+
+        retired = []
+        for conn in candidates:
+            if n_conn - len(retired) <= self.min_connections:
+                break
+
+            if len(retired) < excess or self.is_unhealthy(conn):
+                retired.append(conn)
+
+        return retired
+
+    def _score(self, conn):
+        health = self._health.get(conn)
+        return health.score() if health is not None else 0.0
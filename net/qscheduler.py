@@ -0,0 +1,211 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""MessageQueue 的调度策略：决定请求的发送顺序。
+
+FifoScheduler: 先进先出（默认）。
+FairScheduler: 请求分为多个优先级类别，高优先级类别的请求先发送；同一类别中，
+    按照 fairness key（比如应用、团队）使用 deficit round robin 轮流发送，
+    避免一个来源的大量请求阻塞其它来源。
+
+    scheduler = FairScheduler(classes=('retry', 'interactive', 'bulk'), default_class='interactive')
+    queue = MessageQueue('apns', 100000, MessageQueue.DropOld, scheduler)
+"""
+
+from collections import deque
+
+
+class FifoScheduler(object):
+    DEFAULT_CLASS = 'default'
+
+    def __init__(self):
+        self._requests = deque()
+
+    def __len__(self):
+        return len(self._requests)
+
+    def push(self, req):
+        self._requests.append(req)
+
+    def push_many(self, reqs):
+        self._requests.extend(reqs)
+
+    def push_front(self, reqs):
+        self._requests.extendleft(reversed(reqs))
+
+    def pop(self):
+        if self._requests:
+            return self._requests.popleft()
+
+        return None
+
+    def pop_many(self, count):
+        if len(self._requests) <= count:
+            products = list(self._requests)
+            self._requests.clear()
+        else:
+            popleft = self._requests.popleft
+            products = [popleft() for _ in xrange(count)]
+
+        return products
+
+    def drop_oldest(self, count):
+        popleft = self._requests.popleft
+        return [popleft() for _ in xrange(min(count, len(self._requests)))]
+
+    def depths(self):
+        return {self.DEFAULT_CLASS: len(self._requests)}
+
+
+class _FairClass(object):
+    """一个优先级类别：每个 fairness key 一个 FIFO 队列，在有请求的 key 之间 deficit round robin."""
+
+    def __init__(self, weights):
+        self.size = 0
+
+        # key -> deque of requests
+        self.flows = {}
+
+        # key -> 本轮剩余可以发送的请求数
+        self.deficits = {}
+
+        # 有请求等待发送的 key（轮转顺序）
+        self.active = deque()
+
+        self._weights = weights
+
+    def push(self, key, req, front=False):
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = deque()
+            self.deficits[key] = 0
+            if front:
+                self.active.appendleft(key)
+            else:
+                self.active.append(key)
+
+        if front:
+            flow.appendleft(req)
+        else:
+            flow.append(req)
+
+        self.size += 1
+
+    def pop(self):
+        active = self.active
+        key = active[0]
+
+        deficit = self.deficits[key]
+        if deficit <= 0:
+            # 轮到该 key：增加本轮的配额
+            deficit += self._weights.get(key, 1) if self._weights else 1
+
+        flow = self.flows[key]
+        req = flow.popleft()
+        deficit -= 1
+        self.size -= 1
+
+        if not flow:
+            del self.flows[key]
+            del self.deficits[key]
+            active.popleft()
+        else:
+            self.deficits[key] = deficit
+            if deficit <= 0:
+                # 本轮配额用完，移到队尾
+                active.rotate(-1)
+
+        return req
+
+    def drop_oldest(self):
+        """从积压最多的 key 中丢弃最早的请求"""
+        key = max(self.flows, key=lambda k: len(self.flows[k]))
+        flow = self.flows[key]
+
+        req = flow.popleft()
+        self.size -= 1
+
+        if not flow:
+            del self.flows[key]
+            del self.deficits[key]
+            self.active.remove(key)
+
+        return req
+
+
+class FairScheduler(object):
+    """
+    :param classes: 优先级类别，按照优先级从高到低排列
+    :param default_class: 请求没有指定类别时使用的类别
+    :param retry_class: 重试的请求（MessageQueue.insert_front）使用的类别，默认为最高优先级
+    :param key_func: 计算请求的 fairness key，默认为 req.fairness_key()
+    :param weights: {fairness key: 每轮发送的请求数}，默认为 1
+    """
+
+    def __init__(self, classes=('retry', 'interactive', 'bulk'), default_class=None, retry_class=None,
+                 key_func=None, weights=None):
+        assert classes
+
+        self.classes = tuple(classes)
+        self.default_class = default_class or self.classes[-1]
+        self.retry_class = retry_class or self.classes[0]
+
+        assert self.default_class in self.classes and self.retry_class in self.classes
+
+        self._key_func = key_func or self._fairness_key
+        self._queues = [_FairClass(weights) for _ in self.classes]
+        self._queue_by_class = dict(zip(self.classes, self._queues))
+
+    @staticmethod
+    def _fairness_key(req):
+        return req.fairness_key()
+
+    def __len__(self):
+        return sum(queue.size for queue in self._queues)
+
+    def _get_class_queue(self, req):
+        priority = getattr(req, 'priority', None)
+        if priority is None:
+            priority = self.default_class
+
+        return self._queue_by_class[priority]
+
+    def push(self, req):
+        self._get_class_queue(req).push(self._key_func(req), req)
+
+    def push_many(self, reqs):
+        for req in reqs:
+            self.push(req)
+
+    def push_front(self, reqs):
+        queue = self._queue_by_class[self.retry_class]
+        for req in reversed(reqs):
+            queue.push(self._key_func(req), req, front=True)
+
+    def pop(self):
+        for queue in self._queues:
+            if queue.size:
+                return queue.pop()
+
+        return None
+
+    def pop_many(self, count):
+        products = []
+        for queue in self._queues:
+            while queue.size and len(products) < count:
+                products.append(queue.pop())
+
+        return products
+
+    def drop_oldest(self, count):
+        """从最低优先级的类别开始丢弃"""
+        dropped = []
+        for queue in reversed(self._queues):
+            while queue.size and len(dropped) < count:
+                dropped.append(queue.drop_oldest())
+
+        return dropped
+
+    def depths(self):
+        return dict((name, queue.size) for name, queue in zip(self.classes, self._queues))
@@ -7,20 +7,76 @@ Generic socket server.
 """
 
 import logging
+from collections import deque
 
-from twisted.internet import reactor
+from twisted.internet import defer, reactor
 from twisted.internet.protocol import Factory
+from twisted.python import failure
 from twisted.protocols.basic import LineReceiver
 
+from gcommon.net.telnet_base import Command
+
 logger = logging.getLogger('telnet')
 
 
+RESPONSES = {
+    100: 'Continue',
+    101: 'Switching Protocols',
+
+    200: 'OK',
+    201: 'Created',
+    202: 'Accepted',
+    203: 'Non-Authoritative Information',
+    204: 'No Content',
+    205: 'Reset Content',
+    206: 'Partial Content',
+
+    300: 'Multiple Choices',
+    301: 'Moved Permanently',
+    302: 'Found',
+    303: 'See Other',
+    304: 'Not Modified',
+    305: 'Use Proxy',
+    306: '(Unused)',
+    307: 'Temporary Redirect',
+
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    402: 'Payment Required',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    406: 'Not Acceptable',
+    407: 'Proxy Authentication Required',
+    408: 'Request Timeout',
+    409: 'Conflict',
+    410: 'Gone',
+    411: 'Length Required',
+    412: 'Precondition Failed',
+    413: 'Request Entity Too Large',
+    414: 'Request-URI Too Long',
+    415: 'Unsupported Media Type',
+    416: 'Requested Range Not Satisfiable',
+    417: 'Expectation Failed',
+
+    500: 'Internal Server Error',
+    501: 'Not Implemented',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+    505: 'HTTP Version Not Supported',
+}
+
+
 class SocketServer(LineReceiver):
     """
     Protocol:
     
     <command> [<SP> parameter]* <\r\n>
     [binary payload | text payload]    
+
+    Command.process 可以返回 Deferred. 客户端可以连续发送多个命令（pipelining），
+    响应按照命令的顺序返回；正在处理的命令达到 max_in_flight 个时暂停读取。
     """
 
     STATUS_UNKNOWN = 0
@@ -36,6 +92,9 @@ class SocketServer(LineReceiver):
     Receive_Line_Payload = 2
 
     Telnet_Prompt = '$'
+
+    # 每个连接最多同时处理的命令个数
+    MAX_IN_FLIGHT = 16
     
     def __init__(self, factory):
         self.factory = factory
@@ -43,13 +102,21 @@ class SocketServer(LineReceiver):
         self.command = None
 
         self.status = self.STATUS_UNKNOWN
+
+        self.max_in_flight = getattr(factory, 'max_in_flight', None) or self.MAX_IN_FLIGHT
+
+        # 按照命令顺序等待发送的响应
+        self._responses = deque()
+        self._connected = False
         
     def connectionMade(self):
+        self._connected = True
         self.transport.write("Login: ")
         self.status = self.STATUS_WAIT_FOR_USERNAME
 
     def connectionLost(self, reason):
-        pass
+        self._connected = False
+        self._responses.clear()
 
     def writePrompt(self):
         self.transport.write(self.Telnet_Prompt + " ")
@@ -76,15 +143,13 @@ class SocketServer(LineReceiver):
                 command = self.factory.parser.parse(line)
                 
             except self.factory.parser.ParseError, e:
-                code, msg = e.args
-                self._send_result(code, msg)
-                self.writePrompt()
+                # 排在之前的命令的响应之后
+                self._add_response(defer.succeed(e.args))
             else:
                 self.command = command
                 
                 if command.finished():
                     self._process_command()
-                    self.writePrompt()
                     
                 elif command.is_multiple_lines():
                     self.state = self.Receive_Line_Payload
@@ -102,7 +167,6 @@ class SocketServer(LineReceiver):
             if not self.command.remain_lines():
                 # we have received a whole command
                 self._process_command()
-                self.writePrompt()
                 
     def rawDataReceived(self, data):
         # self.state == self.Receive_Raw_Payload
@@ -110,26 +174,70 @@ class SocketServer(LineReceiver):
         
         if remains > len(data):
             self.command.bytes_received(data)
+            return
+
+        if remains == len(data):
+            self.command.bytes_received(data)
+            data = ''
         else:
-            self.command.bytes_received(data[:remains])
+            # 不复制 payload 部分，只复制之后的数据
+            self.command.bytes_received(memoryview(data)[:remains])
             data = data[remains:]
-            
-            self.setLineMode(data)            
-            
-            self._process_command()
-            self.writePrompt()
+
+        self._process_command()
+
+        # 之后的数据可能包含下一个命令，在当前命令处理完成后再解析
+        self.setLineMode(data)
             
     def _process_command(self):
         command, self.command = self.command, None
         self.state = self.Receive_Command
-        
-        try:
-            ret = command.process(self.factory.handler)
 
+        self._add_response(defer.maybeDeferred(command.process, self.factory.handler))
+
+    def _add_response(self, d):
+        response = _Response()
+        self._responses.append(response)
+
+        d.addBoth(self._on_response, response)
+
+        if len(self._responses) >= self.max_in_flight and not self.paused:
+            # 之前的命令处理完成后继续读取
+            self.pauseProducing()
+
+    def _on_response(self, result, response):
+        response.result = result
+        response.done = True
+
+        if self._connected:
+            self._flush_responses()
+
+    def _flush_responses(self):
+        responses = self._responses
+        while responses and responses[0].done:
+            result = responses.popleft().result
+            if not self._write_result(result):
+                # 连接已关闭
+                responses.clear()
+                return
+
+            self.writePrompt()
+
+        if self.paused and len(responses) < self.max_in_flight:
+            self.resumeProducing()
+
+    def _write_result(self, ret):
+        """返回 False 表示关闭了连接"""
+        if isinstance(ret, failure.Failure):
+            logger.error('failed to process command: %s' % ret.getTraceback())
+            self._send_result(500, ret.getErrorMessage())
+            return True
+
+        try:
             if type(ret) is not tuple:
                 self.sendLine(str(ret))
             elif len(ret) == 1:
-                self._send_result(ret)
+                self._send_result(ret[0])
                 
             elif len(ret) == 2:
                 code, msg = ret
@@ -139,65 +247,20 @@ class SocketServer(LineReceiver):
                 code, msg, action = ret
                 self._send_result(code, msg)
                 
-                if action == command.Action_Close:
+                if action == Command.Action_Close:
                     self.transport.loseConnection()
+                    return False
             else:
                 raise Exception('Wrong return value', ret)
             
         except Exception, e:
             self._send_result(500, str(e))
+
+        return True
             
     def _send_result(self, code, extra_message='', message=''):
-        responses = {
-            100: 'Continue',
-            101: 'Switching Protocols',
-            
-            200: 'OK',
-            201: 'Created',
-            202: 'Accepted',
-            203: 'Non-Authoritative Information',
-            204: 'No Content',
-            205: 'Reset Content',
-            206: 'Partial Content',
-            
-            300: 'Multiple Choices',
-            301: 'Moved Permanently',
-            302: 'Found',
-            303: 'See Other',
-            304: 'Not Modified',
-            305: 'Use Proxy',
-            306: '(Unused)',
-            307: 'Temporary Redirect',
-            
-            400: 'Bad Request',
-            401: 'Unauthorized',
-            402: 'Payment Required',
-            403: 'Forbidden',
-            404: 'Not Found',
-            405: 'Method Not Allowed',
-            406: 'Not Acceptable',
-            407: 'Proxy Authentication Required',
-            408: 'Request Timeout',
-            409: 'Conflict',
-            410: 'Gone',
-            411: 'Length Required',
-            412: 'Precondition Failed',
-            413: 'Request Entity Too Large',
-            414: 'Request-URI Too Long',
-            415: 'Unsupported Media Type',
-            416: 'Requested Range Not Satisfiable',
-            417: 'Expectation Failed',
-            
-            500: 'Internal Server Error',
-            501: 'Not Implemented',
-            502: 'Bad Gateway',
-            503: 'Service Unavailable',
-            504: 'Gateway Timeout',
-            505: 'HTTP Version Not Supported',
-            }
-        
         if not message:
-            message = responses.get(code, "")
+            message = RESPONSES.get(code, "")
             
         if extra_message:
             result = '%d %s. %s' % (code, message, extra_message)
@@ -207,17 +270,30 @@ class SocketServer(LineReceiver):
         self.sendLine(result)
 
 
+class _Response(object):
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = False
+        self.result = None
+
+
 class SocketServerFactory(Factory):
-    def __init__(self, cmd_parser, cmd_handler):
+    """
+    :param max_in_flight: 每个连接最多同时处理的命令个数，默认为 SocketServer.MAX_IN_FLIGHT
+    """
+
+    def __init__(self, cmd_parser, cmd_handler, max_in_flight=None):
         self.parser = cmd_parser
         self.handler = cmd_handler
+        self.max_in_flight = max_in_flight
         
     def buildProtocol(self, addr):
         return SocketServer(self)
 
 
-def create(port, cmd_parser, cmd_handler):
-    reactor.listenTCP(port, SocketServerFactory(cmd_parser, cmd_handler))  # @UndefinedVariable
+def create(port, cmd_parser, cmd_handler, max_in_flight=None):
+    reactor.listenTCP(port, SocketServerFactory(cmd_parser, cmd_handler, max_in_flight))  # @UndefinedVariable
 
 
 def start_socket_server(port):
@@ -55,21 +55,49 @@ class MultipleLineCommand(Command):
 
 
 class BinaryCommand(Command):
+    """命令行之后跟着 total_bytes 字节的二进制数据（total_bytes 在 parse 中设置）。
+
+    数据写入按照 total_bytes 预先分配的 bytearray，接收完成后 self.payload 是该 bytearray 的
+    memoryview（不复制数据），需要 str 时使用 self.payload.tobytes().
+
+    子类实现 process_chunk(chunk) 时，每次收到的数据（str 或者 memoryview，只在调用期间有效）
+    直接交给 process_chunk 处理，不保存完整的数据，self.payload 为空。
+    """
+
+    # 流式处理数据的子类实现 process_chunk(self, chunk)
+    process_chunk = None
+
     def __init__(self):
-        self.payload = ""
+        self.payload = memoryview('')
         self.total_bytes = 0
+        self.received_bytes = 0
+
+        self._buffer = None
 
     def is_binary(self):
         return True
 
     def finished(self):
-        return len(self.payload) == self.total_bytes
+        return self.received_bytes == self.total_bytes
 
     def remain_bytes(self):
-        return self.total_bytes - len(self.payload)
+        return self.total_bytes - self.received_bytes
 
     def bytes_received(self, bytes):
-        self.payload = self.payload + bytes
+        if self.process_chunk is not None:
+            self.process_chunk(bytes)
+            self.received_bytes += len(bytes)
+            return
+
+        if self._buffer is None:
+            self._buffer = memoryview(bytearray(self.total_bytes))
+
+        end = self.received_bytes + len(bytes)
+        self._buffer[self.received_bytes:end] = bytes
+        self.received_bytes = end
+
+        if end == self.total_bytes:
+            self.payload = self._buffer
 
 
 class CommandParser:
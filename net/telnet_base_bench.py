@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""BinaryCommand 接收大块数据的性能：字符串拼接 vs 预先分配的 bytearray
+
+数据按照 TCP 读取的大小（CHUNK 字节）分块到达。
+
+Run: python telnet_base_bench.py
+"""
+
+import time
+
+from gcommon.net.telnet_base import BinaryCommand
+
+
+CHUNK = 65536
+SIZES = [1 << 20, 4 << 20, 16 << 20]
+
+
+class ConcatCommand(BinaryCommand):
+    """之前的实现"""
+
+    def __init__(self):
+        BinaryCommand.__init__(self)
+        self.payload = ''
+
+    def bytes_received(self, bytes):
+        self.payload = self.payload + bytes
+        self.received_bytes += len(bytes)
+
+
+def bench(cmd_class, size):
+    chunk = 'x' * CHUNK
+
+    cmd = cmd_class()
+    cmd.total_bytes = size
+
+    started = time.time()
+    while not cmd.finished():
+        cmd.bytes_received(chunk[:cmd.remain_bytes()])
+    return time.time() - started
+
+
+if __name__ == '__main__':
+    for _size in SIZES:
+        print('%3d MB: concat %8.1f ms, bytearray %6.1f ms' % (
+            _size >> 20, bench(ConcatCommand, _size) * 1000, bench(BinaryCommand, _size) * 1000))
@@ -4,8 +4,9 @@
 
 import logging
 from telnet_base import *
-from gcommon.utils.counters import Counter
-from gcommon.utils.counters import Timer
+from gcommon.utils.gcounter import Counter
+from gcommon.utils.gcounter import Timer
+from gcommon.utils.gcounter import registry
 
 logger = logging.getLogger('telnet')
 
@@ -82,6 +83,14 @@ class CmdGetTime(Command):
         return time
 
 
+class CmdMetrics(Command):
+    """所有指标（gcounter.registry）的文本格式"""
+    Command_Name = 'metrics'
+
+    def process(self, handler):
+        return registry.exposition().rstrip('\n')
+
+
 class CmdGabageCollection(Command):
     Command_Name = 'gc'
 
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from twisted.internet import task
+
+from gcommon.net.connpool import ConnectionPool, MessageQueue
+from gcommon.net.endpoints import TCPEndpoint
+
+
+def _queue(max_requests, policy):
+    # 没有 consumer，不会调度 reactor
+    return MessageQueue('test', max_requests, policy)
+
+
+def test_fifo():
+    queue = _queue(100, MessageQueue.DropOld)
+    queue.enqueue(1)
+    queue.enqueue([2, 3, 4])
+    queue.enqueue(5)
+
+    assert queue.fetch_head(2) == [1, 2]
+    queue.insert_front([10, 11])
+    assert queue.dequeue() == 10
+    assert queue.fetch_head(100) == [11, 3, 4, 5]
+    assert queue.size() == 0
+    assert queue.dequeue() is None
+    assert queue.fetch_head(10) == []
+
+
+def test_drop_old():
+    queue = _queue(3, MessageQueue.DropOld)
+    for i in range(5):
+        assert queue.enqueue(i)
+
+    assert queue.size() == 3
+    assert queue.enqueue([5, 6])
+    assert queue.fetch_head(10) == [4, 5, 6]
+
+    # 超过容量的一组请求只保留最新的部分
+    queue.enqueue(range(10))
+    assert queue.fetch_head(10) == [7, 8, 9]
+
+
+def test_reject_new():
+    queue = _queue(3, MessageQueue.RejectNew)
+    assert queue.enqueue([0, 1])
+    assert queue.enqueue(2)
+    assert queue.enqueue(3) is False
+    assert queue.size() == 3
+
+    queue.dequeue()
+    assert queue.enqueue([3, 4]) is False
+    assert queue.enqueue([3])
+    assert queue.fetch_head(10) == [1, 2, 3]
+
+
+class Config(dict):
+    def get_int(self, key):
+        return self.get(key)
+
+    def get_float(self, key):
+        return self.get(key)
+
+
+class Transport(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def loseConnection(self):
+        self.conn.pool.on_connection_lost(self.conn)
+
+
+class Connection(object):
+    def __init__(self, pool):
+        self.pool = pool
+        self.transport = Transport(self)
+        self.keepalives = 0
+        self.requests = None
+
+    def set_idle(self):
+        self.requests = None
+
+    def current_request(self):
+        return self.requests
+
+    def process(self, reqs):
+        self.requests = reqs
+
+    def keepalive(self):
+        self.keepalives += 1
+
+
+class ClientFactory(object):
+    def __init__(self, pool, retry_timeout):
+        self.pool = pool
+
+
+class Endpoint(TCPEndpoint):
+    def __init__(self):
+        TCPEndpoint.__init__(self, 'localhost', 25)
+        self.connecting = []
+
+    def connect(self, factory):
+        self.connecting.append(factory)
+
+    def finish(self):
+        """所有正在建立的连接连接成功"""
+        conns = []
+        while self.connecting:
+            factory = self.connecting.pop()
+            conn = Connection(factory.pool)
+            factory.pool.new_connection_made(conn)
+            conns.append(conn)
+        return conns
+
+
+def _pool(**options):
+    cfg = Config({'pool.max_connections': 4, 'pool.max_request_in_one_fetch': 10})
+    cfg.update(('pool.' + key, value) for key, value in options.items())
+
+    clock = task.Clock()
+    endpoint = Endpoint()
+    pool = ConnectionPool(ClientFactory, endpoint, cfg, 'pool', clock)
+    _queue(100, MessageQueue.DropOld).set_queue_consumer(pool)
+    return pool, endpoint, clock
+
+
+def test_pool_warm_up_and_idle_timeout():
+    pool, endpoint, clock = _pool(min_idle=2, idle_timeout=10)
+    pool.warm_up()
+    assert len(endpoint.connecting) == 2
+    endpoint.finish()
+
+    # 处理请求时建立更多的连接
+    pool._queue_producer.enqueue(range(40))
+    pool.consume()
+    assert len(endpoint.connecting) == 2
+    for conn in endpoint.finish():
+        pool.on_request_processed(conn)
+    for conn in list(pool._connections):
+        if conn.requests:
+            pool.on_request_processed(conn)
+    assert len(pool._idle_connections) == 4
+
+    # 空闲超时后保留 min_idle 个连接
+    clock.advance(11)
+    assert len(pool._connections) == 2
+    assert not endpoint.connecting
+
+
+def test_pool_max_lifetime_and_keepalive():
+    pool, endpoint, clock = _pool(min_idle=1, max_lifetime=60, keepalive_interval=20)
+    pool.warm_up()
+    conn, = endpoint.finish()
+
+    clock.pump([10] * 5)
+    assert conn.keepalives == 2
+
+    # 过期后关闭，并建立新的连接
+    clock.pump([10] * 2)
+    assert pool._connections == []
+    assert len(endpoint.connecting) == 1
+    new_conn, = endpoint.finish()
+    assert new_conn is not conn
+
+    pool.close()
+    assert pool._connections == []
+    assert not endpoint.connecting
+
+
+def _burst(pool, endpoint, clock, count, rtt=0.5):
+    """处理 count 个请求，每一批请求用时 rtt 秒，返回新建立的连接个数"""
+    pool._queue_producer.enqueue(range(count))
+    created = 0
+    while True:
+        pool.consume()
+        created += len(endpoint.finish())
+
+        busy = [conn for conn in pool._connections if conn.requests]
+        if not busy:
+            return created
+
+        clock.advance(rtt)
+        for conn in busy:
+            pool.on_request_processed(conn)
+
+
+def test_pool_keep_connections_between_bursts():
+    pool, endpoint, clock = _pool(target_drain_time=1.0, retire_grace=30)
+    lost = []
+    on_connection_lost = pool.on_connection_lost
+
+    def __lost(conn):
+        lost.append(conn)
+        on_connection_lost(conn)
+
+    pool.on_connection_lost = __lost
+
+    n_conn = _burst(pool, endpoint, clock, 100)
+    assert n_conn > 1
+    assert pool._queue_producer.size() == 0
+    assert len(pool._idle_connections) == n_conn
+
+    # 两批请求之间队列为空：不关闭连接
+    clock.pump([5] * 4)
+    assert lost == []
+
+    # 下一批请求使用已有的连接（吞吐量需要时可以增加连接）
+    conns = set(pool._connections)
+    _burst(pool, endpoint, clock, 100)
+    assert lost == []
+    assert conns <= set(pool._connections)
+
+    # 需求在 retire_grace 内一直很低时才关闭多余的连接
+    n_conn = len(pool._connections)
+    clock.pump([5] * 8)
+    assert len(lost) == n_conn - 1
+    assert len(pool._connections) == 1
+    assert not endpoint.connecting
+
+
+def test_pool_reconnect_after_failures():
+    pool, endpoint, clock = _pool()
+    pool._queue_producer.enqueue(range(5))
+    pool.consume()
+
+    # 连续失败超过 _max_failed_connections 次之后暂停建立连接
+    for i in range(pool._max_failed_connections + 1):
+        assert len(endpoint.connecting) == 1
+        endpoint.connecting.pop()
+        pool.new_connection_failed()
+    assert not endpoint.connecting
+
+    clock.advance(1.1)
+    assert len(endpoint.connecting) == 1
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.net.poolctl import AdaptivePoolController
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _serve(controller, clock, conn, count, rtt):
+    controller.on_dispatch(conn, count)
+    clock.now += rtt
+    controller.on_done(conn)
+
+
+def test_desired_connections_follow_throughput():
+    clock = Clock()
+    controller = AdaptivePoolController(20, min_connections=1, target_drain_time=1.0, clock=clock)
+
+    # 没有统计数据时使用 fallback
+    assert controller.desired_connections(1000, 2, 3) == 3
+
+    controller.add_connection('c1')
+    _serve(controller, clock, 'c1', 10, 0.125)
+    assert controller.connection_rps() == 80
+
+    # 240 个请求需要 3 个连接，但每次最多增加一倍
+    assert controller.desired_connections(240, 1, 1) == 2
+    assert controller.desired_connections(240, 2, 2) == 3
+
+    # 队列为空时保留最少的连接
+    assert controller.desired_connections(0, 5, 5) == 1
+
+    # 不超过 max_connections
+    assert controller.desired_connections(100000, 16, 16) == 20
+
+
+def test_cap_aimd():
+    clock = Clock()
+    controller = AdaptivePoolController(8, min_connections=1, clock=clock)
+    for i in range(8):
+        controller.add_connection(i)
+
+    controller.on_error(0)
+    assert controller.cap == 4
+
+    controller.on_error()
+    assert controller.cap == 2
+    assert controller.desired_connections(100000, 2, 8) == 2
+
+    # 大约每一轮成功的请求增加 1
+    _serve(controller, clock, 1, 1, 0.01)
+    assert controller.cap == 2
+    _serve(controller, clock, 2, 1, 0.01)
+    assert controller.cap == 3
+
+    # 超时后收到的响应不计入
+    controller.on_dispatch(3, 1)
+    controller.on_error(3)
+    controller.on_done(3)
+    assert controller.cap == 1
+
+    # 不小于 min_connections
+    controller.on_error()
+    assert controller.cap == 1
+
+
+def test_retire_unhealthy_and_excess():
+    clock = Clock()
+    controller = AdaptivePoolController(10, min_connections=2, clock=clock)
+    for conn in ('fast1', 'fast2', 'fast3', 'slow', 'broken'):
+        controller.add_connection(conn)
+
+    for conn in ('fast1', 'fast2', 'fast3', 'broken'):
+        _serve(controller, clock, conn, 10, 0.01)
+    _serve(controller, clock, 'slow', 10, 0.5)
+
+    for _ in range(2):
+        controller.on_dispatch('broken', 10)
+        controller.on_error('broken')
+    assert controller.is_unhealthy('broken')
+    assert controller.is_unhealthy('slow')
+    assert not controller.is_unhealthy('fast1')
+
+    idle = ['fast1', 'fast2', 'fast3', 'slow', 'broken']
+    assert sorted(controller.retire_candidates(idle, 5, 5)) == ['broken', 'slow']
+
+    # 超过 desired 的连接也会关闭，但至少保留 min_connections 个
+    assert len(controller.retire_candidates(idle, 5, 1)) == 3
+    assert controller.retire_candidates(['slow'], 2, 1) == []
+
+
+def test_peak_demand_window():
+    clock = Clock()
+    controller = AdaptivePoolController(8, min_connections=1, retire_grace=30, clock=clock)
+    assert controller.peak_demand() == 1
+
+    assert controller.desired_connections(100, 4, 4) == 4
+    clock.now += 10
+    assert controller.desired_connections(0, 4, 1) == 1
+
+    # 队列为空之后，时间窗口内仍然按照之前的需求保留连接
+    assert controller.peak_demand() == 4
+    clock.now += 15
+    assert controller.desired_connections(100, 4, 2) == 2
+    assert controller.peak_demand() == 4
+
+    clock.now += 10
+    assert controller.peak_demand() == 2
+    clock.now += 30
+    assert controller.peak_demand() == 1
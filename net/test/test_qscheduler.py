@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from gcommon.net.connpool import MessageBase, MessageQueue
+from gcommon.net.qscheduler import FairScheduler
+
+
+class Message(MessageBase):
+    def __init__(self, msg_id, tenant, priority=None):
+        MessageBase.__init__(self, msg_id)
+        self.tenant = tenant
+        self.priority = priority
+
+    def fairness_key(self):
+        return self.tenant
+
+
+def _ids(reqs):
+    return [req.msg_id for req in reqs]
+
+
+def test_round_robin_between_tenants():
+    queue = MessageQueue('test', 1000, MessageQueue.DropOld, FairScheduler())
+    queue.enqueue([Message('a%d' % i, 'a') for i in range(100)])
+    queue.enqueue([Message('b%d' % i, 'b') for i in range(2)])
+    queue.enqueue(Message('c0', 'c'))
+
+    assert _ids(queue.fetch_head(7)) == ['a0', 'b0', 'c0', 'a1', 'b1', 'a2', 'a3']
+    assert queue.size() == 96
+
+
+def test_priority_classes():
+    queue = MessageQueue('test', 1000, MessageQueue.DropOld, FairScheduler(default_class='bulk'))
+    queue.enqueue([Message('bulk%d' % i, 'a') for i in range(5)])
+    queue.enqueue(Message('chat', 'b', 'interactive'))
+
+    assert queue.depths() == {'retry': 0, 'interactive': 1, 'bulk': 5}
+
+    reqs = queue.fetch_head(2)
+    assert _ids(reqs) == ['chat', 'bulk0']
+
+    # 重试的请求优先发送
+    queue.insert_front(reqs)
+    assert queue.depths() == {'retry': 2, 'interactive': 0, 'bulk': 4}
+    assert _ids(queue.fetch_head(3)) == ['chat', 'bulk0', 'bulk1']
+
+
+def test_weights():
+    scheduler = FairScheduler(weights={'a': 3})
+    for i in range(6):
+        scheduler.push(Message('a%d' % i, 'a'))
+        scheduler.push(Message('b%d' % i, 'b'))
+
+    assert _ids(scheduler.pop_many(8)) == ['a0', 'a1', 'a2', 'b0', 'a3', 'a4', 'a5', 'b1']
+
+
+def test_drop_from_lowest_priority():
+    queue = MessageQueue('test', 4, MessageQueue.DropOld, FairScheduler())
+    queue.enqueue(Message('chat', 'a', 'interactive'))
+    queue.enqueue([Message('a%d' % i, 'a') for i in range(3)])
+    queue.enqueue(Message('b0', 'b'))
+
+    # 丢弃积压最多的租户最早的请求
+    assert queue.size() == 4
+    assert _ids(queue.fetch_head(10)) == ['chat', 'a1', 'b0', 'a2']
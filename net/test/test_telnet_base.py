@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+from twisted.internet import defer
+from twisted.internet.testing import StringTransport
+
+from gcommon.net.socket_server import SocketServer
+from gcommon.net.telnet_base import BinaryCommand, Command, CommandParser, CommandRegistry
+
+
+class CmdUpload(BinaryCommand):
+    Command_Name = 'test_upload'
+
+    def parse(self, command_line):
+        self.total_bytes = int(command_line.split()[1])
+
+    def process(self, handler):
+        handler.append(self.payload.tobytes())
+        return 200, str(len(self.payload))
+
+
+class CmdStream(BinaryCommand):
+    Command_Name = 'test_stream'
+
+    def parse(self, command_line):
+        self.total_bytes = int(command_line.split()[1])
+        self.chunks = []
+
+    def process_chunk(self, chunk):
+        self.chunks.append(bytes(chunk))
+
+    def process(self, handler):
+        handler.append(self.chunks)
+        return 200, 'streamed'
+
+
+class CmdWait(Command):
+    """handler 触发 Deferred 后返回"""
+    Command_Name = 'test_wait'
+
+    def parse(self, command_line):
+        self.name = command_line.split()[1]
+
+    def process(self, handler):
+        d = defer.Deferred()
+        handler.append((self.name, d))
+        d.addCallback(lambda _: (200, self.name))
+        return d
+
+
+CommandRegistry.register(CmdUpload.Command_Name, CmdUpload)
+CommandRegistry.register(CmdStream.Command_Name, CmdStream)
+CommandRegistry.register(CmdWait.Command_Name, CmdWait)
+
+
+def test_binary_command_chunks():
+    cmd = CmdUpload()
+    cmd.parse('test_upload 10')
+    assert not cmd.finished()
+
+    cmd.bytes_received('0123')
+    cmd.bytes_received(memoryview('xx456789')[2:])
+    assert cmd.finished()
+    assert cmd.remain_bytes() == 0
+    assert cmd.payload.tobytes() == '0123456789'
+
+
+class Factory(object):
+    parser = CommandParser
+
+    def __init__(self, max_in_flight=None):
+        self.handler = []
+        self.max_in_flight = max_in_flight
+
+
+def _server(max_in_flight=None):
+    factory = Factory(max_in_flight)
+    server = SocketServer(factory)
+    server.makeConnection(StringTransport())
+    server.dataReceived('user\r\npassword\r\n')
+    server.transport.clear()
+    return server, factory.handler
+
+
+def test_socket_server_payload_and_pipelined_command():
+    server, results = _server()
+
+    server.dataReceived('test_upload 6\r\nabc')
+    server.dataReceived('def')
+    server.dataReceived('test_upload 2\r\nxytest_upload 1\r\nz')
+
+    assert results == ['abcdef', 'xy', 'z']
+    output = server.transport.value()
+    assert output.count('200 OK. 6') == 1
+    assert output.count('200 OK. 2') == 1
+
+
+def test_socket_server_streaming():
+    server, results = _server()
+
+    server.dataReceived('test_stream 5\r\nab')
+    server.dataReceived('cde')
+    assert results == [['ab', 'cde']]
+
+
+def _lines(server):
+    lines = server.transport.value().split('\r\n')
+    return [line.lstrip('$ ') for line in lines if line.strip('$ ')]
+
+
+def test_socket_server_responses_in_order():
+    server, pending = _server()
+
+    server.dataReceived('test_wait a\r\ntest_wait b\r\nunknown\r\n')
+    assert [name for name, _ in pending] == ['a', 'b']
+    assert server.transport.value() == ''
+
+    # b 先完成，等待 a
+    pending[1][1].callback(None)
+    assert server.transport.value() == ''
+
+    pending[0][1].callback(None)
+    assert _lines(server) == ['200 OK. a', '200 OK. b', '404 Not Found. Command is not supported.']
+
+
+def test_socket_server_max_in_flight():
+    server, pending = _server(max_in_flight=2)
+
+    server.dataReceived('test_wait a\r\ntest_wait b\r\ntest_wait c\r\n')
+    assert len(pending) == 2
+    assert server.transport.producerState == 'paused'
+
+    pending[0][1].callback(None)
+    assert len(pending) == 3
+
+    pending[2][1].errback(ValueError('broken'))
+    pending[1][1].callback(None)
+    assert _lines(server) == ['200 OK. a', '200 OK. b', '500 Internal Server Error. broken']
+    assert server.transport.producerState == 'producing'
@@ -16,7 +16,10 @@ from twisted.internet.protocol import ClientCreator
 from thrift.protocol.TBinaryProtocol import TBinaryProtocol, TBinaryProtocolFactory
 
 from gcommon.cluster.cluster_manager import ClusterManager
+from gcommon.rpc.batch import RpcBatchOptions, BatchedAMQPTransport, ReplyAckBatcher
+from gcommon.rpc.batch import get_batch_frames, process_batch_frames
 from gcommon.utils.async import enable_timeout
+from gcommon.async.gtimer import enable_wheel_timeout
 from gcommon.utils.counters import Sequence
 from slimproto.error_define.ttypes import slim_errors
 
@@ -80,12 +83,18 @@ class RpcEndpoint(object):
 class RpcRequestDict(dict):
     TIMEOUT = 30
 
+    # 设置为 TimingWheel 对象时使用时间轮计时（大量并发请求时减轻 reactor 的负担）
+    TIMING_WHEEL = None
+
     def __setitem__(self, key, value):
         """请求对象都是 deferred 对象。为请求增加超时功能。"""
         assert isinstance(value, defer.Deferred)
         logger.debug('rpc-request start: rseqid = %s', key)
 
-        enable_timeout(value, self.TIMEOUT)
+        if self.TIMING_WHEEL is not None:
+            enable_wheel_timeout(value, self.TIMEOUT, self.TIMING_WHEEL)
+        else:
+            enable_timeout(value, self.TIMEOUT)
         value.addBoth(self._log_result, key)
         value.addErrback(self.pop_timeout_deferred, key)
 
@@ -135,10 +144,44 @@ class SlimAmqConnection(ThriftAMQClient):
         d.addErrback(self.catchClosedServerQueue)
         d.addErrback(self.handleServerQueueError)
 
+    def parseServerMessage(self, msg, channel, exchange, queue, processor,
+                           iprot_factory=None, oprot_factory=None):
+        """处理 RPC 请求。支持客户端合并发送的批量请求（参见 gcommon.rpc.batch）。"""
+        try:
+            frames = get_batch_frames(msg.content)
+        except ValueError:
+            logger.exception('rpc-batch: malformed batch message dropped, delivery tag = %s', msg.delivery_tag)
+            frames = []
+
+        if frames is None:
+            return ThriftAMQClient.parseServerMessage(self, msg, channel, exchange, queue, processor,
+                                                      iprot_factory, oprot_factory)
+
+        try:
+            reply_to = msg.content[self.replyToField]
+        except KeyError:
+            reply_to = None
+
+        iprot_factory = iprot_factory or self.factory.iprot_factory
+        oprot_factory = oprot_factory or self.factory.oprot_factory
+
+        tr = TwistedAMQPTransport(channel, exchange, reply_to)
+        process_batch_frames(processor, frames, tr, iprot_factory, oprot_factory)
+
+        channel.basic_ack(msg.delivery_tag, True)
+
+        d = queue.get()
+        d.addCallback(self.parseServerMessage, channel, exchange, queue,
+                      processor, iprot_factory, oprot_factory)
+        d.addErrback(self.catchClosedServerQueue)
+        d.addErrback(self.handleServerQueueError)
+
     @defer.inlineCallbacks
     def start_client(self, client_exchange, server_exchange, routing_key, client_class, client_queue=None,
-                     client_exchange_type='direct', server_exchange_type='direct'):
-        """为服务调用者 (RPC service consumer) 创建 channel 和 endpoint 对象。"""
+                     client_exchange_type='direct', server_exchange_type='direct', batch_options=None):
+        """为服务调用者 (RPC service consumer) 创建 channel 和 endpoint 对象。
+
+        batch_options: RpcBatchOptions 对象，不为空时合并发送请求、批量确认响应。"""
         channel_id = self._channel_seq.next_value()
         channel = yield self.channel(channel_id)
 
@@ -163,9 +206,16 @@ class SlimAmqConnection(ThriftAMQClient):
 
         thrift_client_name = client_class.__name__ + routing_key
 
-        amqp_transport = TwistedAMQPTransport(
-            endpoint.channel, server_exchange, routing_key, clientName=thrift_client_name,
-            replyTo=endpoint.queue_name, replyToField=self.replyToField)
+        if batch_options:
+            amqp_transport = BatchedAMQPTransport(
+                endpoint.channel, server_exchange, routing_key, batch_options, clientName=thrift_client_name,
+                replyTo=endpoint.queue_name, replyToField=self.replyToField)
+            ack_batcher = ReplyAckBatcher(endpoint.channel, batch_options)
+        else:
+            amqp_transport = TwistedAMQPTransport(
+                endpoint.channel, server_exchange, routing_key, clientName=thrift_client_name,
+                replyTo=endpoint.queue_name, replyToField=self.replyToField)
+            ack_batcher = None
 
         factory = TBinaryProtocolFactory()
         thrift_client = client_class(amqp_transport, factory)
@@ -173,7 +223,7 @@ class SlimAmqConnection(ThriftAMQClient):
 
         # RPC 响应队列，接收 RPC 服务器的响应消息
         queue = yield self.queue(reply.consumer_tag)
-        self._receiveNextFrame(endpoint.channel, queue, thrift_client, factory)
+        self._receiveNextFrame(endpoint.channel, queue, thrift_client, factory, ack_batcher)
 
         # 无法送达的请求将进入 basic return queue (ThriftTwistedDelegate).
         basic_return_queue = yield self.thriftBasicReturnQueue(thrift_client_name)
@@ -181,12 +231,12 @@ class SlimAmqConnection(ThriftAMQClient):
 
         defer.returnValue(thrift_client)
 
-    def _receiveNextFrame(self, channel, queue, thrift_client, iprot_factory):
+    def _receiveNextFrame(self, channel, queue, thrift_client, iprot_factory, ack_batcher=None):
         """
         从队列中接收下一个消息并处理。
         """
         d = queue.get()
-        d.addCallback(self.safeParseClientMessage, channel, queue, thrift_client, iprot_factory)
+        d.addCallback(self.safeParseClientMessage, channel, queue, thrift_client, iprot_factory, ack_batcher)
         d.addErrback(self.catchClosedClientQueue)
         d.addErrback(self.handleClientQueueError)
 
@@ -205,7 +255,7 @@ class SlimAmqConnection(ThriftAMQClient):
         """
         thrift_client._reqs = RpcRequestDict()
 
-    def safeParseClientMessage(self, msg, channel, queue, thrift_client, iprot_factory):
+    def safeParseClientMessage(self, msg, channel, queue, thrift_client, iprot_factory, ack_batcher=None):
         """
         解析并处理收到的 RPC 响应。忽略不能识别的消息。
         """
@@ -216,10 +266,42 @@ class SlimAmqConnection(ThriftAMQClient):
             pass
 
         # 从队列中删除该消息
-        channel.basic_ack(msg.delivery_tag, True)
+        if ack_batcher:
+            ack_batcher.ack(msg.delivery_tag)
+        else:
+            channel.basic_ack(msg.delivery_tag, True)
 
         # 开始接收下一个消息
-        self._receiveNextFrame(channel, queue, thrift_client, iprot_factory)
+        self._receiveNextFrame(channel, queue, thrift_client, iprot_factory, ack_batcher)
+
+    def parseClientUnrouteableMessage(self, msg, channel, queue, thrift_client, iprot_factory=None):
+        """无法送达的请求：批量请求中的每个请求都要返回错误。"""
+        try:
+            frames = get_batch_frames(msg.content)
+        except ValueError:
+            logger.exception('rpc-batch: malformed unrouteable batch message, routing key = %r', msg.routing_key)
+            frames = []
+
+        if frames is None:
+            return ThriftAMQClient.parseClientUnrouteableMessage(self, msg, channel, queue, thrift_client,
+                                                                 iprot_factory)
+
+        iprot_factory = iprot_factory or self.factory.iprot_factory
+        for frame in frames:
+            iprot = iprot_factory.getProtocol(TTransport.TMemoryBuffer(frame))
+            try:
+                (fname, mtype, rseqid) = iprot.readMessageBegin()
+            except Exception:
+                logger.exception('rpc-batch: malformed unrouteable frame, routing key = %r', msg.routing_key)
+                continue
+
+            d = thrift_client._reqs.pop(rseqid, None)
+            if d:
+                d.errback(TTransport.TTransportException(
+                    type=TTransport.TTransportException.NOT_OPEN,
+                    message='Unrouteable message, routing key = %r calling function %r' % (msg.routing_key, fname)))
+
+        self._receiveUnrouteableMessage(channel, queue, thrift_client, iprot_factory)
 
     def _processClientMessage(self, iprot_factory, msg, thrift_client):
         """处理在 RPC 响应队列中收到的消息。可能抛出各种异常。"""
@@ -295,8 +377,12 @@ class RpcManager(object):
 
     @inlineCallbacks
     def create_rpc_client(self, rpc_client_class, routing_key, server_exchange, client_exchange,
-                          server_exchange_type='direct', client_exchange_type='direct'):
-        """创建 RPC Client 对象（以及对应的队列等资源）"""
+                          server_exchange_type='direct', client_exchange_type='direct', batch_options=None):
+        """创建 RPC Client 对象（以及对应的队列等资源）
+
+        batch_options: 可选的 RpcBatchOptions，开启请求合并发送和响应批量确认。
+                       只有使用 rpc.batch 的服务器能够解析合并后的请求（旧版本的服务器不能处理），
+                       必须在 routing_key 对应的所有服务器都升级之后才能开启。"""
         # 修改 client 类
         self._decorator.decorate(rpc_client_class)
 
@@ -304,7 +390,8 @@ class RpcManager(object):
         thrift_client = yield self._broker_conn.start_client(
             client_exchange, server_exchange, routing_key, rpc_client_class,
             client_exchange_type=client_exchange_type,
-            server_exchange_type=server_exchange_type
+            server_exchange_type=server_exchange_type,
+            batch_options=batch_options
         )
 
         defer.returnValue(thrift_client)
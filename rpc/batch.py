@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""RPC 批量发送和批量确认（可选功能）。
+
+客户端在一个很短的时间窗口内（或者累计 N 个请求后）把发往同一个 routing key
+的多个 Thrift 请求合并成一个 AMQP 消息发送。合并后的消息：
+    - headers['thriftBatch'] = 请求个数
+    - body = 多个 [4 字节长度 (网络字节序) + Thrift 数据包] 的拼接
+
+只有一个请求时按原格式发送，不带 thriftBatch 头，因此服务器可以同时处理新旧客户端。
+反之不成立：旧版本的服务器不能解析合并后的消息，客户端只能在所有服务器升级之后开启批量模式。
+
+客户端收到的响应也按批确认：累计 N 个响应或者时间窗口到期时，使用 multiple=True
+确认最后一个 delivery tag.
+"""
+
+import struct
+
+from thrift.transport import TTransport
+from twisted.internet import defer, reactor
+from txamqp.content import Content
+from txamqp.contrib.thrift.transport import TwistedAMQPTransport
+
+import logging
+logger = logging.getLogger('rpc')
+
+
+BATCH_HEADER = 'thriftBatch'
+
+_frame_length = struct.Struct('!I')
+
+
+class RpcBatchOptions(object):
+    """批量模式参数。
+
+    window: 合并请求 / 延迟确认的时间窗口（秒）
+    max_frames: 一个 AMQP 消息中最多合并的请求数，达到后立即发送
+    max_acks: 累计多少个响应后立即确认
+    """
+    def __init__(self, window=0.001, max_frames=32, max_acks=32):
+        assert window > 0 and max_frames > 0 and max_acks > 0
+
+        self.window = window
+        self.max_frames = max_frames
+        self.max_acks = max_acks
+
+
+def pack_frames(frames):
+    return ''.join(_frame_length.pack(len(frame)) + frame for frame in frames)
+
+
+def unpack_frames(body):
+    """消息被截断时抛出 ValueError"""
+    frames = []
+
+    offset = 0
+    while offset < len(body):
+        if offset + _frame_length.size > len(body):
+            raise ValueError('truncated frame header at offset %d' % offset)
+
+        length, = _frame_length.unpack_from(body, offset)
+        offset += _frame_length.size
+
+        if offset + length > len(body):
+            raise ValueError('truncated frame at offset %d: %d bytes expected, %d left' % (
+                offset, length, len(body) - offset))
+
+        frames.append(body[offset:offset + length])
+        offset += length
+
+    return frames
+
+
+def get_batch_frames(content):
+    """如果是合并后的消息，返回其中的请求列表；否则返回 None. 消息格式错误时抛出 ValueError."""
+    headers = content.properties.get('headers') or {}
+    if not headers.get(BATCH_HEADER):
+        return None
+
+    return unpack_frames(content.body)
+
+
+def _log_frame_error(failure, index, count):
+    logger.error('rpc-batch: failed to process frame %d/%d: %s', index + 1, count, failure.getTraceback())
+
+
+def process_batch_frames(processor, frames, transport, iprot_factory, oprot_factory):
+    """逐个处理合并消息中的请求。
+
+    一个请求出错（比如数据包格式错误）时记录日志并继续处理其它请求。格式错误的数据包中
+    读不到 seqid，无法回复错误，客户端的请求会超时。
+    """
+    count = len(frames)
+    for index, frame in enumerate(frames):
+        iprot = iprot_factory.getProtocol(TTransport.TMemoryBuffer(frame))
+        oprot = oprot_factory.getProtocol(transport)
+
+        try:
+            d = processor.process(iprot, oprot)
+        except Exception:
+            logger.exception('rpc-batch: failed to process frame %d/%d', index + 1, count)
+            continue
+
+        if isinstance(d, defer.Deferred):
+            d.addErrback(_log_frame_error, index, count)
+
+
+class BatchedAMQPTransport(TwistedAMQPTransport):
+    """在时间窗口内按 routing key 合并请求的 transport."""
+
+    def __init__(self, channel, exchange, routingKey, batch_options, **kwargs):
+        TwistedAMQPTransport.__init__(self, channel, exchange, routingKey, **kwargs)
+
+        self.batch_options = batch_options
+
+        # routing key -> [thrift frame]
+        self._pending = {}
+        self._delayed_flush = None
+
+    def sendMessage(self, message):
+        # routing key 由 RpcClientDecorator.routing_key_scope 在调用时设置，必须在这里读取
+        frames = self._pending.setdefault(self.routingKey, [])
+        frames.append(message)
+
+        if len(frames) >= self.batch_options.max_frames:
+            self._publish(self.routingKey, self._pending.pop(self.routingKey))
+        elif not self._delayed_flush:
+            self._delayed_flush = reactor.callLater(self.batch_options.window, self.publish_pending)
+
+    def publish_pending(self):
+        """立即发送所有等待合并的请求（注意：flush 是 thrift transport 的接口，不能覆盖）"""
+        if self._delayed_flush and self._delayed_flush.active():
+            self._delayed_flush.cancel()
+        self._delayed_flush = None
+
+        pending, self._pending = self._pending, {}
+        for routing_key, frames in pending.iteritems():
+            self._publish(routing_key, frames)
+
+    def _publish(self, routing_key, frames):
+        headers = {}
+        if self.clientName:
+            headers['thriftClientName'] = self.clientName
+
+        if len(frames) == 1:
+            body = frames[0]
+        else:
+            headers[BATCH_HEADER] = len(frames)
+            body = pack_frames(frames)
+
+        content = Content(body=body)
+        if headers:
+            content['headers'] = headers
+        if self.replyTo:
+            content[self.replyToField] = self.replyTo
+
+        logger.debug('rpc-batch: publish %s frames, routing key = %r', len(frames), routing_key)
+        self.channel.basic_publish(exchange=self.exchange, routing_key=routing_key,
+                                   content=content, mandatory=True)
+
+
+class ReplyAckBatcher(object):
+    """按批确认 RPC 响应消息（basic_ack multiple=True）"""
+
+    def __init__(self, channel, batch_options):
+        self.channel = channel
+        self.batch_options = batch_options
+
+        self._last_delivery_tag = None
+        self._unacked = 0
+        self._delayed_ack = None
+
+    def ack(self, delivery_tag):
+        self._last_delivery_tag = delivery_tag
+        self._unacked += 1
+
+        if self._unacked >= self.batch_options.max_acks:
+            self.flush()
+        elif not self._delayed_ack:
+            self._delayed_ack = reactor.callLater(self.batch_options.window, self.flush)
+
+    def flush(self):
+        if self._delayed_ack and self._delayed_ack.active():
+            self._delayed_ack.cancel()
+        self._delayed_ack = None
+
+        if not self._unacked:
+            return
+
+        self.channel.basic_ack(self._last_delivery_tag, True)
+        self._unacked = 0
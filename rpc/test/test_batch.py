@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import pytest
+
+from thrift.protocol.TBinaryProtocol import TBinaryProtocolFactory
+from thrift.Thrift import TMessageType
+from thrift.transport import TTransport
+from twisted.internet import defer
+from txamqp.content import Content
+
+from gcommon.rpc.batch import BATCH_HEADER, RpcBatchOptions, ReplyAckBatcher
+from gcommon.rpc.batch import pack_frames, unpack_frames, get_batch_frames, process_batch_frames
+
+
+def _request(name, seqid):
+    buf = TTransport.TMemoryBuffer()
+    prot = TBinaryProtocolFactory().getProtocol(buf)
+    prot.writeMessageBegin(name, TMessageType.CALL, seqid)
+    prot.writeMessageEnd()
+    return buf.getvalue()
+
+
+def test_frames_round_trip():
+    frames = [_request('get_user', 1), '', 'x' * 70000]
+    body = pack_frames(frames)
+    assert unpack_frames(body) == frames
+    assert unpack_frames('') == []
+
+    with pytest.raises(ValueError):
+        unpack_frames(body[:2])
+    with pytest.raises(ValueError):
+        unpack_frames(body[:-1])
+
+
+def test_get_batch_frames():
+    frames = ['a', 'bc']
+    assert get_batch_frames(Content(pack_frames(frames), properties={'headers': {BATCH_HEADER: 2}})) == frames
+
+    # 单个请求按原格式发送
+    assert get_batch_frames(Content('a')) is None
+    assert get_batch_frames(Content('a', properties={'headers': {'thriftClientName': 'c'}})) is None
+
+
+class Processor(object):
+    def __init__(self):
+        self.processed = []
+
+    def process(self, iprot, oprot):
+        name, _, seqid = iprot.readMessageBegin()
+        if name == 'fail':
+            return defer.fail(RuntimeError('handler failed'))
+
+        self.processed.append((name, seqid))
+        return defer.succeed(None)
+
+
+def test_bad_frame_does_not_drop_siblings():
+    processor = Processor()
+    factory = TBinaryProtocolFactory()
+    frames = [_request('a', 1), 'garbage', _request('fail', 2), _request('b', 3)]
+
+    process_batch_frames(processor, frames, TTransport.TMemoryBuffer(), factory, factory)
+
+    assert processor.processed == [('a', 1), ('b', 3)]
+
+
+class Channel(object):
+    def __init__(self):
+        self.acks = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+
+def test_reply_ack_batcher():
+    channel = Channel()
+    batcher = ReplyAckBatcher(channel, RpcBatchOptions(window=10, max_acks=3))
+
+    batcher.ack(1)
+    batcher.ack(2)
+    assert channel.acks == []
+
+    batcher.ack(3)
+    assert channel.acks == [(3, True)]
+
+    batcher.ack(4)
+    assert batcher._delayed_ack.active()
+    batcher.flush()
+    assert channel.acks == [(3, True), (4, True)]
+    assert batcher._delayed_ack is None
+
+    batcher.flush()
+    assert len(channel.acks) == 2
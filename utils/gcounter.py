@@ -2,7 +2,19 @@
 # -*- coding: utf-8 -*-
 # created: 2015-08-19
 
-"""计数器、计时器、序号发生器等。"""
+"""计数器、计时器、序号发生器、延迟直方图和指标注册表等。
+
+    requests = registry.counter('rpc_requests', 'RPC 请求数', labels=('method',))
+    requests.labels(method='get_user').inc()
+
+    latency = registry.histogram('rpc_latency_ms', 'RPC 处理时间', labels=('method',))
+    latency.labels(method='get_user').observe(12.5)
+
+    print registry.exposition()
+"""
+import math
+import random
+import re
 import time
 from contextlib import contextmanager
 
@@ -110,6 +122,78 @@ class Gauge(object):
         pass
 
 
+class Histogram(object):
+    """固定内存的直方图（比如延迟，单位毫秒）。
+
+    按对数分桶：第 i 个桶包含 (MIN_VALUE * GROWTH^(i-1), MIN_VALUE * GROWTH^i] 之间的值，
+    百分位数的相对误差不超过 GROWTH - 1. 超过 MAX_VALUE 的值计入最后一个桶。
+    """
+    MIN_VALUE = 0.001
+    MAX_VALUE = 3600 * 1000.0
+    GROWTH = 1.04
+
+    _LOG_GROWTH = math.log(GROWTH)
+    BUCKETS = int(math.ceil(math.log(MAX_VALUE / MIN_VALUE) / _LOG_GROWTH)) + 1
+
+    def __init__(self):
+        self._buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        if value <= self.MIN_VALUE:
+            index = 0
+        else:
+            index = min(int(math.ceil(math.log(value / self.MIN_VALUE) / self._LOG_GROWTH)), self.BUCKETS - 1)
+
+        self._buckets[index] += 1
+        self.count += 1
+        self.sum += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @contextmanager
+    def time(self):
+        """记录执行时间（毫秒）"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe((time.time() - start) * 1000)
+
+    def percentile(self, q):
+        """q: 0 - 1，比如 0.99. 没有数据时返回 None"""
+        if not self.count:
+            return None
+
+        rank = max(int(math.ceil(q * self.count)), 1)
+
+        seen = 0
+        for index, bucket in enumerate(self._buckets):
+            seen += bucket
+            if seen >= rank:
+                break
+
+        if index == self.BUCKETS - 1:
+            # 超过 MAX_VALUE 的值
+            return self.max
+
+        value = self.MIN_VALUE * self.GROWTH ** index
+        return min(max(value, self.min), self.max)
+
+    def reset(self):
+        self._buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+
 class Timer(_Register):
     """统计调用时间"""
     @staticmethod
@@ -122,8 +206,7 @@ class Timer(_Register):
             yield
         finally:
             time_past = time.time() - start
-            time_past = int(time_past * 1000)
-            timer.inc(time_past)
+            timer.inc(time_past * 1000)
         pass
 
     def __init__(self, name):
@@ -131,12 +214,16 @@ class Timer(_Register):
         self.count = 0
         self.total_time = 0
 
+        # 不随 clear() 清零，用于查看延迟分布
+        self.histogram = Histogram()
+
         self.register(name, self)
 
     def inc(self, time_past):
-        """增加一次执行次数，并同时增加时间"""
+        """增加一次执行次数，并同时增加时间（毫秒）"""
         self.count += 1
-        self.total_time += time_past
+        self.total_time += int(time_past)
+        self.histogram.observe(time_past)
 
     def clear(self):
         """计算平均时间并将计时器清零"""
@@ -149,6 +236,243 @@ class Timer(_Register):
         return average
 
 
+class _GaugeValue(SimpleCounter):
+    def set(self, value):
+        self._value = value
+
+    @contextmanager
+    def track(self, value=1):
+        """某种状态的当前活跃数量"""
+        self.inc(value)
+        try:
+            yield self
+        finally:
+            self.dec(value)
+
+
+class _Metric(object):
+    """一组同名的指标，每组标签值（label values）对应一个值。没有标签时可以直接调用值的方法。"""
+    TYPE = None
+
+    def __init__(self, name, help='', labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+        # label values -> value
+        self._values = {}
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.label_names)
+
+        assert len(values) == len(self.label_names), 'labels of %s: %s' % (self.name, self.label_names)
+
+        value = self._values.get(values)
+        if value is None:
+            value = self._values[values] = self._new_value()
+
+        return value
+
+    def __getattr__(self, name):
+        # 没有标签的指标：metric.inc() 等同于 metric.labels().inc()
+        if name.startswith('_') or self.label_names:
+            raise AttributeError(name)
+
+        return getattr(self.labels(), name)
+
+    def items(self):
+        """[(label values, value)]"""
+        return sorted(self._values.items())
+
+
+class CounterMetric(_Metric):
+    TYPE = 'counter'
+
+    def _new_value(self):
+        return SimpleCounter()
+
+
+class GaugeMetric(_Metric):
+    TYPE = 'gauge'
+
+    def _new_value(self):
+        return _GaugeValue()
+
+
+class HistogramMetric(_Metric):
+    """以 summary 格式输出 p50、p99、p999、count、sum 和 max"""
+    TYPE = 'summary'
+
+    QUANTILES = (0.5, 0.99, 0.999)
+
+    def _new_value(self):
+        return Histogram()
+
+
+_NAME_REGEX = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _metric_name(name):
+    return _NAME_REGEX.sub('_', name)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                             for name, value in pairs)
+
+
+class MetricsRegistry(object):
+    """指标注册表，exposition() 输出文本格式（兼容 Prometheus）。同时输出 Counter 和 Timer 的值。"""
+
+    def __init__(self, include_legacy=True):
+        self._metrics = {}
+        self._include_legacy = include_legacy
+
+    def _get_or_create(self, metric_class, name, help, labels):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_class(name, help, labels)
+        else:
+            assert type(metric) is metric_class and metric.label_names == tuple(labels), \
+                'metric %s already registered as %s%s' % (name, metric.TYPE, metric.label_names)
+
+        return metric
+
+    def counter(self, name, help='', labels=()):
+        return self._get_or_create(CounterMetric, name, help, labels)
+
+    def gauge(self, name, help='', labels=()):
+        return self._get_or_create(GaugeMetric, name, help, labels)
+
+    def histogram(self, name, help='', labels=()):
+        return self._get_or_create(HistogramMetric, name, help, labels)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def exposition(self):
+        lines = []
+        for name in sorted(self._metrics):
+            self._format_metric(self._metrics[name], lines)
+
+        if self._include_legacy:
+            self._format_legacy(lines)
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _format_metric(metric, lines):
+        name = _metric_name(metric.name)
+        if metric.help:
+            lines.append('# HELP %s %s' % (name, metric.help))
+        lines.append('# TYPE %s %s' % (name, metric.TYPE))
+
+        for values, value in metric.items():
+            if metric.TYPE != HistogramMetric.TYPE:
+                lines.append('%s%s %s' % (name, _format_labels(metric.label_names, values), value.value))
+                continue
+
+            MetricsRegistry._format_histogram(name, metric.label_names, values, value, lines)
+
+    @staticmethod
+    def _format_histogram(name, label_names, values, histogram, lines):
+        for q in HistogramMetric.QUANTILES:
+            percentile = histogram.percentile(q)
+            lines.append('%s%s %s' % (name, _format_labels(label_names, values, [('quantile', q)]),
+                                      'NaN' if percentile is None else '%.3f' % percentile))
+
+        labels = _format_labels(label_names, values)
+        lines.append('%s_count%s %d' % (name, labels, histogram.count))
+        lines.append('%s_sum%s %.3f' % (name, labels, histogram.sum))
+        lines.append('%s_max%s %.3f' % (name, labels, histogram.max or 0))
+
+    @staticmethod
+    def _format_legacy(lines):
+        for name, counter in sorted(Counter.all().items()):
+            name = _metric_name(name)
+            lines.append('# TYPE %s untyped' % name)
+            lines.append('%s %s' % (name, counter.value))
+
+        for name, timer in sorted(Timer.all().items()):
+            name = _metric_name(name) + '_ms'
+            lines.append('# TYPE %s summary' % name)
+            MetricsRegistry._format_histogram(name, (), (), timer.histogram, lines)
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+
+class _RequestStats(object):
+    __slots__ = ('latency', 'in_flight', 'requests', 'errors')
+
+
+class RequestMetrics(object):
+    """按照标签（比如路由、RPC 方法）统计请求：处理时间、正在处理的请求数、请求数和错误数。
+
+        rpc_metrics = RequestMetrics('rpc', labels=('method',))
+
+        token = rpc_metrics.start('get_user')
+        ...
+        rpc_metrics.finish(token, error=False)
+
+    :param sample_rate: 记录处理时间的请求比例（0 - 1），请求数和错误数总是记录。
+        按照配置使用不同比例时，调用 finish 时传入，不要修改共用的 RequestMetrics
+    """
+
+    def __init__(self, prefix, labels=('name',), sample_rate=1.0, metrics_registry=None):
+        metrics_registry = metrics_registry or registry
+
+        self._latency = metrics_registry.histogram(prefix + '_latency_ms', '处理时间（毫秒）', labels)
+        self._in_flight = metrics_registry.gauge(prefix + '_in_flight', '正在处理的请求数', labels)
+        self._requests = metrics_registry.counter(prefix + '_requests', '请求数', labels)
+        self._errors = metrics_registry.counter(prefix + '_errors', '错误数', labels)
+
+        self.sample_rate = sample_rate
+
+        # label values -> _RequestStats，避免每个请求查找四个指标
+        self._stats = {}
+
+    def _get_stats(self, label_values):
+        stats = _RequestStats()
+        stats.latency = self._latency.labels(*label_values)
+        stats.in_flight = self._in_flight.labels(*label_values)
+        stats.requests = self._requests.labels(*label_values)
+        stats.errors = self._errors.labels(*label_values)
+
+        self._stats[label_values] = stats
+        return stats
+
+    def start(self, *label_values):
+        """返回传给 finish 的 token"""
+        stats = self._stats.get(label_values) or self._get_stats(label_values)
+        stats.in_flight.inc()
+        return stats, time.time()
+
+    def finish(self, token, error=False, sample_rate=None):
+        """:param sample_rate: 记录处理时间的比例，None 时使用 self.sample_rate"""
+        stats, started = token
+
+        stats.in_flight.dec()
+        stats.requests.inc()
+        if error:
+            stats.errors.inc()
+
+        if sample_rate is None:
+            sample_rate = self.sample_rate
+
+        if sample_rate >= 1 or random.random() < sample_rate:
+            stats.latency.observe((time.time() - started) * 1000)
+
+
 def demo():
     connections = Counter("total_connections")
     connections.inc(100)
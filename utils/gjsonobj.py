@@ -8,6 +8,40 @@ import sys
 
 from gcommon.utils import gobject, gstr
 
+# JsonObject.loads、LazyJsonObject.loads 使用的 JSON 库，默认为标准库，见 use_fast_json
+_hook_json = json
+_fast_json = json
+
+
+def use_fast_json():
+    """使用已经安装的 simplejson（JsonObject.loads）和 ujson（LazyJsonObject.loads）解析 JSON，
+    没有安装时仍然使用标准库。在进程启动时调用一次，返回 (hook 使用的库, lazy 使用的库)。
+
+    - simplejson 的 C 扩展支持 object_pairs_hook。输入总是先转换为 unicode，字符串与标准库相同（unicode）
+    - ujson 不支持 hook，但是解析为 dict 最快。与标准库的区别：超过 64 位的整数抛出 ValueError，
+      浮点数默认不是精确解析（最后一位可能不同），不支持 NaN、Infinity
+    """
+    global _hook_json, _fast_json
+
+    try:
+        import simplejson as _hook_json
+    except ImportError:
+        _hook_json = json
+
+    try:
+        import ujson as _fast_json
+    except ImportError:
+        _fast_json = _hook_json
+
+    return _hook_json, _fast_json
+
+
+def _to_unicode(json_content):
+    if isinstance(json_content, str):
+        return json_content.decode('utf-8')
+
+    return json_content
+
 
 class JsonAttributeError(AttributeError): pass
 
@@ -56,19 +90,20 @@ class JsonObject(dict):
     def __hash__(self):
         return id(self)
 
+    @classmethod
+    def _from_pairs(cls, pairs):
+        """解析时直接创建 JsonObject（子节点已经是 JsonObject），不需要再遍历一遍"""
+        obj = dict.__new__(cls)
+        dict.__init__(obj, pairs)
+        return obj
+
     @staticmethod
     def loads(json_content):
-        if isinstance(json_content, str):
-            return JsonObject(json.loads(json_content))
-        else:
-            j = json.loads(json_content.decode('utf-8'))
-            if isinstance(j, list):
-                result = []
-                for item in j:
-                    result.append(JsonObject(item))
-                return result
-            else:
-                return JsonObject(j)
+        j = _hook_json.loads(_to_unicode(json_content), object_pairs_hook=JsonObject._from_pairs)
+        if j is None:
+            return JsonObject()
+
+        return j
 
     @staticmethod
     def load_obj(obj, *names):
@@ -96,6 +131,71 @@ class JsonObject(dict):
         return self
 
 
+class _JsonList(list):
+    """LazyJsonObject 中的 list：其中的 dict 在访问（下标、切片、遍历）时转换为 LazyJsonObject"""
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+
+        value = list.__getitem__(self, index)
+        if type(value) is dict:
+            value = LazyJsonObject(value)
+            list.__setitem__(self, index, value)
+
+        return value
+
+    def __getslice__(self, start, stop):
+        return self[max(0, start):max(0, stop):]
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+
+class LazyJsonObject(JsonObject):
+    """创建时不遍历子节点，子节点中的 dict 在第一次访问时（obj.name、obj['name']、obj.get('name')）
+    转换为 LazyJsonObject 并替换原来的值。
+
+    适合只访问少量字段的大对象（缓存、请求）。items()、values() 和遍历返回的是原始的值。
+    """
+
+    def __init__(self, d=None):
+        dict.__init__(self, d or {})
+
+    def __getitem__(self, key):
+        return self.__wrap(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+
+        return self.__wrap(key, dict.__getitem__(self, key))
+
+    def __getattr__(self, name):
+        return self.get(name, None)
+
+    def __wrap(self, key, value):
+        value_type = type(value)
+        if value_type is dict:
+            value = LazyJsonObject(value)
+        elif value_type is list:
+            value = _JsonList(value)
+        else:
+            return value
+
+        dict.__setitem__(self, key, value)
+        return value
+
+    @staticmethod
+    def loads(json_content):
+        j = _fast_json.loads(_to_unicode(json_content))
+        if isinstance(j, list):
+            return _JsonList(j)
+        else:
+            return LazyJsonObject(j)
+
+
 if __name__ == '__main__':
     user_def = {'name': 'user123', 'password': '123456',
                 "values": {"a": 1, "b": 2}}
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""JsonObject 解析的开销（约 1 KB、100 KB、10 MB 的缓存数据）
+
+- eager: 之前的实现，json.loads 之后 JsonObject() 再遍历一遍
+- JsonObject.loads: 解析时通过 object_pairs_hook 直接创建 JsonObject
+- LazyJsonObject.loads: 只解析为 dict，访问时转换
+- LazyJsonObject.loads + access: 解析之后访问少量字段
+
+Run: python gjsonobj_bench.py [--fast]    （--fast: use_fast_json()，需要安装 simplejson、ujson）
+"""
+
+import json
+import sys
+import time
+
+from gcommon.utils import gjsonobj
+from gcommon.utils.gjsonobj import JsonObject, LazyJsonObject
+
+
+SIZES = ((1024, 2000), (100 * 1024, 50), (10 * 1024 * 1024, 2))
+
+
+def make_payload(size):
+    """类似团队资料的缓存：成员列表，每个成员有嵌套的属性"""
+    members = []
+    team = {'team_id': 1, 'name': 'team-1', 'owner': {'user_id': 1, 'name': 'user-000001'}, 'members': members}
+
+    length = len(json.dumps(team))
+    while length < size:
+        index = len(members)
+        member = {
+            'user_id': index,
+            'name': 'user-%06d' % index,
+            'profile': {'email': 'user-%06d@example.com' % index, 'title': 'engineer', 'tags': ['a', 'b']},
+            'roles': [{'role': 'member', 'since': 1500000000 + index}],
+        }
+        members.append(member)
+        length += len(json.dumps(member)) + 2
+
+    return json.dumps(team)
+
+
+def eager(content):
+    return JsonObject(json.loads(content))
+
+
+def access(content):
+    team = LazyJsonObject.loads(content)
+    return team.owner.name, team.members[0].profile.email
+
+
+def bench(name, content, count, func):
+    started = time.time()
+    for _ in xrange(count):
+        func(content)
+    elapsed = (time.time() - started) / count
+    print('  %-32s %10.3f ms' % (name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    if '--fast' in sys.argv:
+        gjsonobj.use_fast_json()
+
+    print('backends: %s (object_pairs_hook), %s (lazy)' % (
+        gjsonobj._hook_json.__name__, gjsonobj._fast_json.__name__))
+
+    for _size, _count in SIZES:
+        _content = make_payload(_size)
+        print('payload: %d KB' % (len(_content) / 1024))
+
+        bench('eager', _content, _count, eager)
+        bench('JsonObject.loads', _content, _count, JsonObject.loads)
+        bench('LazyJsonObject.loads', _content, _count, LazyJsonObject.loads)
+        bench('LazyJsonObject.loads + access', _content, _count, access)
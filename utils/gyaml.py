@@ -56,13 +56,13 @@ class ConfigParser(object):
         except:
             return 0
         
-    def get_float(self, name):
-        """Get an int value from current config set."""
+    def get_float(self, name, default=0):
+        """Get a float value from current config set, default if the option is missing or invalid."""
         ret = self._get(self._options, name)
         try:
             return float(ret)
         except:
-            return 0
+            return default
 
     def _parse_group(self, option_values, params=None):
         options = {}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+from gcommon.utils.gcounter import Histogram, MetricsRegistry, RequestMetrics
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    assert histogram.percentile(0.5) is None
+
+    for i in range(1, 10001):
+        histogram.observe(i / 10.0)
+
+    assert histogram.count == 10000
+    assert histogram.max == 1000.0
+    for q, expected in ((0.5, 500.0), (0.99, 990.0), (0.999, 999.0)):
+        assert abs(histogram.percentile(q) - expected) <= expected * (Histogram.GROWTH - 1)
+
+    # 超出范围的值
+    histogram.observe(0)
+    histogram.observe(Histogram.MAX_VALUE * 10)
+    assert histogram.percentile(1) == Histogram.MAX_VALUE * 10
+    assert histogram.percentile(0) <= Histogram.MIN_VALUE
+
+
+def test_labeled_metrics_exposition():
+    registry = MetricsRegistry(include_legacy=False)
+
+    requests = registry.counter('rpc_requests', 'RPC requests', labels=('method', 'result'))
+    requests.labels('get_user', 'ok').inc()
+    requests.labels(method='get_user', result='ok').inc(2)
+    requests.labels(method='get_team', result='error').inc()
+    assert registry.counter('rpc_requests', labels=('method', 'result')) is requests
+
+    connections = registry.gauge('connections')
+    connections.set(5)
+    with connections.track():
+        assert connections.value == 6
+
+    latency = registry.histogram('route_latency_ms', labels=('route',))
+    latency.labels('/api/"x"').observe(2.0)
+
+    text = registry.exposition()
+    assert '# HELP rpc_requests RPC requests\n# TYPE rpc_requests counter\n' in text
+    assert 'rpc_requests{method="get_user",result="ok"} 3\n' in text
+    assert 'rpc_requests{method="get_team",result="error"} 1\n' in text
+    assert 'connections 5\n' in text
+    assert 'route_latency_ms{route="/api/\\"x\\"",quantile="0.99"} 2.000\n' in text
+    assert 'route_latency_ms_count{route="/api/\\"x\\""} 1\n' in text
+
+
+def test_request_metrics():
+    registry = MetricsRegistry(include_legacy=False)
+    metrics = RequestMetrics('rpc', labels=('method',), metrics_registry=registry)
+
+    token = metrics.start('get_user')
+    assert registry.get('rpc_in_flight').labels('get_user').value == 1
+    metrics.finish(token)
+    metrics.finish(metrics.start('get_user'), error=True)
+
+    assert registry.get('rpc_in_flight').labels('get_user').value == 0
+    assert registry.get('rpc_requests').labels('get_user').value == 2
+    assert registry.get('rpc_errors').labels('get_user').value == 1
+    assert registry.get('rpc_latency_ms').labels('get_user').count == 2
+
+    # 只记录部分请求的处理时间
+    metrics.sample_rate = 0.0001
+    for _ in range(100):
+        metrics.finish(metrics.start('get_team'))
+
+    assert registry.get('rpc_requests').labels('get_team').value == 100
+    assert registry.get('rpc_latency_ms').labels('get_team').count < 10
+
+    # 调用方传入的比例优先，0 时不记录处理时间
+    for _ in range(10):
+        metrics.finish(metrics.start('get_group'), sample_rate=0)
+        metrics.finish(metrics.start('get_member'), sample_rate=1.0)
+
+    assert registry.get('rpc_requests').labels('get_group').value == 10
+    assert registry.get('rpc_latency_ms').labels('get_group').count == 0
+    assert registry.get('rpc_latency_ms').labels('get_member').count == 10
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import json
+
+from gcommon.utils import gjsonobj
+from gcommon.utils.gjsonobj import JsonObject, LazyJsonObject
+
+
+DATA = {
+    'team': {'name': 'dev', 'owner': {'id': 1}},
+    'members': [{'id': 1, 'tags': ['a', {'k': 'v'}]}, 2],
+    'total': 2,
+}
+
+
+def test_loads_builds_json_objects():
+    obj = JsonObject.loads(json.dumps(DATA))
+
+    assert obj == JsonObject(DATA)
+    assert type(obj.team.owner) == JsonObject
+    assert obj.team.owner.id == 1
+    assert type(obj.members[0]) == JsonObject
+    assert obj.missing is None
+
+    assert JsonObject.loads(u'null') == {}
+    items = JsonObject.loads(u'[{"a": 1}, {"b": {"c": 2}}]')
+    assert items[1].b.c == 2
+
+
+def test_lazy_wraps_on_access():
+    raw = json.loads(json.dumps(DATA))
+    obj = LazyJsonObject(raw)
+
+    # 访问之前不转换
+    assert type(dict.__getitem__(obj, 'team')) is dict
+
+    team = obj.team
+    assert type(team) is LazyJsonObject
+    assert obj.team is team
+    assert obj['team'] is team and obj.get('team') is team
+    assert team.owner.id == 1
+
+    members = obj.members
+    assert obj.members is members
+    assert members[0].id == 1 and members[1] == 2
+    assert obj.get('missing', 5) == 5 and obj.missing is None
+
+    # 修改缓存的子节点
+    obj.team.owner.name = 'root'
+    obj.set_value = 1
+    setattr(obj, 'props.sex', 'male')
+    assert json.loads(obj.dumps()) == dict(DATA, team={'name': 'dev', 'owner': {'id': 1, 'name': 'root'}},
+                                           set_value=1, props={'sex': 'male'})
+
+
+def test_lazy_loads():
+    obj = LazyJsonObject.loads(json.dumps(DATA))
+    assert obj == DATA
+    assert obj.team.owner.id == 1
+
+    items = LazyJsonObject.loads(b'[{"a": {"b": 1}}, 3, {"c": 4}]')
+    assert items[0].a.b == 1 and items[1] == 3
+    assert items[-1].c == 4 and items[1:][1].c == 4
+    assert [type(item) for item in items] == [LazyJsonObject, int, LazyJsonObject]
+    assert json.loads(json.dumps(items)) == [{'a': {'b': 1}}, 3, {'c': 4}]
+
+
+def test_loads_unicode_strings():
+    # 默认使用标准库；str 和 unicode 输入的字符串都是 unicode
+    assert gjsonobj._hook_json is json and gjsonobj._fast_json is json
+
+    for loads in (JsonObject.loads, LazyJsonObject.loads):
+        for content in ('{"name": "dev", "owner": {"name": "\xe5\x8f\xa4"}}',
+                        u'{"name": "dev", "owner": {"name": "\u53e4"}}'):
+            obj = loads(content)
+            assert type(obj.name) is unicode and obj.name == u'dev'
+            assert obj.owner.name == u'\u53e4'
+
+
+def test_use_fast_json():
+    try:
+        hook_json, fast_json = gjsonobj.use_fast_json()
+        assert hook_json.__name__ in ('json', 'simplejson')
+        assert fast_json.__name__ in ('json', 'simplejson', 'ujson')
+        assert JsonObject.loads('{"a": {"b": "c"}}').a.b == u'c'
+        assert LazyJsonObject.loads('{"a": {"b": "c"}}').a.b == u'c'
+    finally:
+        gjsonobj._hook_json = gjsonobj._fast_json = json
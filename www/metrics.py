@@ -0,0 +1,24 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""以文本格式输出指标（gcounter.registry），兼容 Prometheus.
+
+    root.putChild('metrics', MetricsResource())
+"""
+
+from twisted.web import resource
+
+from gcommon.utils.gcounter import registry
+
+
+class MetricsResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, metrics_registry=None):
+        resource.Resource.__init__(self)
+        self._registry = metrics_registry or registry
+
+    def render_GET(self, request):
+        request.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        return self._registry.exposition()
@@ -0,0 +1,180 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""按 URL 段组织的路由树。
+
+路由字符串按 '/' 拆分为段，每一段属于以下三类之一：
+    - 静态段：只包含 [-\\w] 字符，例如 'api', 'hello'
+    - 参数段：整段为 <name>，例如 '<username>'
+    - 模式段：静态文字与 <name> 混合，例如 'v<version>', 'file_<fid>.json'
+
+匹配时按照 静态段 -> 模式段 -> 参数段 的优先级逐段查找（失败时回溯），
+叶子节点上为每个 HTTP method 保存一张处理函数表。
+
+注意：优先级与之前按注册顺序线性查找（先注册的优先）不同。例如先注册 /user/<id>
+再注册 /user/me 时，线性查找中 /user/me 由 /user/<id> 处理，路由树中由 /user/me 处理。
+两个路由不会同时匹配一个 URL 时，结果与线性查找相同。
+
+参数的取值规则与 SlimNavigator.build_route_pattern 保持一致。
+包含其它正则语法的路由无法按段拆分，放入 fallback 列表按注册顺序线性匹配。
+"""
+
+import re
+
+
+# 与 SlimNavigator.build_route_pattern 使用相同的参数取值规则
+PARAM_VALUE_REGEX = r'[-_:\.\w]+'
+
+_param_value_re = re.compile('^%s$' % PARAM_VALUE_REGEX)
+_param_segment_re = re.compile(r'^<(\w+)>$')
+_static_segment_re = re.compile(r'^[-\w]*$')
+_tree_route_re = re.compile(r'^[-\w/<>\.]*$')
+
+
+def build_segment_pattern(segment):
+    """将包含 <name> 的模式段编译为正则（仅匹配一个段）"""
+    segment_regex = re.sub(r'(<\w+>)', r'(?P\1%s)' % PARAM_VALUE_REGEX, segment)
+    return re.compile("^{}$".format(segment_regex))
+
+
+class RouteNode(object):
+    __slots__ = ('static_children', 'pattern_children', 'param_child', 'handlers')
+
+    def __init__(self):
+        # segment -> RouteNode
+        self.static_children = {}
+
+        # [(segment, compiled pattern, RouteNode)], 按注册顺序
+        self.pattern_children = []
+
+        # <name> 段共享同一个子节点，不同路由可以使用不同的参数名
+        self.param_child = None
+
+        # method -> (view_func, methods, param_names)
+        self.handlers = {}
+
+
+class RouteTree(object):
+    """路由树：get_route_match 的返回值格式与线性查找相同：(params, view_func, methods)，
+    多个路由匹配同一个 URL 时按照段的类型而不是注册顺序选择（见模块说明）"""
+
+    def __init__(self):
+        self.root = RouteNode()
+
+        # 无法拆分成段的路由：[(compiled pattern, view_func, methods)]
+        self.fallback_routes = []
+
+    @staticmethod
+    def is_tree_route(route_str):
+        """路由中只有静态文字、'/' 和 <name> 参数时可以放入路由树"""
+        if not _tree_route_re.match(route_str):
+            return False
+
+        # '.' 在原始正则中匹配任意字符（包括 '/'），只允许出现在段内部
+        for segment in route_str.split('/'):
+            if '.' in segment and not re.search(r'<\w+>', segment):
+                return False
+
+        return True
+
+    def add_route(self, route_str, view_func, methods, route_pattern=None):
+        if not self.is_tree_route(route_str):
+            if route_pattern is None:
+                route_regex = re.sub(r'(<\w+>)', r'(?P\1%s)' % PARAM_VALUE_REGEX, route_str)
+                route_pattern = re.compile("^{}$".format(route_regex))
+            self.fallback_routes.append((route_pattern, view_func, methods))
+            return
+
+        node = self.root
+        param_names = []
+
+        for segment in route_str.split('/'):
+            param_match = _param_segment_re.match(segment)
+            if param_match:
+                if not node.param_child:
+                    node.param_child = RouteNode()
+                node = node.param_child
+                param_names.append(param_match.group(1))
+            elif _static_segment_re.match(segment):
+                node = node.static_children.setdefault(segment, RouteNode())
+                param_names.append(None)
+            else:
+                for pattern_segment, _, child in node.pattern_children:
+                    if pattern_segment == segment:
+                        node = child
+                        break
+                else:
+                    child = RouteNode()
+                    node.pattern_children.append((segment, build_segment_pattern(segment), child))
+                    node = child
+                param_names.append(segment)
+
+        param_names = tuple(param_names)
+        for method in methods:
+            # 同一 URL 同一 method 重复注册时，与线性查找一样以先注册的为准
+            node.handlers.setdefault(method, (view_func, methods, param_names))
+
+    def get_route_match(self, path, method):
+        segments = path.split('/')
+        found = self._match(self.root, segments, 0, method)
+        if found:
+            (view_func, methods, param_names), values = found
+            return self._build_params(param_names, values), view_func, methods
+
+        for route_pat, view_func, methods in self.fallback_routes:
+            if method not in methods:
+                continue
+            match = route_pat.match(path)
+            if match:
+                return match.groupdict(), view_func, methods
+
+        return None
+
+    def _match(self, node, segments, index, method):
+        """深度优先匹配；返回 (handler, 各段取值) 或 None"""
+        if index == len(segments):
+            handler = node.handlers.get(method)
+            if handler:
+                return handler, []
+            return None
+
+        segment = segments[index]
+
+        child = node.static_children.get(segment)
+        if child:
+            found = self._match(child, segments, index + 1, method)
+            if found:
+                found[1].append(segment)
+                return found
+
+        for _, pattern, child in node.pattern_children:
+            match = pattern.match(segment)
+            if match:
+                found = self._match(child, segments, index + 1, method)
+                if found:
+                    found[1].append(match)
+                    return found
+
+        if node.param_child and _param_value_re.match(segment):
+            found = self._match(node.param_child, segments, index + 1, method)
+            if found:
+                found[1].append(segment)
+                return found
+
+        return None
+
+    @staticmethod
+    def _build_params(param_names, values):
+        # values 在回溯过程中逆序追加
+        params = {}
+        for name, value in zip(param_names, reversed(values)):
+            if name is None:
+                continue
+
+            if isinstance(value, basestring):
+                params[name] = value
+            else:
+                params.update(value.groupdict())
+
+        return params
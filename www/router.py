@@ -9,17 +9,23 @@ import traceback
 import sys
 
 import time
-from twisted.internet.defer import inlineCallbacks, maybeDeferred
+from twisted.internet.defer import inlineCallbacks, maybeDeferred, returnValue
 from exceptions import NotImplementedError
 from gcommon.app import const
 from gcommon.utils import tm
+from gcommon.utils.gcounter import RequestMetrics
 from gcommon.utils.jsonobj import JsonObject
 from gcommon.app.slim_errors import SlimError, SlimExcept
+from gcommon.logger.glogger import access_fields
 from gcommon.www.http_utils import set_options_methods
+from gcommon.www.route_tree import RouteTree, PARAM_VALUE_REGEX
 
 
 logger = logging.getLogger('Router')
 
+# 按照路由（URL 模式）和方法统计处理时间、正在处理的请求数和错误数
+route_metrics = RequestMetrics('http_route', labels=('route', 'method'))
+
 
 def url_route(url_pattern, **args):
     """Decorator: 修饰 URL 的处理函数，构造 URL MAP."""
@@ -32,9 +38,11 @@ def url_route(url_pattern, **args):
 
 
 class SlimNavigator(object):
-    def __init__(self, service_handler):
-        # TODO: routing table should be stored in trees other than list
-        self.routes = []
+    def __init__(self, service_handler, sample_rate=None):
+        # 记录处理时间的请求比例，None 时使用 route_metrics.sample_rate
+        self.sample_rate = sample_rate
+
+        self.route_tree = RouteTree()
 
         for item_name in dir(service_handler):
             item = getattr(service_handler, item_name)
@@ -52,7 +60,7 @@ class SlimNavigator(object):
     @staticmethod
     def build_route_pattern(route):
         """ compile url pattern into regex """
-        route_regex = re.sub(r'(<\w+>)', r'(?P\1[-_:\.\w]+)', route)
+        route_regex = re.sub(r'(<\w+>)', r'(?P\1%s)' % PARAM_VALUE_REGEX, route)
         return re.compile("^{}$".format(route_regex))
 
     def add_url_rules(self, route_str, view_func, methods):
@@ -68,31 +76,41 @@ class SlimNavigator(object):
 
         methods.add("OPTIONS")
         route_pattern = self.build_route_pattern(route_str)
-
-        self.routes.append((route_pattern, view_func, methods))
+        self.route_tree.add_route(route_str, view_func, methods, route_pattern)
 
     def get_route_match(self, path, method):
-        """ Get correspond view function from routing table """
-        for route_pat, view_func, methods in self.routes:
-            if method not in methods:
-                # requested method must in accepted methods
-                continue
-            match = route_pat.match(path)
-            if match:
-                # get appropriate view function and arguments
-                return match.groupdict(), view_func, methods
-
-        # No matched path
-        return None
+        """ Get correspond view function from routing tree """
+        return self.route_tree.get_route_match(path, method)
 
-    @inlineCallbacks
     def serve(self, path, request, method):
         """ serve a request from specific path """
+        route_match = self.get_route_match(path, method)
+        if route_match:
+            route = getattr(route_match[1], const.ROUTER_PARAM_PATH, route_match[1].__name__)
+        else:
+            route = 'unmatched'
+
+        token = route_metrics.start(route, method)
+
+        def __done(failed):
+            route_metrics.finish(token, failed, self.sample_rate)
+
+        def __error(f):
+            route_metrics.finish(token, True, self.sample_rate)
+            return f
+
+        d = self._serve(path, request, method, route_match, route)
+        d.addCallbacks(__done, __error)
+        return d
+
+    @inlineCallbacks
+    def _serve(self, path, request, method, route_match, route):
+        """返回的 Deferred 在处理失败时返回 True"""
         logger.debug('process %s request start - from %s:%s: %s', method, request.client.host, request.client.port, path)
         request.loaded_content = request.content.read()
         when_started = time.time()
 
-        route_match = self.get_route_match(path, method)
+        failed = False
         if route_match:
             if method == 'OPTIONS':
                 set_options_methods(request, allowed_methods=route_match[-1])
@@ -101,9 +119,14 @@ class SlimNavigator(object):
                 rtn = JsonObject()
                 rtn.result = result.code
                 rtn.result_desc = result.desc
-                request.write(rtn.dumps())
+                content = rtn.dumps()
+                request.write(content)
                 logger.access('processed %s request from %s:%s: %s - result: %s',
-                              method, request.client.host, request.client.port, path, rtn)
+                              method, request.client.host, request.client.port, path, rtn,
+                              extra=access_fields('http', '%s %s' % (method, route), 'ok', tm.past_millisecond(when_started),
+                                                  code=rtn.result, peer=request.client.host,
+                                                  request_bytes=len(request.loaded_content),
+                                                  response_bytes=len(content)))
                 request.finish()
                 return
             elif method == 'POST':
@@ -134,7 +157,10 @@ class SlimNavigator(object):
                     # 从 URL 参数和 post 参数中获取
                     view_func_params[param_name] = ""
 
+            failures = []
+
             def __error_handler(f):
+                failures.append(f)
 
                 try:
                     f.raiseException()
@@ -156,20 +182,30 @@ class SlimNavigator(object):
             d.addErrback(__error_handler)
             result = yield d
 
+            failed = bool(failures)
         else:
+            failed = True
             result = JsonObject()
             result.result = SlimError.server_not_implemented.code
             result.result_desc = SlimError.server_not_implemented.desc
 
         request.setHeader('Content-Type', 'application/json')
-        request.write(result.dumps())
+        content = result.dumps()
+        request.write(content)
 
+        latency = tm.past_millisecond(when_started)
         logger.access('processed %s request from %s:%s: %sms - %s - %s - %s',
                       method, request.client.host, request.client.port,
-                      tm.past_millisecond(when_started),
-                      path, request.loaded_content, result)
+                      latency,
+                      path, request.loaded_content, result,
+                      extra=access_fields('http', '%s %s' % (method, route), 'error' if failed else 'ok', latency,
+                                          code=result.result, peer=request.client.host,
+                                          request_bytes=len(request.loaded_content),
+                                          response_bytes=len(content)))
         request.finish()
 
+        returnValue(failed)
+
 if __name__ == "__main__":
     # Test Code
     class Request(object):
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+"""路由查找性能对比：线性正则扫描 vs 路由树
+
+Run: python router_bench.py
+"""
+
+import re
+import timeit
+
+from gcommon.www.route_tree import RouteTree, PARAM_VALUE_REGEX
+
+
+def build_route_pattern(route):
+    # 与 SlimNavigator.build_route_pattern 相同
+    route_regex = re.sub(r'(<\w+>)', r'(?P\1%s)' % PARAM_VALUE_REGEX, route)
+    return re.compile("^{}$".format(route_regex))
+
+
+def linear_route_match(routes, path, method):
+    # 使用路由树之前 SlimNavigator.get_route_match 的实现：按注册顺序线性查找
+    for route_pat, view_func, methods in routes:
+        if method not in methods:
+            continue
+        match = route_pat.match(path)
+        if match:
+            return match.groupdict(), view_func, methods
+
+    return None
+
+
+def build_routes(count):
+    routes = []
+    tree = RouteTree()
+
+    for i in range(count):
+        if i % 2:
+            route_str = '/api/module%d/item/<item_id>/detail' % i
+        else:
+            route_str = '/api/module%d/<user_id>/team/<team_id>' % i
+
+        methods = {'GET', 'OPTIONS'}
+        route_pattern = build_route_pattern(route_str)
+        routes.append((route_pattern, route_str, methods))
+        tree.add_route(route_str, route_str, methods, route_pattern)
+
+    return routes, tree
+
+
+def bench(count, number=20000):
+    routes, tree = build_routes(count)
+
+    # 最坏情况：最后注册的路由
+    last = count - 1
+    if last % 2:
+        path = '/api/module%d/item/1234/detail' % last
+    else:
+        path = '/api/module%d/guli/team/slim' % last
+
+    assert linear_route_match(routes, path, 'GET') == tree.get_route_match(path, 'GET')
+
+    linear = timeit.timeit(lambda: linear_route_match(routes, path, 'GET'), number=number)
+    treed = timeit.timeit(lambda: tree.get_route_match(path, 'GET'), number=number)
+
+    print('%5d routes: linear %8.2f us/op, tree %6.2f us/op, speedup %.1fx' % (
+        count, linear * 1e6 / number, treed * 1e6 / number, linear / treed))
+
+
+if __name__ == '__main__':
+    for route_count in (10, 100, 1000):
+        bench(route_count)
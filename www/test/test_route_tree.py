@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# created: 2026-10-18
+
+import re
+
+from gcommon.www.route_tree import RouteTree, PARAM_VALUE_REGEX
+
+
+def _linear_match(routes, path, method):
+    for route_str, view_func, methods in routes:
+        if method not in methods:
+            continue
+        route_regex = re.sub(r'(<\w+>)', r'(?P\1%s)' % PARAM_VALUE_REGEX, route_str)
+        match = re.match("^{}$".format(route_regex), path)
+        if match:
+            return match.groupdict(), view_func, methods
+
+
+ROUTES = [
+    ('/api/hello', 'hello', {'GET', 'OPTIONS'}),
+    ('/api/hello/<username>', 'hello_user', {'GET', 'OPTIONS'}),
+    ('/api/hello/<username>/team/<teamname>', 'hello_join', {'GET', 'OPTIONS'}),
+    ('/api/hello/<username>', 'update_user', {'POST', 'OPTIONS'}),
+    ('/api/file/f_<fid>.json', 'get_file', {'GET', 'OPTIONS'}),
+    ('/api/v1.0/status', 'status', {'GET', 'OPTIONS'}),
+]
+
+
+def _build_tree():
+    tree = RouteTree()
+    for route_str, view_func, methods in ROUTES:
+        tree.add_route(route_str, view_func, methods)
+    return tree
+
+
+def test_same_result_as_linear_scan():
+    tree = _build_tree()
+
+    requests = [
+        ('/api/hello', 'GET'),
+        ('/api/hello/guli', 'GET'),
+        ('/api/hello/gu.li:1', 'GET'),
+        ('/api/hello/guli/team/slim', 'GET'),
+        ('/api/hello/guli', 'POST'),
+        ('/api/hello/guli', 'PUT'),
+        ('/api/file/f_12.json', 'GET'),
+        ('/api/v1.0/status', 'GET'),
+        ('/api/v1x0/status', 'GET'),
+        ('/api/hello/guli/team', 'GET'),
+        ('/api/unknown', 'GET'),
+        ('/api/hello/a b', 'GET'),
+    ]
+
+    for path, method in requests:
+        assert tree.get_route_match(path, method) == _linear_match(ROUTES, path, method), path
+
+
+def test_static_segment_first():
+    tree = RouteTree()
+    tree.add_route('/api/user/<uid>', 'by_id', {'GET'})
+    tree.add_route('/api/user/me', 'me', {'GET'})
+
+    # 与线性查找不同：静态段优先于先注册的参数段
+    assert _linear_match([('/api/user/<uid>', 'by_id', {'GET'}), ('/api/user/me', 'me', {'GET'})],
+                         '/api/user/me', 'GET') == ({'uid': 'me'}, 'by_id', {'GET'})
+    assert tree.get_route_match('/api/user/me', 'GET') == ({}, 'me', {'GET'})
+    assert tree.get_route_match('/api/user/12', 'GET') == ({'uid': '12'}, 'by_id', {'GET'})
+
+
+def test_backtrack_to_param_segment():
+    tree = RouteTree()
+    tree.add_route('/api/user/me/profile', 'my_profile', {'GET'})
+    tree.add_route('/api/user/<uid>/teams', 'user_teams', {'GET'})
+
+    assert tree.get_route_match('/api/user/me/teams', 'GET') == ({'uid': 'me'}, 'user_teams', {'GET'})
+    assert tree.get_route_match('/api/user/me/profile', 'POST') is None
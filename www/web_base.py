@@ -22,6 +22,7 @@ from gcommon.rpc.postman_client import PostmanRoutingKey
 from gcommon.utils.jsonobj import JsonObject
 from gcommon.utils.rpcparams import get_all_rpc_params, get_rpc_param
 from gcommon.utils.async import pass_through_cb
+from gcommon.www.metrics import MetricsResource
 from gcommon.www.router import SlimNavigator
 
 from slimproto.postman import Postman
@@ -68,15 +69,26 @@ class SlimWebBase(resource.Resource):
 
             add extra accepted methods is NOT supported by now, so handlers dealing with same
             RESTful API should check the request's method
+
+        子类设置 Metrics_Path（比如 'metrics'）后，GET /<Metrics_Path> 以文本格式返回所有指标
     """
     isLeaf = False
     _security_cache = SecurityCache()
 
+    # 指标的 URL，默认不提供（对外的服务不要公开）
+    Metrics_Path = None
+
     def __init__(self, config):
         resource.Resource.__init__(self)
 
         self._cfg = config
-        self._app = SlimNavigator(self)
+
+        # 记录处理时间的请求比例（0 - 1），没有配置时为 1。只对当前 resource 有效，不修改共用的 route_metrics
+        sample_rate = config.get_float('metrics.route_sample_rate', 1.0)
+        self._app = SlimNavigator(self, min(max(sample_rate, 0.0), 1.0))
+
+        if self.Metrics_Path:
+            self.putChild(self.Metrics_Path, MetricsResource())
 
     def getChild(self, path, request):
         return self